@@ -4,8 +4,10 @@ from flask_migrate import Migrate
 from flask_mail import Mail
 from flask_login import LoginManager
 from config import Config
+from app.services.replicas import RoutingSession
 
-db = SQLAlchemy()
+# Lecturas de requests GET a réplicas si hay REPLICA_DATABASE_URLS (app.services.replicas)
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 migrate = Migrate()
 mail = Mail()
 login_manager = LoginManager()
@@ -13,9 +15,33 @@ login_manager = LoginManager()
 def create_app(config_class=Config):
     app = Flask(__name__)
     app.config.from_object(config_class)
+    
+    # Antes del primer uso de jinja_env
+    from app.services.startup import configure_template_cache
+    configure_template_cache(app)
+    
+    # Detrás del proxy de Render remote_addr es el del proxy: tomar el cliente de
+    # X-Forwarded-For confiando solo en PROXY_FIX_X_FOR saltos (0 lo desactiva)
+    if app.config.get('PROXY_FIX_X_FOR'):
+        from werkzeug.middleware.proxy_fix import ProxyFix
+        app.wsgi_app = ProxyFix(
+            app.wsgi_app,
+            x_for=app.config['PROXY_FIX_X_FOR'],
+            x_proto=app.config.get('PROXY_FIX_X_PROTO', 1)
+        )
+    
+    # Archivos del multipart en SpooledTemporaryFile acotados
+    from app.services.uploads import UploadRequest
+    app.request_class = UploadRequest
 
     # Inicializar extensiones
+    from app.services import db_pool
+    from app.services.replicas import configure_binds, replica_router
+    db_pool.init_app(app)
+    configure_binds(app)
     db.init_app(app)
+    db_pool.instrument_app(app)
+    replica_router.init_app(app)
     migrate.init_app(app, db)
     mail.init_app(app)
     login_manager.init_app(app)
@@ -28,20 +54,47 @@ def create_app(config_class=Config):
     
     @login_manager.user_loader
     def load_user(user_id):
-        from app.models.user import User
-        return User.query.get(int(user_id))
+        # Identidad cacheada: evita consultar users en cada request
+        from app.services.identity import identity_cache
+        return identity_cache.load_user(int(user_id))
     
     # Registrar blueprints
     from app.routes.main import bp as main_bp
     from app.routes.auth import bp as auth_bp
     from app.routes.companies import bp as companies_bp
     from app.routes.carriers import bp as carriers_bp
+    from app.routes.profile import bp as profile_bp
     
     app.register_blueprint(main_bp)
     app.register_blueprint(auth_bp, url_prefix='/auth')
     app.register_blueprint(companies_bp, url_prefix='/companies')
     app.register_blueprint(carriers_bp, url_prefix='/carriers')
+    app.register_blueprint(profile_bp)
     
     from app.models import user, company, carrier
     
+    from app.services.identity import identity_cache
+    identity_cache.init_app(app)
+    
+    from app.services.page_cache import page_cache
+    page_cache.init_app(app)
+    
+    from app.routes.auth import check_email_limiter
+    check_email_limiter.init_app(app)
+    
+    from app.services.assets import asset_manifest
+    asset_manifest.init_app(app)
+    
+    from app.services.tracking import location_buffer
+    location_buffer.init_app(app)
+    
+    from app.services.metrics import metrics
+    from app.services.pubsub import broker, publish_location_updates
+    broker.init_app(app)
+    location_buffer.on_flush(publish_location_updates)
+    metrics.gauge('tracking_buffer_points', lambda: len(location_buffer))
+    
+    from app.commands import register_commands
+    register_commands(app)
+    
     return app
\ No newline at end of file
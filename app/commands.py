@@ -0,0 +1,226 @@
+import click
+from flask.cli import with_appcontext
+
+
+@click.command('check-query-plans')
+@with_appcontext
+def check_query_plans_command():
+    """Falla si alguna consulta caliente recorre su tabla completa"""
+    from app.services.query_plans import check_hot_query_plans
+
+    failures = 0
+    for name, scans in check_hot_query_plans():
+        if scans:
+            failures += 1
+            click.echo(f'FALLA  {name}: ' + '; '.join(scans))
+        else:
+            click.echo(f'OK     {name}')
+
+    if failures:
+        raise click.ClickException(f'{failures} consulta(s) sin índice utilizable')
+
+
+@click.command('compact-trajectories')
+@click.option('--window-minutes', default=60, show_default=True, help='Edad mínima de los puntos a compactar')
+@with_appcontext
+def compact_trajectories_command(window_minutes):
+    """Compactar puntos GPS crudos en segmentos de trayectoria"""
+    from datetime import timedelta
+    from app.services.trajectory import compact_trajectories
+
+    shipments, points = compact_trajectories(timedelta(minutes=window_minutes))
+    click.echo(f'{points} puntos compactados en {shipments} cargas')
+
+
+@click.command('mail-worker')
+@click.option('--once', is_flag=True, help='Vaciar la bandeja de salida y terminar')
+@click.option('--interval', default=5.0, show_default=True, help='Segundos de espera cuando no hay correos')
+@click.option('--batch-size', default=None, type=int, help='Correos por conexión SMTP (MAIL_BATCH_SIZE)')
+@with_appcontext
+def mail_worker_command(once, interval, batch_size):
+    """Enviar los correos pendientes de la bandeja de salida"""
+    from app.services.mailer import run_worker
+
+    sent, failed = run_worker(interval=interval, batch_size=batch_size, once=once)
+    click.echo(f'{sent} correos enviados, {failed} fallidos')
+
+
+@click.command('expire-quotes')
+@click.option('--once', is_flag=True, help='Expirar las ofertas vencidas y terminar (para cron)')
+@click.option('--interval', default=60.0, show_default=True, help='Segundos entre pasadas')
+@click.option('--batch-size', default=None, type=int, help='Ofertas por UPDATE (QUOTE_EXPIRY_BATCH_SIZE)')
+@with_appcontext
+def expire_quotes_command(once, interval, batch_size):
+    """Marcar como expiradas las ofertas pendientes vencidas y notificar a los transportistas"""
+    from app.services.quotes import run_expiry_sweeper
+
+    expired = run_expiry_sweeper(interval=interval, batch_size=batch_size, once=once)
+    click.echo(f'{expired} ofertas expiradas')
+
+
+@click.command('compliance-scan')
+@click.option('--rebuild', is_flag=True, help='Recalcular antes la vigencia de todos los transportistas')
+@with_appcontext
+def compliance_scan_command(rebuild):
+    """Pasada diaria: retirar del matching a los transportistas con documentos vencidos y enviar recordatorios"""
+    from app.services.compliance import rebuild_compliance, scan_compliance
+
+    if rebuild:
+        click.echo(f'Vigencia recalculada para {rebuild_compliance()} transportistas')
+    result = scan_compliance()
+    click.echo(f"{result['expired']} transportistas vencidos, {result['reminders']} recordatorios creados")
+
+
+@click.command('compliance-calendar')
+@click.option('--days', default=30, show_default=True, help='Días hacia adelante')
+@with_appcontext
+def compliance_calendar_command(days):
+    """Listar los vencimientos de documentos día por día"""
+    from app.services.compliance import expiry_calendar
+    from app.services.replicas import replica_reads
+
+    # Solo lectura: puede ir a una réplica si hay
+    with replica_reads():
+        calendar = expiry_calendar(days=days)
+    for day, items in calendar:
+        click.echo(f'{day:%Y-%m-%d}: {len(items)} vencimientos')
+        for item in items:
+            click.echo(f"  transportista {item['carrier_id']}: {item['label']}")
+
+
+@click.command('reprocess-media')
+@click.option('--stale-minutes', default=10, show_default=True, help='Antigüedad mínima de los archivos pendientes')
+@with_appcontext
+def reprocess_media_command(stale_minutes):
+    """Reintentar el procesamiento de imágenes que quedaron pendientes"""
+    from app.services.uploads import reprocess_pending
+
+    click.echo(f'{reprocess_pending(stale_minutes)} imágenes reprocesadas')
+
+
+@click.command('blob-gc')
+@click.option('--grace-minutes', type=int, default=None, help='Antigüedad mínima sin referencias (BLOB_GC_GRACE_MINUTES)')
+@click.option('--sweep-files', is_flag=True, help='Recorrer también el disco en busca de archivos sin fila')
+@with_appcontext
+def blob_gc_command(grace_minutes, sweep_files):
+    """Borrar los archivos del almacén por contenido que ya nadie referencia"""
+    from app.services.blobs import collect_garbage, sweep_untracked_files
+
+    removed, freed = collect_garbage(grace_minutes)
+    click.echo(f'{removed} blobs borrados ({freed} bytes)')
+    if sweep_files:
+        removed, freed = sweep_untracked_files(grace_minutes)
+        click.echo(f'{removed} archivos sin registrar borrados ({freed} bytes)')
+
+
+@click.command('rebuild-blob-refcounts')
+@with_appcontext
+def rebuild_blob_refcounts_command():
+    """Recalcular ref_count de los blobs desde media y documents"""
+    from app.services.blobs import rebuild_ref_counts
+
+    click.echo(f'Referencias recalculadas para {rebuild_ref_counts()} blobs')
+
+
+@click.command('build-assets')
+@with_appcontext
+def build_assets_command():
+    """Generar los archivos estáticos con huella, sus .gz/.br y manifest.json"""
+    from flask import current_app
+    from app.services.assets import asset_manifest
+
+    count = asset_manifest.build(current_app.static_folder)
+    click.echo(f'{count} archivos en {asset_manifest.folder}')
+
+
+@click.command('rebuild-company-stats')
+@with_appcontext
+def rebuild_company_stats_command():
+    """Recalcular desde cero la tabla company_stats"""
+    from app.services.stats import rebuild_company_stats
+
+    companies = rebuild_company_stats()
+    click.echo(f'Estadísticas recalculadas para {companies} empresas')
+
+
+@click.command('rebuild-carrier-reputation')
+@with_appcontext
+def rebuild_carrier_reputation_command():
+    """Recalcular desde cero la reputación e histogramas de los transportistas"""
+    from app.services.stats import rebuild_carrier_reputation
+
+    carriers = rebuild_carrier_reputation()
+    click.echo(f'Reputación recalculada para {carriers} transportistas')
+
+
+@click.command('reindex-drivers')
+@with_appcontext
+def reindex_drivers_command():
+    """Recalcular el documento de búsqueda de todos los conductores"""
+    from app.services.driver_search import rebuild_search_documents
+
+    updated = rebuild_search_documents()
+    click.echo(f'{updated} conductores reindexados')
+
+
+@click.command('benchmark-driver-search')
+@click.option('--carriers', default=0, show_default=True, help='Conductores sintéticos a insertar (se revierten al final)')
+@click.option('--queries', default=200, show_default=True, help='Consultas a medir')
+@click.option('--target-ms', default=50.0, show_default=True, help='p95 máximo aceptable en milisegundos')
+@with_appcontext
+def benchmark_driver_search_command(carriers, queries, target_ms):
+    """Medir la latencia de la búsqueda de conductores y fallar si p95 supera el objetivo"""
+    from app.services.search_benchmark import run_benchmark
+
+    report = run_benchmark(carriers=carriers, queries=queries)
+    for key, value in report.items():
+        click.echo(f'{key}: {value}')
+    if report['p95_ms'] > target_ms:
+        raise click.ClickException(f'p95 de {report["p95_ms"]} ms supera el objetivo de {target_ms} ms')
+
+
+@click.command('benchmark-quote-acceptance')
+@click.option('--carriers', default=200, show_default=True, help='Ofertas compitiendo por la misma carga')
+@click.option('--workers', default=32, show_default=True, help='Hilos aceptando en paralelo')
+@with_appcontext
+def benchmark_quote_acceptance_command(carriers, workers):
+    """Aceptar en paralelo una misma carga y fallar si no queda exactamente un ganador"""
+    from app.services.quote_benchmark import run_benchmark
+
+    report = run_benchmark(carriers=carriers, workers=workers)
+    for key, value in report.items():
+        click.echo(f'{key}: {value}')
+    if not report['consistent']:
+        raise click.ClickException('La aceptación concurrente dejó la carga en un estado inconsistente')
+
+
+@click.command('benchmark-startup')
+@click.option('--runs', default=5, show_default=True, help='Corridas con la caché de plantillas ya caliente')
+@click.option('--skip-schema-check', is_flag=True, help='No medir la verificación de la revisión de Alembic')
+@with_appcontext
+def benchmark_startup_command(runs, skip_schema_check):
+    """Medir el tiempo de import y arranque de la aplicación por fases"""
+    from app.services.startup_benchmark import run_benchmark
+
+    report = run_benchmark(runs=runs, check_schema=not skip_schema_check)
+    for key, value in report.items():
+        click.echo(f'{key}: {value}')
+
+
+def register_commands(app):
+    app.cli.add_command(check_query_plans_command)
+    app.cli.add_command(compact_trajectories_command)
+    app.cli.add_command(mail_worker_command)
+    app.cli.add_command(expire_quotes_command)
+    app.cli.add_command(compliance_scan_command)
+    app.cli.add_command(compliance_calendar_command)
+    app.cli.add_command(reprocess_media_command)
+    app.cli.add_command(blob_gc_command)
+    app.cli.add_command(rebuild_blob_refcounts_command)
+    app.cli.add_command(build_assets_command)
+    app.cli.add_command(rebuild_company_stats_command)
+    app.cli.add_command(rebuild_carrier_reputation_command)
+    app.cli.add_command(reindex_drivers_command)
+    app.cli.add_command(benchmark_driver_search_command)
+    app.cli.add_command(benchmark_quote_acceptance_command)
+    app.cli.add_command(benchmark_startup_command)
\ No newline at end of file
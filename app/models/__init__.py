@@ -12,9 +12,15 @@ from .payment import Payment
 from .conversation import Conversation
 from .message import Message
 from .notification import Notification
+from .trajectory import TrajectorySegment
+from .outbox import OutboundEmail
+from .company_stats import CompanyStats
+from .rating_histogram import CarrierRatingHistogram
+from .blob import Blob
 
 __all__ = [
     'User', 'Company', 'Carrier', 'Media', 'Document', 'Vehicle',
     'Shipment', 'Quote', 'TrackingEvent', 'Review', 'Payment',
-    'Conversation', 'Message', 'Notification'
+    'Conversation', 'Message', 'Notification', 'TrajectorySegment',
+    'OutboundEmail', 'CompanyStats', 'CarrierRatingHistogram', 'Blob'
 ]
\ No newline at end of file
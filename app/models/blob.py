@@ -0,0 +1,24 @@
+from app import db
+from datetime import datetime
+
+class Blob(db.Model):
+    __tablename__ = 'blobs'
+    __table_args__ = (
+        db.Index('ix_blobs_ref_count_updated_date', 'ref_count', 'updated_date'),
+    )
+    
+    # Archivo del almacén direccionado por contenido (app.services.blobs):
+    # vive en <BLOB_STORE_FOLDER>/<aa>/<bb>/<sha256>
+    sha256 = db.Column(db.String(64), primary_key=True)
+    size = db.Column(db.BigInteger)
+    mime_type = db.Column(db.String(100))
+    is_public = db.Column(db.Boolean, nullable=False, default=False)
+    
+    # Filas de media y documents que lo usan; en 0 lo recoge flask blob-gc
+    ref_count = db.Column(db.Integer, nullable=False, default=0)
+    
+    created_date = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_date = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<Blob {self.sha256[:12]} refs={self.ref_count}>'
\ No newline at end of file
@@ -1,7 +1,8 @@
 from app import db
+from sqlalchemy import DDL, event
+from app.models.types import JSONDocument, json_list, json_array_contains
 from datetime import datetime
 import enum
-import json
 
 class CarrierType(enum.Enum):
     INDIVIDUAL = 'individual' 
@@ -15,6 +16,18 @@ class DocumentStatus(enum.Enum):
 
 class Carrier(db.Model):
     __tablename__ = 'carriers'
+    __table_args__ = (
+        db.Index('ix_carriers_cargo_specializations', 'cargo_specializations', postgresql_using='gin'),
+        db.Index('ix_carriers_usual_routes', 'usual_routes', postgresql_using='gin'),
+        db.Index('ix_carriers_available_vehicle_types', 'available_vehicle_types', postgresql_using='gin'),
+        db.Index(
+            'ix_carriers_search_document_trgm', 'search_document',
+            postgresql_using='gin', postgresql_ops={'search_document': 'gin_trgm_ops'}
+        ),
+        db.Index('ix_carriers_license_expiry_date', 'license_expiry_date'),
+        db.Index('ix_carriers_insurance_expiry_date', 'insurance_expiry_date'),
+        db.Index('ix_carriers_is_compliant_compliance_valid_until', 'is_compliant', 'compliance_valid_until'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, unique=True, index=True)  
@@ -35,7 +48,7 @@ class Carrier(db.Model):
     # Experiencia y capacidad
     years_experience = db.Column(db.Integer, default=0)
     max_capacity_kg = db.Column(db.Float)
-    available_vehicle_types = db.Column(db.Text)  # JSON
+    available_vehicle_types = db.Column(JSONDocument)
     vehicle_count = db.Column(db.Integer, default=1) 
     
     # Historial y reputación
@@ -45,6 +58,11 @@ class Carrier(db.Model):
     successful_delivery_rate = db.Column(db.Float, default=0.0)
     total_earnings = db.Column(db.Numeric(12, 2), default=0.0) 
     
+    # Sumas corrientes que mantiene app.services.stats
+    rating_sum = db.Column(db.Integer, nullable=False, default=0)
+    rating_count = db.Column(db.Integer, nullable=False, default=0)
+    disputed_trips = db.Column(db.Integer, nullable=False, default=0)
+    
     # Verificación de documentos
     document_status = db.Column(db.Enum(DocumentStatus), default=DocumentStatus.PENDING)
     documents_complete = db.Column(db.Boolean, default=False)
@@ -52,42 +70,60 @@ class Carrier(db.Model):
     reliability_seal = db.Column(db.Boolean, default=False)
     verification_date = db.Column(db.DateTime)  
     
+    # Cumplimiento documental que mantiene app.services.compliance:
+    # vigente hasta el primer vencimiento de licencia, seguro, SOAT o tecnomecánica
+    is_compliant = db.Column(db.Boolean, nullable=False, default=False)
+    compliance_valid_until = db.Column(db.Date)
+    
     # Especializaciones
-    cargo_specializations = db.Column(db.Text)  # JSON
-    usual_routes = db.Column(db.Text)  # JSON
+    cargo_specializations = db.Column(JSONDocument)
+    usual_routes = db.Column(JSONDocument)
     availability_24_7 = db.Column(db.Boolean, default=False)
     has_refrigerated_equipment = db.Column(db.Boolean, default=False)  
     has_dangerous_goods_cert = db.Column(db.Boolean, default=False)  
     
+    # Texto normalizado para la búsqueda de conductores (app.services.driver_search)
+    search_document = db.Column(db.Text)
+    
     # Información adicional
     client_reference_1 = db.Column(db.String(200))
     client_reference_2 = db.Column(db.String(200))
     additional_notes = db.Column(db.Text)
     
     # Métodos auxiliares
+    # Las columnas JSON se decodifican una sola vez al cargar la fila
     def get_vehicle_types(self):
-        if self.available_vehicle_types:
-            return json.loads(self.available_vehicle_types)
-        return []
+        return json_list(self.available_vehicle_types)
     
     def set_vehicle_types(self, types_list):
-        self.available_vehicle_types = json.dumps(types_list)
+        self.available_vehicle_types = list(types_list)
     
     def get_cargo_specializations(self):
-        if self.cargo_specializations:
-            return json.loads(self.cargo_specializations)
-        return []
+        return json_list(self.cargo_specializations)
     
     def set_cargo_specializations(self, specializations_list):
-        self.cargo_specializations = json.dumps(specializations_list)
+        self.cargo_specializations = list(specializations_list)
     
     def get_usual_routes(self):
-        if self.usual_routes:
-            return json.loads(self.usual_routes)
-        return []
+        return json_list(self.usual_routes)
     
     def set_usual_routes(self, routes_list):
-        self.usual_routes = json.dumps(routes_list)
+        self.usual_routes = list(routes_list)
+    
+    @classmethod
+    def has_specialization(cls, specialization):
+        """Filtro SQL por especialización de carga"""
+        return json_array_contains(cls.cargo_specializations, specialization)
+    
+    @classmethod
+    def has_vehicle_type(cls, vehicle_type):
+        """Filtro SQL por tipo de vehículo disponible"""
+        return json_array_contains(cls.available_vehicle_types, vehicle_type)
+    
+    @classmethod
+    def has_usual_route(cls, route):
+        """Filtro SQL por ruta habitual"""
+        return json_array_contains(cls.usual_routes, route)
     
     @property
     def is_license_valid(self):
@@ -104,4 +140,13 @@ class Carrier(db.Model):
         return self.insurance_expiry_date >= datetime.utcnow().date()
     
     def __repr__(self):
-        return f'<Carrier {self.user.email}>'
\ No newline at end of file
+        return f'<Carrier {self.user.email}>'
+
+# pg_trgm e índice full-text por expresión: solo existen en PostgreSQL
+event.listen(Carrier.__table__, 'before_create', DDL(
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm"
+).execute_if(dialect='postgresql'))
+event.listen(Carrier.__table__, 'after_create', DDL(
+    "CREATE INDEX IF NOT EXISTS ix_carriers_search_document_tsv ON carriers "
+    "USING gin (to_tsvector('simple', coalesce(search_document, '')))"
+).execute_if(dialect='postgresql'))
\ No newline at end of file
@@ -1,7 +1,7 @@
 from app import db
+from app.models.types import JSONDocument, json_list, json_array_contains
 from datetime import datetime
 import enum
-import json
 
 class CompanyType(enum.Enum):
     NATURAL = 'natural' 
@@ -29,6 +29,10 @@ class ShippingFrequency(enum.Enum):
 
 class Company(db.Model):
     __tablename__ = 'companies'
+    __table_args__ = (
+        db.Index('ix_companies_coverage_zones', 'coverage_zones', postgresql_using='gin'),
+        db.Index('ix_companies_certifications', 'certifications', postgresql_using='gin'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, unique=True, index=True)  
@@ -54,7 +58,7 @@ class Company(db.Model):
     
     # Certificaciones
     has_environmental_license = db.Column(db.Boolean, default=False)
-    certifications = db.Column(db.Text)  # Almacenar como JSON
+    certifications = db.Column(JSONDocument)
     special_permits = db.Column(db.Text)  # Almacenar como JSON
     
     # Historial en plataforma
@@ -73,33 +77,38 @@ class Company(db.Model):
     # Logística
     usual_cargo_types = db.Column(db.Text)  # JSON
     shipping_frequency = db.Column(db.Enum(ShippingFrequency))
-    coverage_zones = db.Column(db.Text)  # JSON con ciudades/departamentos
-    preferred_vehicle_types = db.Column(db.Text) 
+    coverage_zones = db.Column(JSONDocument)  # Ciudades/departamentos
+    preferred_vehicle_types = db.Column(JSONDocument)
     
     # Métodos auxiliares
+    # Las columnas JSON se decodifican una sola vez al cargar la fila
     def get_certifications(self):
-        if self.certifications:
-            return json.loads(self.certifications)
-        return []
+        return json_list(self.certifications)
     
     def set_certifications(self, certifications_list):
-        self.certifications = json.dumps(certifications_list)
+        self.certifications = list(certifications_list)
     
     def get_coverage_zones(self):
-        if self.coverage_zones:
-            return json.loads(self.coverage_zones)
-        return []
+        return json_list(self.coverage_zones)
     
     def set_coverage_zones(self, zones_list):
-        self.coverage_zones = json.dumps(zones_list)
+        self.coverage_zones = list(zones_list)
     
     def get_preferred_vehicle_types(self):
-        if self.preferred_vehicle_types:
-            return json.loads(self.preferred_vehicle_types)
-        return []
+        return json_list(self.preferred_vehicle_types)
     
     def set_preferred_vehicle_types(self, types_list):
-        self.preferred_vehicle_types = json.dumps(types_list)
+        self.preferred_vehicle_types = list(types_list)
+    
+    @classmethod
+    def covers_zone(cls, zone):
+        """Filtro SQL por zona de cobertura"""
+        return json_array_contains(cls.coverage_zones, zone)
+    
+    @classmethod
+    def has_certification(cls, certification):
+        """Filtro SQL por certificación"""
+        return json_array_contains(cls.certifications, certification)
     
     @property
     def display_name(self):
@@ -0,0 +1,43 @@
+from app import db
+from datetime import datetime
+
+class CompanyStats(db.Model):
+    __tablename__ = 'company_stats'
+    
+    # Una fila por empresa, mantenida por app.services.stats
+    company_id = db.Column(db.Integer, db.ForeignKey('companies.id'), primary_key=True)
+    
+    # Cargas por grupo de estado
+    total_loads = db.Column(db.Integer, nullable=False, default=0)
+    published = db.Column(db.Integer, nullable=False, default=0)
+    in_progress = db.Column(db.Integer, nullable=False, default=0)
+    completed = db.Column(db.Integer, nullable=False, default=0)
+    cancelled = db.Column(db.Integer, nullable=False, default=0)
+    
+    # Pagos completados y calificaciones recibidas
+    total_spent = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    rating_sum = db.Column(db.Integer, nullable=False, default=0)
+    rating_count = db.Column(db.Integer, nullable=False, default=0)
+    
+    updated_date = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    @property
+    def average_rating(self):
+        if not self.rating_count:
+            return 0.0
+        return round(self.rating_sum / self.rating_count, 2)
+    
+    def to_dict(self):
+        return {
+            'total_loads': self.total_loads,
+            'published': self.published,
+            'in_progress': self.in_progress,
+            'completed': self.completed,
+            'cancelled': self.cancelled,
+            'total_spent': float(self.total_spent or 0),
+            'average_rating': self.average_rating,
+            'rating_count': self.rating_count
+        }
+    
+    def __repr__(self):
+        return f'<CompanyStats {self.company_id} - {self.total_loads} cargas>'
\ No newline at end of file
@@ -3,6 +3,10 @@ from datetime import datetime
 
 class Conversation(db.Model):
     __tablename__ = 'conversations'
+    __table_args__ = (
+        db.Index('ix_conversations_user1_id', 'user1_id'),
+        db.Index('ix_conversations_user2_id', 'user2_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     # Participantes
@@ -18,6 +18,11 @@ class DocumentStatus(enum.Enum):
 
 class Document(db.Model):
     __tablename__ = 'documents'
+    __table_args__ = (
+        db.Index('ix_documents_expiry_date', 'expiry_date'),
+        db.Index('ix_documents_entity_type_entity_id', 'entity_type', 'entity_id'),
+        db.Index('ix_documents_sha256', 'sha256'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     document_type = db.Column(db.Enum(DocumentType), nullable=False)
@@ -28,6 +33,7 @@ class Document(db.Model):
     file_name = db.Column(db.String(255), nullable=False)
     file_path = db.Column(db.String(500), nullable=False)
     file_size = db.Column(db.Integer)
+    sha256 = db.Column(db.String(64))  # Blob del almacén por contenido; None en archivos anteriores
     
     # Validación
     status = db.Column(db.Enum(DocumentStatus), default=DocumentStatus.PENDING)
@@ -1,4 +1,5 @@
 from app import db
+from app.models.types import JSONDocument
 from datetime import datetime
 import enum
 
@@ -10,6 +11,11 @@ class MediaType(enum.Enum):
     COMPANY = 'company'
     GENERAL = 'general'
 
+class MediaStatus(enum.Enum):
+    PENDING = 'pending'
+    READY = 'ready'
+    FAILED = 'failed'
+
 class Media(db.Model):
     __tablename__ = 'media'
     
@@ -28,6 +34,15 @@ class Media(db.Model):
     caption = db.Column(db.String(300))
     is_primary = db.Column(db.Boolean, default=False)
     
+    # Posprocesamiento (app.services.uploads): mientras está PENDING, file_path
+    # apunta al original en la carpeta privada de staging
+    processing_status = db.Column(db.Enum(MediaStatus), default=MediaStatus.READY)
+    width = db.Column(db.Integer)
+    height = db.Column(db.Integer)
+    variants = db.Column(JSONDocument)  # {nombre: {sha256, url, width, height, size}}
+    processed_date = db.Column(db.DateTime)
+    processing_error = db.Column(db.Text)
+    
     # Metadata
     upload_date = db.Column(db.DateTime, default=datetime.utcnow)
     uploaded_by = db.Column(db.Integer, db.ForeignKey('users.id'))
@@ -35,5 +50,19 @@ class Media(db.Model):
     # Relaciones
     uploader = db.relationship('User', foreign_keys=[uploaded_by])
     
+    def to_dict(self):
+        ready = self.processing_status == MediaStatus.READY
+        return {
+            'id': self.id,
+            'media_type': self.media_type.value if self.media_type else None,
+            'status': self.processing_status.value if self.processing_status else None,
+            'url': self.file_path if ready else None,
+            'width': self.width,
+            'height': self.height,
+            'variants': (self.variants or {}) if ready else {},
+            'error': self.processing_error,
+            'upload_date': self.upload_date.isoformat() if self.upload_date else None
+        }
+    
     def __repr__(self):
         return f'<Media {self.file_name} - {self.media_type.value}>'
\ No newline at end of file
@@ -3,6 +3,9 @@ from datetime import datetime
 
 class Message(db.Model):
     __tablename__ = 'messages'
+    __table_args__ = (
+        db.Index('ix_messages_conversation_id_sent_date', 'conversation_id', 'sent_date'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     conversation_id = db.Column(db.Integer, db.ForeignKey('conversations.id'), nullable=False)
@@ -22,5 +25,16 @@ class Message(db.Model):
     # Relaciones
     sender = db.relationship('User', backref='messages')
     
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'conversation_id': self.conversation_id,
+            'sender_id': self.sender_id,
+            'content': self.content,
+            'message_type': self.message_type,
+            'is_read': self.is_read,
+            'sent_date': self.sent_date.isoformat() if self.sent_date else None
+        }
+    
     def __repr__(self):
         return f'<Message {self.sender_id} - {self.sent_date}>'
\ No newline at end of file
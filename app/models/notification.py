@@ -6,6 +6,8 @@ class NotificationType(enum.Enum):
     NEW_QUOTE = 'new_quote'
     QUOTE_ACCEPTED = 'quote_accepted'
     QUOTE_REJECTED = 'quote_rejected'
+    QUOTE_EXPIRED = 'quote_expired'
+    DOCUMENT_EXPIRING = 'document_expiring'
     SHIPMENT_UPDATE = 'shipment_update'
     PAYMENT_RECEIVED = 'payment_received'
     NEW_MESSAGE = 'new_message'
@@ -13,6 +15,10 @@ class NotificationType(enum.Enum):
 
 class Notification(db.Model):
     __tablename__ = 'notifications'
+    __table_args__ = (
+        db.Index('ix_notifications_user_id_is_read_created_date', 'user_id', 'is_read', 'created_date'),
+        db.Index('ix_notifications_user_id_created_date', 'user_id', 'created_date', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -38,5 +44,18 @@ class Notification(db.Model):
     def is_recent(self):
         return (datetime.utcnow() - self.created_date).total_seconds() < 3600  # 1 hora
     
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'title': self.title,
+            'message': self.message,
+            'notification_type': self.notification_type.value if self.notification_type else None,
+            'is_read': self.is_read,
+            'related_entity_type': self.related_entity_type,
+            'related_entity_id': self.related_entity_id,
+            'created_date': self.created_date.isoformat() if self.created_date else None,
+            'read_date': self.read_date.isoformat() if self.read_date else None
+        }
+    
     def __repr__(self):
         return f'<Notification {self.title} - {self.notification_type.value}>'
\ No newline at end of file
@@ -0,0 +1,35 @@
+from app import db
+from datetime import datetime
+import enum
+
+class OutboxStatus(enum.Enum):
+    PENDING = 'pending'
+    SENT = 'sent'
+    FAILED = 'failed'
+
+class OutboundEmail(db.Model):
+    __tablename__ = 'mail_outbox'
+    __table_args__ = (
+        db.Index('ix_mail_outbox_status_next_attempt_at', 'status', 'next_attempt_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    
+    # Mensaje ya renderizado
+    recipient = db.Column(db.String(120), nullable=False)
+    subject = db.Column(db.String(200), nullable=False)
+    html_body = db.Column(db.Text)
+    text_body = db.Column(db.Text)
+    
+    # Entrega
+    status = db.Column(db.Enum(OutboxStatus), nullable=False, default=OutboxStatus.PENDING)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    last_error = db.Column(db.Text)
+    
+    # Tiempos
+    created_date = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_date = db.Column(db.DateTime)
+    
+    def __repr__(self):
+        return f'<OutboundEmail {self.recipient} - {self.status.value}>'
\ No newline at end of file
@@ -18,6 +18,10 @@ class PaymentMethod(enum.Enum):
 
 class Payment(db.Model):
     __tablename__ = 'payments'
+    __table_args__ = (
+        db.Index('ix_payments_company_id_status', 'company_id', 'status'),
+        db.Index('ix_payments_carrier_id_status', 'carrier_id', 'status'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     shipment_id = db.Column(db.Integer, db.ForeignKey('shipments.id'), nullable=False, unique=True)
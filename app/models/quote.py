@@ -11,6 +11,11 @@ class QuoteStatus(enum.Enum):
 
 class Quote(db.Model):
     __tablename__ = 'quotes'
+    __table_args__ = (
+        db.Index('ix_quotes_shipment_id_status', 'shipment_id', 'status'),
+        db.Index('ix_quotes_carrier_id_status', 'carrier_id', 'status'),
+        db.Index('ix_quotes_status_expiry_date', 'status', 'expiry_date'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     shipment_id = db.Column(db.Integer, db.ForeignKey('shipments.id'), nullable=False)
@@ -47,5 +52,22 @@ class Quote(db.Model):
     def is_negotiable(self):
         return self.status == QuoteStatus.PENDING and not self.is_expired
     
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'shipment_id': self.shipment_id,
+            'carrier_id': self.carrier_id,
+            'vehicle_id': self.vehicle_id,
+            'bid_amount': float(self.bid_amount) if self.bid_amount is not None else None,
+            'counter_offer': float(self.counter_offer) if self.counter_offer is not None else None,
+            'proposed_pickup_date': self.proposed_pickup_date.isoformat() if self.proposed_pickup_date else None,
+            'estimated_delivery_date': self.estimated_delivery_date.isoformat() if self.estimated_delivery_date else None,
+            'notes': self.notes,
+            'status': self.status.value if self.status else None,
+            'bid_date': self.bid_date.isoformat() if self.bid_date else None,
+            'response_date': self.response_date.isoformat() if self.response_date else None,
+            'expiry_date': self.expiry_date.isoformat() if self.expiry_date else None
+        }
+    
     def __repr__(self):
         return f'<Quote {self.bid_amount} - {self.status.value}>'
\ No newline at end of file
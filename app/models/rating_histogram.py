@@ -0,0 +1,21 @@
+from app import db
+
+class RatingDimension:
+    OVERALL = 'overall'
+    PUNCTUALITY = 'punctuality'
+    COMMUNICATION = 'communication'
+    CONDITION = 'condition'
+
+class CarrierRatingHistogram(db.Model):
+    __tablename__ = 'carrier_rating_histograms'
+    
+    # Una fila por transportista, dimensión y número de estrellas (1-5)
+    carrier_id = db.Column(db.Integer, db.ForeignKey('carriers.id'), primary_key=True)
+    dimension = db.Column(db.String(20), primary_key=True)
+    stars = db.Column(db.SmallInteger, primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    
+    updated_date = db.Column(db.DateTime)
+    
+    def __repr__(self):
+        return f'<CarrierRatingHistogram {self.carrier_id} {self.dimension} {self.stars}★ x{self.count}>'
\ No newline at end of file
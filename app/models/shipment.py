@@ -1,5 +1,7 @@
 from app import db
+from app.services.geo import geohash_encode, haversine_km
 from datetime import datetime
+from sqlalchemy import event, inspect
 import enum
 
 class ShipmentStatus(enum.Enum):
@@ -23,6 +25,19 @@ class CargoType(enum.Enum):
 
 class Shipment(db.Model):
     __tablename__ = 'shipments'
+    __table_args__ = (
+        db.Index('ix_shipments_status_pickup_date', 'status', 'pickup_date'),
+        db.Index('ix_shipments_company_id_status', 'company_id', 'status'),
+        db.Index('ix_shipments_carrier_id_status', 'carrier_id', 'status'),
+        # Paginación por clave (published_date, id)
+        db.Index('ix_shipments_company_id_published_date', 'company_id', 'published_date', 'id'),
+        db.Index('ix_shipments_carrier_id_published_date', 'carrier_id', 'published_date', 'id'),
+        # Búsqueda por prefijo geohash + ventana de recogida
+        db.Index(
+            'ix_shipments_origin_geohash_pickup', 'origin_geohash', 'pickup_date',
+            postgresql_ops={'origin_geohash': 'varchar_pattern_ops'}
+        ),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     company_id = db.Column(db.Integer, db.ForeignKey('companies.id'), nullable=False)
@@ -38,11 +53,13 @@ class Shipment(db.Model):
     origin_city = db.Column(db.String(100), nullable=False)
     origin_lat = db.Column(db.Float)  # Latitud
     origin_lng = db.Column(db.Float)  # Longitud
+    origin_geohash = db.Column(db.String(12))  # Índice espacial del origen
     
     destination_address = db.Column(db.String(300), nullable=False)
     destination_city = db.Column(db.String(100), nullable=False)
     destination_lat = db.Column(db.Float)
     destination_lng = db.Column(db.Float)
+    route_distance_km = db.Column(db.Float)  # Distancia origen-destino calculada
     
     # Especificaciones de carga
     weight_kg = db.Column(db.Float, nullable=False)
@@ -83,13 +100,62 @@ class Shipment(db.Model):
     def is_active(self):
         return self.status in [ShipmentStatus.PUBLISHED, ShipmentStatus.PENDING_QUOTES, ShipmentStatus.ASSIGNED, ShipmentStatus.IN_TRANSIT]
     
+    @property
+    def has_route_coordinates(self):
+        return None not in (self.origin_lat, self.origin_lng, self.destination_lat, self.destination_lng)
+    
     @property
     def distance_km(self):
-        # Calcular distancia aproximada (implementar lógica real después)
-        if self.origin_lat and self.destination_lat:
-            # Placeholder para cálculo de distancia
-            return 150  # km aproximados
+        """Distancia de círculo máximo entre origen y destino"""
+        if self.route_distance_km is not None:
+            return round(self.route_distance_km, 1)
+        if self.has_route_coordinates:
+            return round(haversine_km(self.origin_lat, self.origin_lng, self.destination_lat, self.destination_lng), 1)
         return None
     
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'title': self.title,
+            'cargo_type': self.cargo_type.value if self.cargo_type else None,
+            'origin_city': self.origin_city,
+            'origin_lat': self.origin_lat,
+            'origin_lng': self.origin_lng,
+            'destination_city': self.destination_city,
+            'destination_lat': self.destination_lat,
+            'destination_lng': self.destination_lng,
+            'weight_kg': self.weight_kg,
+            'volume_m3': self.volume_m3,
+            'pickup_date': self.pickup_date.isoformat() if self.pickup_date else None,
+            'delivery_deadline': self.delivery_deadline.isoformat() if self.delivery_deadline else None,
+            'published_date': self.published_date.isoformat() if self.published_date else None,
+            'offered_price': float(self.offered_price) if self.offered_price is not None else None,
+            'status': self.status.value if self.status else None,
+            'distance_km': self.distance_km
+        }
+    
     def __repr__(self):
-        return f'<Shipment {self.title} - {self.status.value}>'
\ No newline at end of file
+        return f'<Shipment {self.title} - {self.status.value}>'
+
+
+@event.listens_for(Shipment, 'before_insert')
+@event.listens_for(Shipment, 'before_update')
+def _update_geo_fields(mapper, connection, target):
+    """Mantener origin_geohash y route_distance_km sincronizados con las coordenadas"""
+    if target.origin_lat is not None and target.origin_lng is not None:
+        target.origin_geohash = geohash_encode(target.origin_lat, target.origin_lng)
+    else:
+        target.origin_geohash = None
+    
+    state = inspect(target)
+    coords_changed = any(
+        state.attrs[name].history.has_changes()
+        for name in ('origin_lat', 'origin_lng', 'destination_lat', 'destination_lng')
+    )
+    if coords_changed or target.route_distance_km is None:
+        if target.has_route_coordinates:
+            target.route_distance_km = haversine_km(
+                target.origin_lat, target.origin_lng, target.destination_lat, target.destination_lng
+            )
+        else:
+            target.route_distance_km = None
\ No newline at end of file
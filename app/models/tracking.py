@@ -13,6 +13,9 @@ class TrackingEventType(enum.Enum):
 
 class TrackingEvent(db.Model):
     __tablename__ = 'tracking_events'
+    __table_args__ = (
+        db.Index('ix_tracking_events_shipment_id_timestamp', 'shipment_id', 'timestamp'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     shipment_id = db.Column(db.Integer, db.ForeignKey('shipments.id'), nullable=False)
@@ -31,7 +34,23 @@ class TrackingEvent(db.Model):
     estimated_remaining_time = db.Column(db.Integer)  
     notes = db.Column(db.Text)
     
+    # Punto GPS crudo del LocationBuffer: lo compacta flask compact-trajectories
+    is_raw = db.Column(db.Boolean, nullable=False, default=False)
+    
     shipment_rel = db.relationship('Shipment', back_populates='tracking_events_rel')
     
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'shipment_id': self.shipment_id,
+            'event_type': self.event_type.value if self.event_type else None,
+            'location': self.location,
+            'description': self.description,
+            'timestamp': self.timestamp.isoformat() if self.timestamp else None,
+            'latitude': self.latitude,
+            'longitude': self.longitude,
+            'estimated_remaining_time': self.estimated_remaining_time
+        }
+    
     def __repr__(self):
         return f'<TrackingEvent {self.event_type.value} - {self.timestamp}>'
\ No newline at end of file
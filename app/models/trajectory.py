@@ -0,0 +1,29 @@
+from app import db
+from datetime import datetime
+
+class TrajectorySegment(db.Model):
+    __tablename__ = 'trajectory_segments'
+    __table_args__ = (
+        db.Index('ix_trajectory_segments_shipment_id_start_time', 'shipment_id', 'start_time'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    shipment_id = db.Column(db.Integer, db.ForeignKey('shipments.id'), nullable=False)
+    
+    # Rango de tiempo cubierto por el segmento
+    start_time = db.Column(db.DateTime, nullable=False)
+    end_time = db.Column(db.DateTime, nullable=False)
+    point_count = db.Column(db.Integer, nullable=False)
+    
+    # Coordenadas en formato polyline (precisión 1e-5) y tiempos como deltas en segundos
+    encoded_path = db.Column(db.Text, nullable=False)
+    encoded_times = db.Column(db.Text, nullable=False)
+    
+    # Metadata
+    created_date = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    # Relaciones
+    shipment = db.relationship('Shipment', backref=db.backref('trajectory_segments', lazy='dynamic'))
+    
+    def __repr__(self):
+        return f'<TrajectorySegment {self.shipment_id} - {self.point_count} puntos>'
\ No newline at end of file
@@ -0,0 +1,18 @@
+from app import db
+from sqlalchemy.dialects.postgresql import JSONB
+import json
+
+# Documento JSON: JSONB (indexable con GIN) en PostgreSQL, JSON en el resto
+JSONDocument = db.JSON().with_variant(JSONB(), 'postgresql')
+
+
+def json_list(value):
+    """Copia de una lista almacenada en una columna JSONDocument"""
+    return list(value) if value else []
+
+
+def json_array_contains(column, value):
+    """Filtro 'la lista JSON contiene value'; usa el índice GIN en PostgreSQL"""
+    if db.session.get_bind().dialect.name == 'postgresql':
+        return column.contains([value])
+    return db.cast(column, db.Text).contains(json.dumps(value), autoescape=True)
\ No newline at end of file
@@ -100,28 +100,49 @@ class User(db.Model, UserMixin):
     def get_id(self):
         return str(self.id)
     
+    @property
+    def company_id(self):
+        return self.company.id if self.company else None
+    
+    @property
+    def carrier_id(self):
+        return self.carrier.id if self.carrier else None
+    
+    @property
+    def display_name(self):
+        company = self.company
+        if company:
+            return User.build_display_name(self.email, company.commercial_name, company.trade_name, company.legal_name)
+        return User.build_display_name(self.email)
+    
+    @staticmethod
+    def build_display_name(email, *company_names):
+        """Nombre comercial de la empresa o, si no hay, la parte local del correo"""
+        for name in company_names:
+            if name:
+                return name
+        return email.split('@')[0]
+    
     def generate_verification_token(self):
         """Generate unique verification token"""
-        #self.verification_token = secrets.token_urlsafe(32)
-        #self.verification_token_expires = datetime.utcnow() + timedelta(hours=24)
-        #return self.verification_token
-        pass
+        self.verification_token = secrets.token_urlsafe(32)
+        self.verification_token_expires = datetime.utcnow() + timedelta(hours=24)
+        return self.verification_token
     
     def is_verification_token_valid(self):
         """Check if verification token is valid"""
-        #if not self.verification_token or not self.verification_token_expires:
-            #return False
-        #return datetime.utcnow() < self.verification_token_expires
-        return True
+        if not self.verification_token or not self.verification_token_expires:
+            return False
+        return datetime.utcnow() < self.verification_token_expires
     
     def verify_email(self):
         """Mark email as verified"""
         self.email_verified = True
-        if not self.account_status:
+        if not self.account_status or self.account_status == AccountStatus.PENDING_VERIFICATION:
             self.account_status = AccountStatus.ACTIVE
         self.verification_date = datetime.utcnow()
-        #self.verification_token = None
-        #self.verification_token_expires = None
+        self.verification_token = None
+        self.verification_token_expires = None
     
     def get_profile_picture_url(self):
         """Obtener URL de la foto de perfil"""
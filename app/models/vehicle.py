@@ -1,7 +1,7 @@
 from app import db
+from app.models.types import JSONDocument, json_list
 from datetime import datetime
 import enum
-import json
 
 class VehicleType(enum.Enum):
     TRUCK = 'truck'
@@ -19,6 +19,11 @@ class VehicleStatus(enum.Enum):
 
 class Vehicle(db.Model):
     __tablename__ = 'vehicles'
+    __table_args__ = (
+        db.Index('ix_vehicles_carrier_id', 'carrier_id'),
+        db.Index('ix_vehicles_soat_expiry', 'soat_expiry'),
+        db.Index('ix_vehicles_technomechanical_expiry', 'technomechanical_expiry'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     carrier_id = db.Column(db.Integer, db.ForeignKey('carriers.id'), nullable=False)
@@ -39,7 +44,7 @@ class Vehicle(db.Model):
     # Especificaciones
     has_refrigeration = db.Column(db.Boolean, default=False)
     has_hydraulic_tailgate = db.Column(db.Boolean, default=False)
-    special_features = db.Column(db.Text)  # JSON
+    special_features = db.Column(JSONDocument)
     
     # Documentación
     soat_expiry = db.Column(db.Date)
@@ -60,12 +65,10 @@ class Vehicle(db.Model):
     
     # Métodos
     def get_special_features(self):
-        if self.special_features:
-            return json.loads(self.special_features)
-        return []
+        return json_list(self.special_features)
     
     def set_special_features(self, features_list):
-        self.special_features = json.dumps(features_list)
+        self.special_features = list(features_list)
     
     @property
     def is_soat_valid(self):
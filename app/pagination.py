@@ -0,0 +1,89 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from sqlalchemy import tuple_
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+class InvalidCursor(ValueError):
+    """El cursor recibido no es válido para esta consulta"""
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {'dt': value.isoformat()}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict) and 'dt' in value:
+        return datetime.fromisoformat(value['dt'])
+    return value
+
+
+def encode_cursor(values):
+    """Cursor opaco a partir de los valores de la clave de orden"""
+    payload = json.dumps([_encode_value(value) for value in values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token, size, types=None):
+    """Valores de la clave de orden; types valida el tipo de cada posición"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        if not isinstance(values, list) or len(values) != size:
+            raise InvalidCursor('Cursor invalido')
+        values = [_decode_value(value) for value in values]
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+        raise InvalidCursor('Cursor invalido')
+    
+    if types and not all(isinstance(value, kind) for value, kind in zip(values, types)):
+        raise InvalidCursor('Cursor invalido')
+    return values
+
+
+def parse_page_size(value):
+    try:
+        limit = int(value) if value is not None else DEFAULT_PAGE_SIZE
+    except (TypeError, ValueError):
+        limit = DEFAULT_PAGE_SIZE
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def paginate_keyset(query, sort_columns, cursor=None, limit=DEFAULT_PAGE_SIZE, descending=True):
+    """Paginar por clave (keyset) en lugar de OFFSET.
+
+    sort_columns debe terminar en una columna única (normalmente el id) para
+    que el orden sea estable. Devuelve (items, next_cursor); next_cursor es
+    None en la última página. El costo de cada página es el mismo sin importar
+    cuántas se hayan recorrido antes, siempre que exista un índice sobre las
+    columnas de orden.
+    """
+    key = tuple_(*sort_columns)
+    if cursor:
+        values = decode_cursor(cursor, len(sort_columns), types=[column.type.python_type for column in sort_columns])
+        query = query.filter(key < tuple_(*values) if descending else key > tuple_(*values))
+
+    order = [column.desc() if descending else column.asc() for column in sort_columns]
+    rows = query.order_by(*order).limit(limit + 1).all()
+
+    items = rows[:limit]
+    next_cursor = None
+    if len(rows) > limit:
+        last = items[-1]
+        next_cursor = encode_cursor([getattr(last, column.key) for column in sort_columns])
+    return items, next_cursor
+
+
+def page_response(items, next_cursor, serializer=None):
+    """Cuerpo JSON estándar de una página"""
+    serializer = serializer or (lambda item: item.to_dict())
+    return {
+        'items': [serializer(item) for item in items],
+        'next_cursor': next_cursor
+    }
\ No newline at end of file
@@ -1,10 +1,12 @@
 from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify, current_app
-from flask_mail import Message
 from flask_login import login_user, logout_user, login_required, current_user
-from app import db, mail
+from app import db
 from app.models.user import User, AccountStatus, UserType
 from app.models.company import Company, CompanyType
 from app.models.carrier import Carrier, CarrierType
+from app.services.mailer import enqueue_email
+from app.services.email_lookup import email_registry, email_exists_in_db
+from app.services.ratelimit import RateLimiter
 import re
 import hashlib
 import secrets
@@ -12,6 +14,9 @@ from datetime import datetime
 
 bp = Blueprint('auth', __name__)
 
+# La verificación de email se llama mientras el usuario escribe
+check_email_limiter = RateLimiter(rate=5, burst=20, name='check-email')
+
 class EmailVerification:
     """Sistema real de verificacion de email"""
     
@@ -30,80 +35,17 @@ class EmailVerification:
     
     @staticmethod
     def send_verification_email(user):
-        """Enviar email de verificacion real"""
-        try:
-            subject = "Verifica tu cuenta de ConnectCargo"
-            verification_url = f"http://localhost:5000/auth/verify-email/{user.verification_token}"
-            
-            html_body = f"""
-            <!DOCTYPE html>
-            <html>
-            <head>
-                <style>
-                    body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
-                    .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-                    .header {{ background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; padding: 20px; text-align: center; }}
-                    .content {{ padding: 20px; background: #f9f9f9; }}
-                    .button {{ display: inline-block; padding: 12px 24px; background: #667eea; color: white; text-decoration: none; border-radius: 5px; margin: 20px 0; }}
-                    .footer {{ padding: 20px; text-align: center; font-size: 12px; color: #666; }}
-                </style>
-            </head>
-            <body>
-                <div class="container">
-                    <div class="header">
-                        <h1>¡Bienvenido a ConnectCargo!</h1>
-                    </div>
-                    <div class="content">
-                        <h2>Verifica tu direccion de email</h2>
-                        <p>Hola,</p>
-                        <p>Gracias por registrarte en ConnectCargo. Para completar tu registro y comenzar a usar nuestra plataforma, por favor verifica tu direccion de email haciendo clic en el boton de abajo:</p>
-                        
-                        <a href="{verification_url}" class="button">Verificar Email</a>
-                        
-                        <p>Este enlace de verificacion expirara en 24 horas.</p>
-                        <p>Si no creaste una cuenta con ConnectCargo, por favor ignora este email.</p>
-                    </div>
-                    <div class="footer">
-                        <p>&copy; 2024 ConnectCargo. Todos los derechos reservados.</p>
-                        <p>Este es un mensaje automatico, por favor no respondas a este email.</p>
-                    </div>
-                </div>
-            </body>
-            </html>
-            """
-            
-            text_body = f"""
-            ¡Bienvenido a ConnectCargo!
-            
-            Verifica tu direccion de email
-            
-            Hola,
-            
-            Gracias por registrarte en ConnectCargo. Para completar tu registro y comenzar a usar nuestra plataforma, por favor verifica tu direccion de email visitando el siguiente enlace:
-            
-            {verification_url}
-            
-            Este enlace de verificacion expirara en 24 horas.
-            
-            Si no creaste una cuenta con ConnectCargo, por favor ignora este email.
-            
-            © 2024 ConnectCargo. Todos los derechos reservados.
-            """
-            
-            msg = Message(
-                subject=subject,
-                recipients=[user.email],
-                html=html_body,
-                body=text_body
-            )
-            
-            mail.send(msg)
-            print(f"Email de verificacion enviado a: {user.email}")
-            return True
-            
-        except Exception as e:
-            print(f"Error enviando email de verificacion: {str(e)}")
-            return False
+        """Encolar el email de verificacion; lo envia el worker (flask mail-worker)"""
+        verification_url = url_for('auth.verify_email', token=user.verification_token, _external=True)
+        enqueue_email(
+            user.email,
+            "Verifica tu cuenta de ConnectCargo",
+            'verify_email',
+            verification_url=verification_url,
+            expires_hours=24,
+            year=datetime.utcnow().year
+        )
+        return True
 
 class PasswordHelper:
     """Clase de utilidades para contrasenas"""
@@ -169,13 +111,13 @@ def register():
             return render_template('auth/register.html') 
         
         # Verificar si el email ya existe
-        existing_user = User.query.filter_by(email=email).first()
-        if existing_user:
+        if email_exists_in_db(email):
             flash('Ya existe una cuenta con este email.', 'error')
             return render_template('auth/register.html') 
         
         try:
             user_type_enum = UserType.CARRIER if user_type == 'carrier' else UserType.COMPANY
+            verification_required = current_app.config.get('EMAIL_VERIFICATION_REQUIRED', False)
             
             # Crear usuario
             new_user = User(
@@ -189,13 +131,13 @@ def register():
                 document_type=None,
                 accepted_terms=True,
                 terms_acceptance_date=datetime.utcnow(),
-                email_verified=True,  # VERIFICACIÓN AUTOMÁTICA
-                account_status=AccountStatus.ACTIVE  # CUENTA ACTIVA DIRECTAMENTE
+                email_verified=not verification_required,
+                account_status=AccountStatus.PENDING_VERIFICATION if verification_required else AccountStatus.ACTIVE
             )
             
-    
             # Generar token de verificacion
-            #new_user.generate_verification_token()
+            if verification_required:
+                new_user.generate_verification_token()
             
             db.session.add(new_user)
             db.session.flush()  # Obtener el ID del usuario
@@ -217,11 +159,16 @@ def register():
             
             db.session.add(new_profile)
             
-            # Enviar email de verificacion
-            #email_sent = EmailVerification.send_verification_email(new_user)
+            # Encolar email de verificacion (se confirma junto con el usuario)
+            if verification_required:
+                EmailVerification.send_verification_email(new_user)
             
             db.session.commit()
-            flash('¡Registro exitoso! Tu cuenta ha sido creada y verificada automáticamente.', 'success')
+            email_registry.add(email)
+            if verification_required:
+                flash('¡Registro exitoso! Revisa tu email para verificar tu cuenta.', 'success')
+            else:
+                flash('¡Registro exitoso! Tu cuenta ha sido creada y verificada automáticamente.', 'success')
             return redirect(url_for('auth.login'))
         
         except Exception as e:
@@ -325,13 +272,20 @@ def verify_email(token):
 @bp.route('/check-email')
 def check_email():
     """API endpoint para verificar si email existe"""
+    allowed, retry_after = check_email_limiter.hit(request.remote_addr)
+    if not allowed:
+        response = jsonify({'error': 'Demasiadas solicitudes'})
+        response.headers['Retry-After'] = str(retry_after)
+        return response, 429
+    
     email = request.args.get('email', '').strip().lower()
     
     if not email:
         return jsonify({'exists': False, 'valid': False})
     
     valid = EmailVerification.is_valid_email(email)
-    exists = User.query.filter_by(email=email).first() is not None
+    # Un email invalido no puede estar registrado: no se consulta la base
+    exists = valid and email_registry.exists(email)
     
     return jsonify({
         'exists': exists,
@@ -1,11 +1,31 @@
 from flask import Blueprint, render_template, flash, redirect, url_for, request, jsonify
 from flask_login import login_required, current_user
 from app.models.user import UserType  
+from app.models.shipment import Shipment
+from app.models.notification import Notification
+from app.pagination import InvalidCursor, paginate_keyset, parse_page_size, page_response, encode_cursor, decode_cursor
+from app.services import loads as load_service
+from app.services.matching import matching_index, lane_key, DEFAULT_TOP_K, MAX_TOP_K
+from app.services import trajectory as trajectory_service
+from app.services.quotes import AcceptanceError, accept_quote
+from app.services.compliance import expiry_calendar
+from app.services.page_cache import cached_page
+from app.models.carrier import Carrier
+from app.services.tracking import location_buffer, parse_point, trackable_shipment_ids, InvalidPoint, MAX_POINTS_PER_REQUEST
 
 bp = Blueprint('carriers', __name__)
 
+@bp.errorhandler(InvalidCursor)
+def invalid_cursor(error):
+    return jsonify({'error': str(error)}), 400
+
+@bp.errorhandler(AcceptanceError)
+def acceptance_error(error):
+    return jsonify({'error': str(error)}), error.status_code
+
 @bp.route('/')
 @login_required
+@cached_page
 def carrier_dashboard():
     """Dashboard del transportista"""
 
@@ -18,6 +38,7 @@ def carrier_dashboard():
 
 @bp.route('/profile')
 @login_required
+@cached_page
 def carrier_profile():
     """Perfil del transportista"""
     if current_user.user_type != UserType.CARRIER:
@@ -32,6 +53,7 @@ def carrier_profile():
 
 @bp.route('/available-loads')
 @login_required
+@cached_page
 def available_loads():
     """Cargas disponibles"""
     if current_user.user_type != UserType.CARRIER:
@@ -42,6 +64,7 @@ def available_loads():
 
 @bp.route('/filter-loads')
 @login_required
+@cached_page
 def filter_loads():
     """Filtrar cargas"""
     if current_user.user_type != UserType.CARRIER:
@@ -52,6 +75,7 @@ def filter_loads():
 
 @bp.route('/manage-loads')
 @login_required
+@cached_page
 def manage_loads():
     """Gestionar cargas"""
     if current_user.user_type != UserType.CARRIER:
@@ -66,6 +90,7 @@ def manage_loads():
 
 @bp.route('/pending-trips')
 @login_required
+@cached_page
 def pending_trips():
     """Viajes pendientes"""
     if current_user.user_type != UserType.CARRIER:
@@ -76,6 +101,7 @@ def pending_trips():
 
 @bp.route('/accepted-trips')
 @login_required
+@cached_page
 def accepted_trips():
     """Viajes aceptados"""
     if current_user.user_type != UserType.CARRIER:
@@ -86,6 +112,7 @@ def accepted_trips():
 
 @bp.route('/completed-trips')
 @login_required
+@cached_page
 def completed_trips():
     """Viajes finalizados"""
     if current_user.user_type != UserType.CARRIER:
@@ -100,6 +127,7 @@ def completed_trips():
 
 @bp.route('/license-insurance')
 @login_required
+@cached_page
 def license_insurance():
     """Licencia y seguros"""
     if current_user.user_type != UserType.CARRIER:
@@ -110,6 +138,7 @@ def license_insurance():
 
 @bp.route('/verification-status')
 @login_required
+@cached_page
 def verification_status():
     """Estado de verificación"""
     if current_user.user_type != UserType.CARRIER:
@@ -120,6 +149,7 @@ def verification_status():
 
 @bp.route('/upload-documents')
 @login_required
+@cached_page
 def upload_documents():
     """Cargar documentos"""
     if current_user.user_type != UserType.CARRIER:
@@ -134,6 +164,7 @@ def upload_documents():
 
 @bp.route('/vehicle-info')
 @login_required
+@cached_page
 def vehicle_info():
     """Información del vehículo"""
     if current_user.user_type != UserType.CARRIER:
@@ -144,6 +175,7 @@ def vehicle_info():
 
 @bp.route('/routes')
 @login_required
+@cached_page
 def routes():
     """Rutas"""
     if current_user.user_type != UserType.CARRIER:
@@ -158,6 +190,7 @@ def routes():
 
 @bp.route('/settings')
 @login_required
+@cached_page
 def settings():
     """Configuración"""
     if current_user.user_type != UserType.CARRIER:
@@ -168,6 +201,7 @@ def settings():
 
 @bp.route('/notifications')
 @login_required
+@cached_page
 def notifications():
     """Notificaciones"""
     if current_user.user_type != UserType.CARRIER:
@@ -187,9 +221,147 @@ def api_available_loads():
     if current_user.user_type != UserType.CARRIER:
         return jsonify({'error': 'No autorizado'}), 403
     
+    lat = request.args.get('lat', type=float)
+    lng = request.args.get('lng', type=float)
+    radius_km = min(request.args.get('radius_km', load_service.DEFAULT_RADIUS_KM, type=float), load_service.MAX_RADIUS_KM)
+    hours = min(request.args.get('hours', load_service.DEFAULT_WINDOW_HOURS, type=int), load_service.MAX_WINDOW_HOURS)
+    limit = parse_page_size(request.args.get('limit'))
+    cursor = request.args.get('cursor')
+    
+    if lat is None or lng is None:
+        # Sin ubicación: cargas abiertas por fecha de recogida
+        shipments, next_cursor = paginate_keyset(
+            load_service.open_loads_query(hours), [Shipment.pickup_date, Shipment.id],
+            cursor=cursor, limit=limit, descending=False
+        )
+        load_service.ensure_route_distances(shipments)
+        return jsonify(page_response(shipments, next_cursor))
+    
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        return jsonify({'error': 'Coordenadas invalidas'}), 400
+    
+    # En la búsqueda por radio la clave de orden es (distancia, id)
+    after = decode_cursor(cursor, 2, types=((int, float), int)) if cursor else None
+    nearby = load_service.find_nearby_loads(lat, lng, radius_km, hours, limit + 1, after=after)
+    next_cursor = None
+    if len(nearby) > limit:
+        nearby = nearby[:limit]
+        last_shipment, last_distance = nearby[-1]
+        next_cursor = encode_cursor([last_distance, last_shipment.id])
+    load_service.ensure_route_distances([shipment for shipment, _ in nearby])
+    
     loads = []
+    for shipment, distance in nearby:
+        data = shipment.to_dict()
+        data['distance_from_you_km'] = round(distance, 1)
+        loads.append(data)
+    return jsonify({'items': loads, 'next_cursor': next_cursor})
+
+@bp.route('/api/recommended-loads')
+@login_required
+def api_recommended_loads():
+    """API con las cargas abiertas más afines al perfil del transportista"""
+    if current_user.user_type != UserType.CARRIER:
+        return jsonify({'error': 'No autorizado'}), 403
+    
+    k = max(1, min(request.args.get('k', DEFAULT_TOP_K, type=int), MAX_TOP_K))
+    ranked = matching_index.top_shipments(current_user.carrier_id, k)
+    load_service.ensure_route_distances([shipment for _, shipment in ranked])
+    profile = matching_index.profile(current_user.carrier_id)
+    
+    loads = []
+    for score, shipment in ranked:
+        data = shipment.to_dict()
+        data['score'] = round(score, 3)
+        data['matches_route'] = profile is not None and lane_key(shipment.origin_city, shipment.destination_city) in profile.lanes
+        loads.append(data)
     return jsonify(loads)
 
+@bp.route('/api/trips')
+@login_required
+def api_trips():
+    """API de viajes del transportista por grupo de estado, paginada por cursor"""
+    if current_user.user_type != UserType.CARRIER:
+        return jsonify({'error': 'No autorizado'}), 403
+    
+    statuses = load_service.STATUS_GROUPS.get(request.args.get('status', 'in_progress'))
+    if statuses is None:
+        return jsonify({'error': 'Estado invalido'}), 400
+    
+    query = Shipment.query.filter(
+        Shipment.carrier_id == current_user.carrier_id,
+        Shipment.status.in_(statuses)
+    )
+    trips, next_cursor = paginate_keyset(
+        query, [Shipment.published_date, Shipment.id],
+        cursor=request.args.get('cursor'), limit=parse_page_size(request.args.get('limit'))
+    )
+    load_service.ensure_route_distances(trips)
+    return jsonify(page_response(trips, next_cursor))
+
+@bp.route('/api/trips/<int:load_id>/trajectory')
+@login_required
+def api_trip_trajectory(load_id):
+    """API con el recorrido simplificado de un viaje del transportista"""
+    if current_user.user_type != UserType.CARRIER:
+        return jsonify({'error': 'No autorizado'}), 403
+    
+    shipment = Shipment.query.get_or_404(load_id)
+    if shipment.carrier_id != current_user.carrier_id:
+        return jsonify({'error': 'No autorizado'}), 403
+    
+    tolerance_m = max(0.0, min(request.args.get('tolerance_m', 25.0, type=float), 5000.0))
+    return jsonify(trajectory_service.replay(shipment.id, tolerance_m))
+
+@bp.route('/api/notifications')
+@login_required
+def api_notifications():
+    """API para obtener notificaciones, paginada por cursor"""
+    if current_user.user_type != UserType.CARRIER:
+        return jsonify({'error': 'No autorizado'}), 403
+    
+    query = Notification.query.filter(Notification.user_id == current_user.id)
+    if request.args.get('unread') == '1':
+        query = query.filter(Notification.is_read.is_(False))
+    notifications, next_cursor = paginate_keyset(
+        query, [Notification.created_date, Notification.id],
+        cursor=request.args.get('cursor'), limit=parse_page_size(request.args.get('limit'))
+    )
+    return jsonify(page_response(notifications, next_cursor))
+
+@bp.route('/api/compliance')
+@login_required
+def api_compliance():
+    """API de vigencia documental y próximos vencimientos del transportista"""
+    if current_user.user_type != UserType.CARRIER:
+        return jsonify({'error': 'No autorizado'}), 403
+    
+    carrier = Carrier.query.get(current_user.carrier_id) if current_user.carrier_id else None
+    if carrier is None:
+        return jsonify({'error': 'Perfil de transportista no encontrado'}), 404
+    
+    days = request.args.get('days', 90, type=int)
+    calendar = expiry_calendar(days=max(1, min(days, 365)), carrier_ids=[carrier.id])
+    return jsonify({
+        'is_compliant': carrier.is_compliant,
+        'valid_until': carrier.compliance_valid_until.isoformat() if carrier.compliance_valid_until else None,
+        'calendar': [
+            {
+                'date': day.isoformat(),
+                'items': [
+                    {
+                        'kind': item['kind'],
+                        'label': item['label'],
+                        'vehicle_id': item['vehicle_id'],
+                        'document_id': item['document_id']
+                    }
+                    for item in items
+                ]
+            }
+            for day, items in calendar
+        ]
+    })
+
 @bp.route('/api/accept-load/<int:load_id>', methods=['POST'])
 @login_required
 def api_accept_load(load_id):
@@ -197,16 +369,62 @@ def api_accept_load(load_id):
     if current_user.user_type != UserType.CARRIER:
         return jsonify({'error': 'No autorizado'}), 403
     
-    # Lógica para aceptar carga
+    if current_user.carrier_id is None:
+        return jsonify({'error': 'Perfil de transportista no encontrado'}), 404
+    
+    quote = accept_quote(load_id, current_user.carrier_id, direct=True)
     flash('Carga aceptada exitosamente', 'success')
-    return jsonify({'success': True, 'message': 'Carga aceptada'})
+    return jsonify({
+        'success': True,
+        'message': 'Carga aceptada',
+        'quote_id': quote.id,
+        'final_price': float(quote.counter_offer or quote.bid_amount)
+    })
 
 @bp.route('/api/update-location', methods=['POST'])
 @login_required
 def api_update_location():
-    """API para actualizar ubicación"""
+    """API para reportar uno o varios puntos GPS; se escriben por lotes"""
     if current_user.user_type != UserType.CARRIER:
         return jsonify({'error': 'No autorizado'}), 403
     
-    # Lógica para actualizar ubicación
-    return jsonify({'success': True, 'message': 'Ubicación actualizada'})
\ No newline at end of file
+    data = request.get_json(silent=True)
+    if data is None:
+        return jsonify({'error': 'Se esperaba un cuerpo JSON'}), 400
+    raw_points = data.get('points') if isinstance(data, dict) and 'points' in data else [data]
+    if not isinstance(raw_points, list) or not raw_points:
+        return jsonify({'error': 'Sin puntos para registrar'}), 400
+    if len(raw_points) > MAX_POINTS_PER_REQUEST:
+        return jsonify({'error': f'Maximo {MAX_POINTS_PER_REQUEST} puntos por solicitud'}), 413
+    
+    try:
+        points = [parse_point(point) for point in raw_points]
+    except InvalidPoint as e:
+        return jsonify({'error': str(e)}), 400
+    
+    allowed = trackable_shipment_ids(current_user.carrier_id, {point[0] for point in points})
+    valid_points = [point for point in points if point[0] in allowed]
+    rejected = len(points) - len(valid_points)
+    
+    result = location_buffer.add(valid_points)
+    backpressure = location_buffer.backpressure()
+    if result is None:
+        backpressure['retry_after'] = max(1, backpressure['retry_after'])
+        response = jsonify({
+            'success': False,
+            'error': 'Buffer de ubicaciones lleno, reintenta mas tarde',
+            'backpressure': backpressure
+        })
+        response.status_code = 429
+        response.headers['Retry-After'] = str(backpressure['retry_after'])
+        return response
+    
+    accepted, duplicates = result
+    return jsonify({
+        'success': True,
+        'message': 'Ubicación registrada',
+        'accepted': accepted,
+        'duplicates': duplicates,
+        'rejected': rejected,
+        'backpressure': backpressure
+    }), 202
\ No newline at end of file
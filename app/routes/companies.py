@@ -1,11 +1,34 @@
-from flask import Blueprint, render_template, flash, redirect, url_for, request, jsonify
+from flask import Blueprint, render_template, flash, redirect, url_for, request, jsonify, current_app, Response
 from flask_login import login_required, current_user
 from app.models.user import UserType 
+from app.models.shipment import Shipment
+from app.models.carrier import Carrier
+from app.models.notification import Notification
+from app.models.quote import Quote, QuoteStatus
+from app.pagination import InvalidCursor, paginate_keyset, parse_page_size, page_response, encode_cursor, decode_cursor
+from app.services import loads as load_service
+from app.services import trajectory as trajectory_service
+from app.services import stats as stats_service
+from app.services import driver_search
+from app.services.quotes import AcceptanceError, accept_quote
+from app.services.matching import matching_index, DEFAULT_TOP_K, MAX_TOP_K
+from app.services.pubsub import StreamLimitReached, broker, event_stream
+from app.services.page_cache import cached_page
+from app import db
 
 bp = Blueprint('companies', __name__)
 
+@bp.errorhandler(InvalidCursor)
+def invalid_cursor(error):
+    return jsonify({'error': str(error)}), 400
+
+@bp.errorhandler(AcceptanceError)
+def acceptance_error(error):
+    return jsonify({'error': str(error)}), error.status_code
+
 @bp.route('/')
 @login_required
+@cached_page
 def company_dashboard():
     """Dashboard principal de la empresa"""
     if current_user.user_type != UserType.COMPANY:
@@ -16,6 +39,7 @@ def company_dashboard():
 
 @bp.route('/profile')
 @login_required
+@cached_page
 def company_profile():
     """Perfil de la empresa"""
     if current_user.user_type != UserType.COMPANY:
@@ -26,6 +50,7 @@ def company_profile():
 
 @bp.route('/publish-load')
 @login_required
+@cached_page
 def publish_load():
     """Publicar nueva carga"""
     if current_user.user_type != UserType.COMPANY:
@@ -36,6 +61,7 @@ def publish_load():
 
 @bp.route('/find-drivers')
 @login_required
+@cached_page
 def find_drivers():
     """Buscar conductores disponibles"""
     if current_user.user_type != UserType.COMPANY:
@@ -46,6 +72,7 @@ def find_drivers():
 
 @bp.route('/published-loads')
 @login_required
+@cached_page
 def published_loads():
     """Cargas publicadas por la empresa"""
     if current_user.user_type != UserType.COMPANY:
@@ -56,6 +83,7 @@ def published_loads():
 
 @bp.route('/in-progress-loads')
 @login_required
+@cached_page
 def in_progress_loads():
     """Cargas en curso"""
     if current_user.user_type != UserType.COMPANY:
@@ -66,6 +94,7 @@ def in_progress_loads():
 
 @bp.route('/completed-loads')
 @login_required
+@cached_page
 def completed_loads():
     """Cargas completadas"""
     if current_user.user_type != UserType.COMPANY:
@@ -76,6 +105,7 @@ def completed_loads():
 
 @bp.route('/statistics')
 @login_required
+@cached_page
 def statistics():
     """Estadísticas de la empresa"""
     if current_user.user_type != UserType.COMPANY:
@@ -86,6 +116,7 @@ def statistics():
 
 @bp.route('/settings')
 @login_required
+@cached_page
 def settings():
     """Configuración de la empresa"""
     if current_user.user_type != UserType.COMPANY:
@@ -96,6 +127,7 @@ def settings():
 
 @bp.route('/notifications')
 @login_required
+@cached_page
 def notifications():
     """Notificaciones de la empresa"""
     if current_user.user_type != UserType.COMPANY:
@@ -106,6 +138,7 @@ def notifications():
 
 @bp.route('/help')
 @login_required
+@cached_page
 def help():
     """Centro de ayuda"""
     if current_user.user_type != UserType.COMPANY:
@@ -180,9 +213,14 @@ def accept_driver(load_id, driver_id):
     if current_user.user_type != UserType.COMPANY:
         return jsonify({'error': 'No autorizado'}), 403
     
-    # Lógica para aceptar conductor
+    quote = accept_quote(load_id, driver_id, company_id=current_user.company_id)
     flash('Conductor aceptado para la carga', 'success')
-    return jsonify({'success': True, 'message': 'Conductor aceptado'})
+    return jsonify({
+        'success': True,
+        'message': 'Conductor aceptado',
+        'quote_id': quote.id,
+        'final_price': float(quote.counter_offer or quote.bid_amount)
+    })
 
 @bp.route('/load/<int:load_id>/complete', methods=['POST'])
 @login_required
@@ -213,14 +251,8 @@ def api_statistics():
     if current_user.user_type != UserType.COMPANY:
         return jsonify({'error': 'No autorizado'}), 403
     
-    stats = {
-        'total_loads': 0,
-        'in_progress': 0,
-        'completed': 0,
-        'total_spent': 0,
-        'average_rating': 0
-    }
-    return jsonify(stats)
+    stats = stats_service.company_stats(current_user.company_id)
+    return jsonify(stats.to_dict())
 
 @bp.route('/api/search-drivers')
 @login_required
@@ -229,20 +261,189 @@ def api_search_drivers():
     if current_user.user_type != UserType.COMPANY:
         return jsonify({'error': 'No autorizado'}), 403
     
-    search_query = request.args.get('q', '')
-    # Lógica de búsqueda
+    limit = parse_page_size(request.args.get('limit'))
+    cursor = request.args.get('cursor')
+    
+    # La clave de orden es (puntaje, id), de mayor a menor
+    after = decode_cursor(cursor, 2, types=((int, float), int)) if cursor else None
+    ranked = driver_search.search_drivers(request.args.get('q', ''), limit + 1, after=after)
+    next_cursor = None
+    if len(ranked) > limit:
+        ranked = ranked[:limit]
+        next_cursor = encode_cursor(list(ranked[-1]))
+    return jsonify({'items': driver_search.search_results(ranked), 'next_cursor': next_cursor})
+
+@bp.route('/api/driver/<int:driver_id>/reputation')
+@login_required
+def api_driver_reputation(driver_id):
+    """API con la reputación agregada y el histograma de calificaciones de un conductor"""
+    if current_user.user_type != UserType.COMPANY:
+        return jsonify({'error': 'No autorizado'}), 403
+    
+    carrier = Carrier.query.get_or_404(driver_id)
+    return jsonify(stats_service.carrier_reputation(carrier))
+
+@bp.route('/api/load/<int:load_id>/matching-drivers')
+@login_required
+def api_matching_drivers(load_id):
+    """API con los conductores elegibles mejor puntuados para una carga"""
+    if current_user.user_type != UserType.COMPANY:
+        return jsonify({'error': 'No autorizado'}), 403
+    
+    shipment = Shipment.query.get_or_404(load_id)
+    if shipment.company_id != current_user.company_id:
+        return jsonify({'error': 'No autorizado'}), 403
+    
+    k = max(1, min(request.args.get('k', DEFAULT_TOP_K, type=int), MAX_TOP_K))
+    ranked = matching_index.top_carriers(shipment, k, lane_only=request.args.get('lane_only') == '1')
+    # Ciudad, vehículos y especialidades para la tarjeta de "Buscar conductores", en una consulta
+    details = {
+        item['id']: item
+        for item in driver_search.search_results([(score, profile.carrier_id) for score, profile in ranked])
+    }
     drivers = []
+    for score, profile in ranked:
+        data = dict(details.get(profile.carrier_id, {}))
+        data.update(profile.to_dict())
+        data['score'] = round(score, 3)
+        drivers.append(data)
     return jsonify(drivers)
 
+@bp.route('/api/load/<int:load_id>/trajectory')
+@login_required
+def api_load_trajectory(load_id):
+    """API con el recorrido simplificado de una carga para el mapa"""
+    if current_user.user_type != UserType.COMPANY:
+        return jsonify({'error': 'No autorizado'}), 403
+    
+    shipment = Shipment.query.get_or_404(load_id)
+    if shipment.company_id != current_user.company_id:
+        return jsonify({'error': 'No autorizado'}), 403
+    
+    tolerance_m = max(0.0, min(request.args.get('tolerance_m', 25.0, type=float), 5000.0))
+    return jsonify(trajectory_service.replay(shipment.id, tolerance_m))
+
+def _sse_response(topics, snapshot):
+    """Suscribir antes de soltar la conexión a la base y devolver el stream"""
+    heartbeat = current_app.config.get('SSE_HEARTBEAT_INTERVAL', 15.0)
+    try:
+        subscription = broker.subscribe(topics, current_app.config.get('SSE_QUEUE_SIZE', 100))
+    except StreamLimitReached:
+        # Cada stream retiene un hilo: con el cupo lleno se rechaza en vez de bloquear el sitio
+        response = jsonify({'error': 'Demasiados streams abiertos, intenta más tarde'})
+        response.headers['Retry-After'] = str(int(heartbeat))
+        return response, 503
+    # El stream puede durar minutos: no retener una conexión del pool
+    db.session.close()
+    stream = event_stream(
+        subscription, snapshot,
+        heartbeat=heartbeat,
+        max_duration=current_app.config.get('SSE_MAX_DURATION', 300.0)
+    )
+    response = Response(stream, mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+    # Si el cliente se va antes de que empiece el generador, su finally no corre
+    response.call_on_close(lambda: broker.unsubscribe(subscription))
+    return response
+
+def _location_snapshot(shipment):
+    return {
+        'shipment_id': shipment.id,
+        'status': shipment.status.value if shipment.status else None,
+        'location': shipment.current_location,
+        'timestamp': shipment.last_update.isoformat() if shipment.last_update else None
+    }
+
+@bp.route('/api/load/<int:load_id>/quotes')
+@login_required
+def api_load_quotes(load_id):
+    """API de ofertas de una carga; por defecto solo las pendientes"""
+    if current_user.user_type != UserType.COMPANY:
+        return jsonify({'error': 'No autorizado'}), 403
+    
+    shipment = Shipment.query.get_or_404(load_id)
+    if shipment.company_id != current_user.company_id:
+        return jsonify({'error': 'No autorizado'}), 403
+    
+    try:
+        status = QuoteStatus(request.args.get('status', QuoteStatus.PENDING.value))
+    except ValueError:
+        return jsonify({'error': 'Estado de oferta invalido'}), 400
+    
+    # Las vencidas las marca el barredor (flask expire-quotes): basta filtrar por estado
+    query = Quote.query.filter(Quote.shipment_id == shipment.id, Quote.status == status)
+    quotes, next_cursor = paginate_keyset(
+        query, [Quote.bid_date, Quote.id],
+        cursor=request.args.get('cursor'), limit=parse_page_size(request.args.get('limit'))
+    )
+    return jsonify(page_response(quotes, next_cursor))
+
+@bp.route('/api/load/<int:load_id>/stream')
+@login_required
+def api_load_stream(load_id):
+    """Stream SSE con la ubicación en vivo de una carga"""
+    if current_user.user_type != UserType.COMPANY:
+        return jsonify({'error': 'No autorizado'}), 403
+    
+    shipment = Shipment.query.get_or_404(load_id)
+    if shipment.company_id != current_user.company_id:
+        return jsonify({'error': 'No autorizado'}), 403
+    
+    return _sse_response([f'shipment:{shipment.id}'], _location_snapshot(shipment))
+
+@bp.route('/api/stream')
+@login_required
+def api_company_stream():
+    """Stream SSE con la ubicación en vivo de todas las cargas en curso de la empresa"""
+    if current_user.user_type != UserType.COMPANY:
+        return jsonify({'error': 'No autorizado'}), 403
+    
+    shipments = Shipment.query.filter(
+        Shipment.company_id == current_user.company_id,
+        Shipment.status.in_(load_service.STATUS_GROUPS['in_progress'])
+    ).all()
+    snapshot = {'shipments': [_location_snapshot(shipment) for shipment in shipments]}
+    return _sse_response([f'company:{current_user.company_id}'], snapshot)
+
+@bp.route('/api/loads')
+@login_required
+def api_loads():
+    """API de cargas de la empresa por grupo de estado, paginada por cursor"""
+    if current_user.user_type != UserType.COMPANY:
+        return jsonify({'error': 'No autorizado'}), 403
+    
+    statuses = load_service.STATUS_GROUPS.get(request.args.get('status', 'published'))
+    if statuses is None:
+        return jsonify({'error': 'Estado invalido'}), 400
+    
+    query = Shipment.query.filter(
+        Shipment.company_id == current_user.company_id,
+        Shipment.status.in_(statuses)
+    )
+    loads, next_cursor = paginate_keyset(
+        query, [Shipment.published_date, Shipment.id],
+        cursor=request.args.get('cursor'), limit=parse_page_size(request.args.get('limit'))
+    )
+    load_service.ensure_route_distances(loads)
+    return jsonify(page_response(loads, next_cursor))
+
 @bp.route('/api/notifications')
 @login_required
 def api_notifications():
-    """API para obtener notificaciones"""
+    """API para obtener notificaciones, paginada por cursor"""
     if current_user.user_type != UserType.COMPANY:
         return jsonify({'error': 'No autorizado'}), 403
     
-    notifications = []
-    return jsonify(notifications)
+    query = Notification.query.filter(Notification.user_id == current_user.id)
+    if request.args.get('unread') == '1':
+        query = query.filter(Notification.is_read.is_(False))
+    notifications, next_cursor = paginate_keyset(
+        query, [Notification.created_date, Notification.id],
+        cursor=request.args.get('cursor'), limit=parse_page_size(request.args.get('limit'))
+    )
+    return jsonify(page_response(notifications, next_cursor))
 
 @bp.route('/update-profile', methods=['POST'])
 @login_required
@@ -281,6 +482,7 @@ def upload_document():
 
 @bp.route('/documents')
 @login_required
+@cached_page
 def documents():
     """Gestión de documentos"""
     if current_user.user_type != UserType.COMPANY:
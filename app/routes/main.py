@@ -1,8 +1,91 @@
-from flask import Blueprint, render_template
+import hmac
+import mimetypes
+
+from flask import Blueprint, render_template, request, jsonify, current_app, abort, send_file
+from flask_login import login_required, current_user
+from app.models.conversation import Conversation
+from app.models.message import Message
+from app.pagination import InvalidCursor, paginate_keyset, parse_page_size, page_response
+from app.services.assets import asset_manifest
+from app.services.blobs import EXTENSIONS, blob_path, public_blob, store_root
+from app.services.metrics import metrics
 
 bp = Blueprint('main', __name__)
 
+@bp.errorhandler(InvalidCursor)
+def invalid_cursor(error):
+    return jsonify({'error': str(error)}), 400
+
 @bp.route('/')
 def index():
     """Main landing page"""
-    return render_template('main/index.html')
\ No newline at end of file
+    return render_template('main/index.html')
+
+@bp.route('/api/conversations/<int:conversation_id>/messages')
+@login_required
+def api_conversation_messages(conversation_id):
+    """API de mensajes de una conversación, del más reciente al más antiguo"""
+    conversation = Conversation.query.get_or_404(conversation_id)
+    if current_user.id not in (conversation.user1_id, conversation.user2_id):
+        return jsonify({'error': 'No autorizado'}), 403
+    
+    query = Message.query.filter(Message.conversation_id == conversation.id)
+    messages, next_cursor = paginate_keyset(
+        query, [Message.sent_date, Message.id],
+        cursor=request.args.get('cursor'), limit=parse_page_size(request.args.get('limit'))
+    )
+    return jsonify(page_response(messages, next_cursor))
+
+@bp.route('/assets/<path:filename>')
+def asset(filename):
+    """Archivo estático con huella de contenido; se sirve precomprimido si el navegador lo acepta"""
+    found = asset_manifest.lookup(filename)
+    if found is None:
+        abort(404)
+    path, entry = found
+    encoding = next(
+        (name for name in ('br', 'gzip') if name in entry['encodings'] and name in request.accept_encodings),
+        None
+    )
+    response = send_file(
+        path + {'br': '.br', 'gzip': '.gz'}.get(encoding, ''),
+        mimetype=mimetypes.guess_type(entry['source'])[0],
+        etag=f"{entry['etag']}-{encoding}" if encoding else entry['etag'],
+        max_age=365 * 24 * 3600,
+        conditional=True
+    )
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+@bp.route('/media/<sha256>.<extension>')
+def media_blob(sha256, extension):
+    """Archivo público del almacén por contenido; la URL cambia con el contenido, así que es inmutable"""
+    blob = public_blob(sha256)
+    if blob is None or EXTENSIONS.get(blob.mime_type) != extension:
+        abort(404)
+    response = send_file(
+        blob_path(store_root(), blob.sha256),
+        mimetype=blob.mime_type,
+        etag=blob.sha256,
+        max_age=365 * 24 * 3600,
+        conditional=True
+    )
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+@bp.route('/metrics')
+def metrics_snapshot():
+    """Métricas del proceso en JSON; solo con METRICS_TOKEN definido y enviado como Bearer"""
+    token = current_app.config.get('METRICS_TOKEN')
+    # Sin token configurado el endpoint no existe: expone pools, réplicas y errores
+    if not token:
+        abort(404)
+    provided = request.headers.get('Authorization', '').removeprefix('Bearer ')
+    if not hmac.compare_digest(provided, token):
+        abort(403)
+    return jsonify(metrics.snapshot())
\ No newline at end of file
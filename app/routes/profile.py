@@ -1,46 +1,103 @@
-from flask import Blueprint, request, flash, redirect, url_for, current_app
-from werkzeug.utils import secure_filename
-import os
-from app import db
-from app.models.user import User
+from datetime import datetime
+
+from flask import Blueprint, request, flash, redirect, url_for, current_app, jsonify
+from flask_login import login_required, current_user
+from app.models.document import DocumentType
+from app.models.media import Media
+from app.models.user import UserType
+from app.services.uploads import UploadError, upload_document, upload_profile_picture
 
 bp = Blueprint('profile', __name__)
 
-def allowed_file(filename):
-    return '.' in filename and \
-        filename.rsplit('.', 1)[1].lower() in current_app.config['ALLOWED_EXTENSIONS']
+# Margen para los encabezados del multipart al comparar Content-Length con el límite del archivo
+MULTIPART_OVERHEAD = 64 * 1024
+
+def wants_json():
+    return request.accept_mimetypes.best == 'application/json'
+
+def profile_page():
+    if current_user.user_type == UserType.COMPANY:
+        return url_for('companies.company_profile')
+    return url_for('carriers.carrier_profile')
+
+def body_too_large(max_bytes):
+    """Rechazar por Content-Length antes de leer el cuerpo"""
+    return request.content_length is not None and request.content_length > max_bytes + MULTIPART_OVERHEAD
 
 @bp.route('/profile/picture', methods=['POST'])
+@login_required
 def update_profile_picture():
-    """Actualizar foto de perfil del usuario"""
-    # Aquí necesitarías tener el usuario logueado
-    # user_id = current_user.id  # Si usas Flask-Login
-    user_id = 1  # Temporal - reemplazar con el usuario actual
+    """Actualizar foto de perfil del usuario; el redimensionado sigue en segundo plano"""
+    if body_too_large(current_app.config['PROFILE_PICTURE_MAX_BYTES']):
+        error = 'La imagen supera el tamaño máximo permitido.'
+        if wants_json():
+            return jsonify({'error': error}), 413
+        flash(error, 'error')
+        return redirect(profile_page())
     
-    if 'profile_picture' not in request.files:
+    file = request.files.get('profile_picture')
+    if file is None or file.filename == '':
+        if wants_json():
+            return jsonify({'error': 'No se seleccionó ningún archivo'}), 400
         flash('No se seleccionó ningún archivo.', 'error')
-        return redirect(url_for('auth.welcome_company'))  # O la página correspondiente
+        return redirect(profile_page())
     
-    file = request.files['profile_picture']
+    try:
+        media = upload_profile_picture(current_user, file)
+    except UploadError as error:
+        if wants_json():
+            return jsonify({'error': str(error)}), error.status_code
+        flash('Tipo de archivo no permitido. Use PNG, JPG, JPEG o GIF.' if error.status_code == 400 else str(error), 'error')
+        return redirect(profile_page())
     
-    if file.filename == '':
-        flash('No se seleccionó ningún archivo.', 'error')
-        return redirect(url_for('auth.welcome_company'))
-    
-    if file and allowed_file(file.filename):
-        filename = secure_filename(file.filename)
-        # Renombrar el archivo para evitar conflictos
-        unique_filename = f"user_{user_id}_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}_{filename}"
-        file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], unique_filename)
-        file.save(file_path)
-        
-        # Actualizar en la base de datos
-        user = User.query.get(user_id)
-        user.profile_picture = unique_filename
-        db.session.commit()
-        
-        flash('Foto de perfil actualizada correctamente.', 'success')
-    else:
-        flash('Tipo de archivo no permitido. Use PNG, JPG, JPEG o GIF.', 'error')
-    
-    return redirect(url_for('auth.welcome_company'))
\ No newline at end of file
+    if wants_json():
+        return jsonify({
+            'media_id': media.id,
+            'status': media.processing_status.value,
+            'status_url': url_for('profile.media_status', media_id=media.id)
+        }), 202
+    flash('Foto de perfil recibida; estará disponible en unos segundos.', 'success')
+    return redirect(profile_page())
+
+@bp.route('/profile/media/<int:media_id>')
+@login_required
+def media_status(media_id):
+    """Estado del procesamiento de un archivo subido por el usuario"""
+    media = Media.query.get_or_404(media_id)
+    if media.uploaded_by != current_user.id:
+        return jsonify({'error': 'No autorizado'}), 403
+    return jsonify(media.to_dict())
+
+@bp.route('/profile/documents', methods=['POST'])
+@login_required
+def upload_profile_document():
+    """Subir un documento (licencia, seguro, RUT...) del perfil"""
+    if body_too_large(current_app.config['MAX_CONTENT_LENGTH']):
+        return jsonify({'error': 'El archivo supera el tamaño máximo permitido'}), 413
+    
+    try:
+        document_type = DocumentType(request.form.get('document_type', ''))
+    except ValueError:
+        return jsonify({'error': 'Tipo de documento invalido'}), 400
+    
+    expiry_date = None
+    if request.form.get('expiry_date'):
+        try:
+            expiry_date = datetime.strptime(request.form['expiry_date'], '%Y-%m-%d').date()
+        except ValueError:
+            return jsonify({'error': 'Fecha de vencimiento invalida (AAAA-MM-DD)'}), 400
+    
+    file = request.files.get('document')
+    if file is None or file.filename == '':
+        return jsonify({'error': 'No se seleccionó ningún archivo'}), 400
+    
+    try:
+        document = upload_document(current_user, file, document_type, expiry_date)
+    except UploadError as error:
+        return jsonify({'error': str(error)}), error.status_code
+    
+    return jsonify({
+        'success': True,
+        'document_id': document.id,
+        'status': document.status.value if document.status else None
+    }), 201
\ No newline at end of file
@@ -0,0 +1,150 @@
+import gzip
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import posixpath
+import tempfile
+
+from flask import url_for
+
+from app.services.blobs import resolve_folder
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = 'manifest.json'
+HASH_LENGTH = 12
+# Carpetas de static que no son del código: archivos subidos anteriores al almacén por contenido
+EXCLUDED_DIRS = ('uploads',)
+# Solo vale la pena precomprimir texto; jpg/png ya vienen comprimidos
+COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/json', 'image/svg+xml')
+MIN_COMPRESS_BYTES = 512
+
+
+def _brotli():
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+
+def fingerprinted_name(filename, digest):
+    """css/base.css -> css/base.<hash>.css"""
+    root, extension = posixpath.splitext(filename)
+    return f'{root}.{digest[:HASH_LENGTH]}{extension}'
+
+
+def _write_atomic(path, data):
+    """Escribir con temporal y os.replace: varios workers pueden construir a la vez"""
+    if os.path.exists(path):
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    descriptor, temporary_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.asset-')
+    with os.fdopen(descriptor, 'wb') as target:
+        target.write(data)
+    os.replace(temporary_path, path)
+
+
+def _compressible(filename):
+    mime_type = mimetypes.guess_type(filename)[0] or ''
+    return mime_type.startswith(COMPRESSIBLE_TYPES)
+
+
+class AssetManifest:
+    """Manifiesto de archivos estáticos con huella de contenido.
+
+    build() copia cada archivo de static a la carpeta de compilación con el
+    hash en el nombre, junto con sus versiones .gz y .br (si está instalado
+    el paquete brotli), y guarda manifest.json. Como el nombre cambia con el
+    contenido, /assets los sirve como inmutables. Sin manifiesto, asset_url
+    cae en /static y nada se rompe.
+    """
+
+    def __init__(self):
+        self.folder = None
+        self.entries = {}
+        self.files = {}
+
+    def init_app(self, app):
+        with app.app_context():
+            self.folder = resolve_folder(app.config['ASSET_BUILD_FOLDER'])
+        if app.config.get('ASSETS_BUILD_ON_STARTUP'):
+            self.build(app.static_folder)
+        else:
+            self.load()
+        app.add_template_global(asset_url)
+
+    def _set(self, entries):
+        self.entries = entries
+        self.files = {entry['file']: dict(entry, source=name) for name, entry in entries.items()}
+
+    def load(self):
+        """Leer el manifest.json de un flask build-assets previo; devuelve cuántos archivos tiene"""
+        path = os.path.join(self.folder, MANIFEST_NAME)
+        try:
+            with open(path, encoding='utf-8') as source:
+                self._set(json.load(source))
+        except FileNotFoundError:
+            logger.warning('Sin manifiesto de assets en %s: se sirven sin huella desde /static', path)
+            self._set({})
+        return len(self.entries)
+
+    def build(self, static_folder):
+        """Huella, copia y precompresión de todo static; lo ya construido se reutiliza"""
+        brotli = _brotli()
+        entries = {}
+        for directory, subdirectories, file_names in os.walk(static_folder):
+            if directory == static_folder:
+                subdirectories[:] = [name for name in subdirectories if name not in EXCLUDED_DIRS]
+            for file_name in file_names:
+                if file_name.startswith('.'):
+                    continue
+                path = os.path.join(directory, file_name)
+                name = os.path.relpath(path, static_folder).replace(os.sep, '/')
+                with open(path, 'rb') as source:
+                    data = source.read()
+                digest = hashlib.sha256(data).hexdigest()
+                target = fingerprinted_name(name, digest)
+                target_path = os.path.join(self.folder, target)
+                _write_atomic(target_path, data)
+                encodings = []
+                if _compressible(name) and len(data) >= MIN_COMPRESS_BYTES:
+                    # mtime=0: el .gz es idéntico en cada compilación y entre workers
+                    _write_atomic(target_path + '.gz', gzip.compress(data, compresslevel=9, mtime=0))
+                    encodings.append('gzip')
+                    if brotli is not None:
+                        _write_atomic(target_path + '.br', brotli.compress(data, quality=11))
+                        encodings.append('br')
+                entries[name] = {'file': target, 'etag': digest, 'size': len(data), 'encodings': encodings}
+
+        os.makedirs(self.folder, exist_ok=True)
+        manifest_path = os.path.join(self.folder, MANIFEST_NAME)
+        descriptor, temporary_path = tempfile.mkstemp(dir=self.folder, prefix='.manifest-')
+        with os.fdopen(descriptor, 'w', encoding='utf-8') as target:
+            json.dump(entries, target, indent=2, sort_keys=True)
+        os.replace(temporary_path, manifest_path)
+        self._set(entries)
+        return len(entries)
+
+    def url(self, filename):
+        entry = self.entries.get(filename)
+        if entry is None:
+            return url_for('static', filename=filename)
+        return url_for('main.asset', filename=entry['file'])
+
+    def lookup(self, fingerprinted):
+        """(ruta, entrada) de un nombre con huella del manifiesto; None si no existe"""
+        entry = self.files.get(fingerprinted)
+        if entry is None:
+            return None
+        return os.path.join(self.folder, entry['file']), entry
+
+
+asset_manifest = AssetManifest()
+
+
+def asset_url(filename):
+    """Reemplazo de url_for('static', filename=...) para las plantillas: URL con huella si existe"""
+    return asset_manifest.url(filename)
\ No newline at end of file
@@ -0,0 +1,293 @@
+import hashlib
+import os
+import re
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import bindparam, delete, event, func, insert, select, update
+from sqlalchemy.orm import Session
+
+from app import db
+from app.models.blob import Blob
+from app.models.document import Document
+from app.models.media import Media
+from app.services.stats import changed_values, upsert_deltas
+
+SHA256_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+DEFAULT_GC_GRACE_MINUTES = 60
+EXTENSIONS = {
+    'image/jpeg': 'jpg',
+    'image/png': 'png',
+    'image/gif': 'gif',
+    'application/pdf': 'pdf',
+}
+
+
+def resolve_folder(folder):
+    """Ruta absoluta de una carpeta de la configuración (relativa a la raíz del proyecto)"""
+    if os.path.isabs(folder):
+        return folder
+    return os.path.join(os.path.dirname(current_app.root_path), folder)
+
+
+def store_root():
+    return resolve_folder(current_app.config['BLOB_STORE_FOLDER'])
+
+
+def blob_key(sha256):
+    """Ruta relativa dentro del almacén, repartida en dos niveles de 256 carpetas"""
+    return f'{sha256[:2]}/{sha256[2:4]}/{sha256}'
+
+
+def blob_path(root, sha256):
+    return os.path.join(root, sha256[:2], sha256[2:4], sha256)
+
+
+def blob_url(sha256, mime_type):
+    """URL pública e inmutable de un blob: cambia si y solo si cambia el contenido"""
+    extension = EXTENSIONS.get(mime_type, 'bin')
+    return f'/media/{sha256}.{extension}'
+
+
+def temporary_file(root):
+    """(descriptor, ruta) de un temporal dentro del almacén, para mover con os.replace"""
+    directory = os.path.join(root, 'tmp')
+    os.makedirs(directory, exist_ok=True)
+    return tempfile.mkstemp(dir=directory, prefix='.blob-')
+
+
+def commit_file(root, temporary_path, sha256):
+    """Mover un temporal ya hasheado a su ruta definitiva; devuelve True si el contenido era nuevo.
+
+    Si el contenido ya estaba guardado se descarta el temporal: la segunda
+    copia no ocupa disco.
+    """
+    path = blob_path(root, sha256)
+    if os.path.exists(path):
+        try:
+            # El mtime marca el último uso para la recolección de archivos sin fila
+            os.utime(path)
+        except FileNotFoundError:
+            # blob-gc lo borró entre exists y utime: se guarda el temporal
+            pass
+        else:
+            os.unlink(temporary_path)
+            return False
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    os.replace(temporary_path, path)
+    return True
+
+
+def write_bytes(root, data):
+    """Guardar un contenido pequeño ya en memoria; devuelve su sha256.
+
+    Solo usa el sistema de archivos, así que puede llamarse desde el pool de
+    procesos de imágenes.
+    """
+    sha256 = hashlib.sha256(data).hexdigest()
+    descriptor, temporary_path = temporary_file(root)
+    with os.fdopen(descriptor, 'wb') as target:
+        target.write(data)
+    commit_file(root, temporary_path, sha256)
+    return sha256
+
+
+def register_blob(connection, sha256, size, mime_type, public=False):
+    """Dar de alta la fila del blob, o renovar su fecha si ya existía, sin tocar ref_count.
+
+    Renovar updated_date protege al blob de blob-gc mientras la fila que lo
+    va a referenciar termina de confirmarse.
+    """
+    table = Blob.__table__
+    now = datetime.utcnow()
+    values = {
+        'sha256': sha256, 'size': size, 'mime_type': mime_type, 'is_public': public,
+        'ref_count': 0, 'created_date': now, 'updated_date': now
+    }
+    if connection.dialect.name in ('postgresql', 'sqlite'):
+        if connection.dialect.name == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        statement = dialect_insert(table).values(values)
+        connection.execute(statement.on_conflict_do_update(
+            index_elements=['sha256'],
+            set_={'updated_date': now, 'is_public': table.c.is_public | statement.excluded.is_public}
+        ))
+        return
+
+    changes = {'updated_date': now}
+    if public:
+        changes['is_public'] = True
+    if connection.execute(update(table).where(table.c.sha256 == sha256).values(changes)).rowcount == 0:
+        connection.execute(insert(table).values(values))
+
+
+def media_refs(variants):
+    """Blobs que referencia un Media: uno por variante"""
+    return {variant['sha256'] for variant in (variants or {}).values() if variant.get('sha256')}
+
+
+def _ref_deltas(session):
+    deltas = {}
+
+    def add(sha256, amount):
+        if sha256:
+            deltas[(sha256,)] = deltas.get((sha256,), 0) + amount
+
+    for sign, objects in ((1, session.new), (0, session.dirty), (-1, session.deleted)):
+        for obj in objects:
+            if isinstance(obj, Media):
+                old, new = changed_values(obj, 'variants')
+                before, after = media_refs(old), media_refs(new)
+            elif isinstance(obj, Document):
+                old, new = changed_values(obj, 'sha256')
+                before, after = {old} - {None}, {new} - {None}
+            else:
+                continue
+            if sign == 1:
+                before = set()
+            elif sign == -1:
+                after = set()
+            for sha256 in after - before:
+                add(sha256, 1)
+            for sha256 in before - after:
+                add(sha256, -1)
+    return {key: {'ref_count': amount} for key, amount in deltas.items() if amount}
+
+
+@event.listens_for(Session, 'after_flush')
+def _maintain_ref_counts(session, flush_context):
+    deltas = _ref_deltas(session)
+    if deltas:
+        upsert_deltas(session.connection(), Blob, ('sha256',), deltas)
+
+
+def public_blob(sha256):
+    """Blob servible en /media: público y referenciado por al menos un Media"""
+    if not SHA256_PATTERN.match(sha256):
+        return None
+    return Blob.query.filter(Blob.sha256 == sha256, Blob.is_public.is_(True), Blob.ref_count > 0).first()
+
+
+def collect_garbage(grace_minutes=None, batch_size=500):
+    """Borrar los blobs sin referencias más viejos que el periodo de gracia.
+
+    Cada lote borra las filas con un DELETE que repite las condiciones (si
+    otra transacción lo volvió a usar, no se toca) y los archivos antes del
+    commit, salvo los que una subida acaba de tocar: mientras tanto las filas
+    siguen bloqueadas y el register_blob de una subida del mismo contenido
+    espera y después escribe el archivo de nuevo. Devuelve (blobs borrados,
+    bytes liberados).
+    """
+    grace_minutes = grace_minutes if grace_minutes is not None else current_app.config.get(
+        'BLOB_GC_GRACE_MINUTES', DEFAULT_GC_GRACE_MINUTES
+    )
+    cutoff = datetime.utcnow() - timedelta(minutes=grace_minutes)
+    file_cutoff = time.time() - grace_minutes * 60
+    root = store_root()
+    removed = freed = 0
+    while True:
+        candidates = db.session.execute(
+            select(Blob.sha256).where(Blob.ref_count <= 0, Blob.updated_date < cutoff).order_by(
+                Blob.updated_date
+            ).limit(batch_size).with_for_update(skip_locked=True)
+        ).scalars().all()
+        if not candidates:
+            db.session.rollback()
+            break
+        deleted = db.session.execute(
+            delete(Blob).where(
+                Blob.sha256.in_(candidates), Blob.ref_count <= 0, Blob.updated_date < cutoff
+            ).returning(Blob.sha256, Blob.size)
+        ).all()
+        for sha256, size in deleted:
+            path = blob_path(root, sha256)
+            try:
+                # commit_file renueva el mtime cuando el mismo contenido se vuelve a subir
+                if os.stat(path).st_mtime >= file_cutoff:
+                    continue
+                os.unlink(path)
+            except FileNotFoundError:
+                continue
+            removed += 1
+            freed += size or 0
+        db.session.commit()
+        if len(candidates) < batch_size:
+            break
+    return removed, freed
+
+
+def sweep_untracked_files(grace_minutes=None):
+    """Borrar archivos del almacén sin fila en blobs (escrituras interrumpidas).
+
+    Recorre el disco, así que es para correr de vez en cuando, no en cada
+    pasada de blob-gc. Devuelve (archivos borrados, bytes liberados).
+    """
+    grace_minutes = grace_minutes if grace_minutes is not None else current_app.config.get(
+        'BLOB_GC_GRACE_MINUTES', DEFAULT_GC_GRACE_MINUTES
+    )
+    cutoff = time.time() - grace_minutes * 60
+    root = store_root()
+    removed = freed = 0
+    for directory, _, file_names in os.walk(root):
+        candidates = {}
+        for file_name in file_names:
+            path = os.path.join(directory, file_name)
+            stat = os.stat(path)
+            if stat.st_mtime < cutoff:
+                candidates[file_name] = (path, stat.st_size)
+        if not candidates:
+            continue
+        known = set(db.session.execute(
+            select(Blob.sha256).where(Blob.sha256.in_(list(candidates)))
+        ).scalars())
+        for file_name, (path, size) in candidates.items():
+            if file_name in known:
+                continue
+            os.unlink(path)
+            removed += 1
+            freed += size
+    db.session.rollback()
+    return removed, freed
+
+
+def rebuild_ref_counts(batch_size=1000):
+    """Recalcular ref_count de todos los blobs desde media y documents"""
+    counts = dict(db.session.execute(
+        select(Document.sha256, func.count()).where(Document.sha256.isnot(None)).group_by(Document.sha256)
+    ).all())
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            select(Media.id, Media.variants).where(Media.id > last_id, Media.variants.isnot(None)).order_by(
+                Media.id
+            ).limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        for _, variants in rows:
+            for sha256 in media_refs(variants):
+                counts[sha256] = counts.get(sha256, 0) + 1
+        last_id = rows[-1][0]
+
+    table = Blob.__table__
+    db.session.execute(update(table).values(ref_count=0))
+    known = set(db.session.execute(select(table.c.sha256)).scalars())
+    existing = [{'key': sha256, 'refs': count} for sha256, count in counts.items() if sha256 in known]
+    if existing:
+        db.session.execute(
+            update(table).where(table.c.sha256 == bindparam('key')).values(ref_count=bindparam('refs')),
+            existing
+        )
+    missing = [sha256 for sha256 in counts if sha256 not in known]
+    now = datetime.utcnow()
+    if missing:
+        db.session.execute(insert(table), [
+            {'sha256': sha256, 'ref_count': counts[sha256], 'is_public': False, 'created_date': now, 'updated_date': now}
+            for sha256 in missing
+        ])
+    db.session.commit()
+    return len(counts)
\ No newline at end of file
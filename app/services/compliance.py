@@ -0,0 +1,312 @@
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import Integer, String, bindparam, cast, event, insert, inspect, literal, select, union_all, update
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.orm.util import identity_key
+
+from app import db
+from app.models.carrier import Carrier
+from app.models.document import Document, DocumentStatus, DocumentType
+from app.models.notification import Notification, NotificationType
+from app.models.vehicle import Vehicle
+from app.services.matching import matching_index, track_changed_carriers
+from app.services.page_cache import track_changed_users
+from app.services.stats import changed_values
+
+DEFAULT_REMINDER_DAYS = (30, 15, 7, 1)
+
+KIND_LABELS = {
+    'license': 'Licencia de conducción',
+    'insurance': 'Póliza de seguro',
+    'soat': 'SOAT',
+    'technomechanical': 'Revisión tecnomecánica',
+    'document': 'Documento'
+}
+
+DOCUMENT_LABELS = {
+    DocumentType.USER_ID: 'Documento de identidad',
+    DocumentType.DRIVER_LICENSE: 'Licencia de conducción',
+    DocumentType.COMPANY_LEGAL: 'Documento legal',
+    DocumentType.VEHICLE_REGISTRATION: 'Tarjeta de propiedad',
+    DocumentType.INSURANCE: 'Póliza de seguro',
+    DocumentType.TAX_DOCUMENT: 'Documento tributario'
+}
+
+# Columnas que definen la vigencia del transportista
+CARRIER_COMPLIANCE_COLUMNS = ('license_expiry_date', 'insurance_expiry_date')
+VEHICLE_COMPLIANCE_COLUMNS = ('carrier_id', 'soat_expiry', 'technomechanical_expiry', 'is_active')
+
+
+def _expiry_sources(condition, carrier_ids=None):
+    """Un SELECT por columna de vencimiento, cada uno sobre su propio índice.
+
+    condition(columna) es el filtro de fechas (rango o lista de días). Todas
+    las ramas devuelven (kind, carrier_id, user_id, vehicle_id, document_id,
+    reference, expiry_date).
+    """
+    no_id = literal(None, Integer)
+    # Las ramas de un UNION deben coincidir en tipo: el enum viaja como texto
+    document_type = cast(Document.document_type, String)
+    active_vehicle = Vehicle.is_active.isnot(False)
+    branches = [
+        select(
+            literal('license'), Carrier.id, Carrier.user_id, no_id, no_id,
+            Carrier.license_category, Carrier.license_expiry_date
+        ).where(condition(Carrier.license_expiry_date)),
+        select(
+            literal('insurance'), Carrier.id, Carrier.user_id, no_id, no_id,
+            Carrier.insurance_policy, Carrier.insurance_expiry_date
+        ).where(condition(Carrier.insurance_expiry_date)),
+        select(
+            literal('soat'), Carrier.id, Carrier.user_id, Vehicle.id, no_id,
+            Vehicle.license_plate, Vehicle.soat_expiry
+        ).join(Carrier, Carrier.id == Vehicle.carrier_id).where(condition(Vehicle.soat_expiry), active_vehicle),
+        select(
+            literal('technomechanical'), Carrier.id, Carrier.user_id, Vehicle.id, no_id,
+            Vehicle.license_plate, Vehicle.technomechanical_expiry
+        ).join(Carrier, Carrier.id == Vehicle.carrier_id).where(
+            condition(Vehicle.technomechanical_expiry), active_vehicle
+        ),
+        select(
+            literal('document'), Carrier.id, Carrier.user_id, no_id, Document.id,
+            document_type, Document.expiry_date
+        ).join(Carrier, Carrier.id == Document.entity_id).where(
+            condition(Document.expiry_date), Document.entity_type == 'carrier',
+            Document.status != DocumentStatus.REJECTED
+        ),
+        select(
+            literal('document'), Carrier.id, Carrier.user_id, Vehicle.id, Document.id,
+            document_type, Document.expiry_date
+        ).join(Vehicle, Vehicle.id == Document.entity_id).join(Carrier, Carrier.id == Vehicle.carrier_id).where(
+            condition(Document.expiry_date), Document.entity_type == 'vehicle',
+            Document.status != DocumentStatus.REJECTED, active_vehicle
+        )
+    ]
+    if carrier_ids is not None:
+        branches = [branch.where(Carrier.id.in_(list(carrier_ids))) for branch in branches]
+    return union_all(*branches)
+
+
+def _item(row):
+    kind, carrier_id, user_id, vehicle_id, document_id, reference, expiry_date = row
+    if kind == 'document':
+        label = DOCUMENT_LABELS.get(DocumentType.__members__.get(reference), KIND_LABELS[kind])
+    elif kind in ('soat', 'technomechanical') and reference:
+        label = f'{KIND_LABELS[kind]} {reference}'
+    else:
+        label = KIND_LABELS[kind]
+    return {
+        'kind': kind,
+        'carrier_id': carrier_id,
+        'user_id': user_id,
+        'vehicle_id': vehicle_id,
+        'document_id': document_id,
+        'label': label,
+        'expiry_date': expiry_date
+    }
+
+
+def expiring_items(start, end, carrier_ids=None):
+    """Vencimientos entre start y end (inclusive), ordenados por fecha"""
+    statement = _expiry_sources(lambda column: column.between(start, end), carrier_ids)
+    items = [_item(row) for row in db.session.execute(statement)]
+    items.sort(key=lambda item: (item['expiry_date'], item['carrier_id'], item['kind']))
+    return items
+
+
+def expiry_calendar(start=None, days=30, carrier_ids=None):
+    """Calendario diario de vencimientos: [(fecha, [vencimientos])] de start a start + days"""
+    start = start or datetime.utcnow().date()
+    calendar = {}
+    for item in expiring_items(start, start + timedelta(days=days), carrier_ids):
+        calendar.setdefault(item['expiry_date'], []).append(item)
+    return sorted(calendar.items())
+
+
+def compute_compliance(connection, carrier_ids, today=None):
+    """{carrier_id: (is_compliant, compliance_valid_until)} leído de la base.
+
+    La vigencia llega hasta el primer vencimiento entre licencia, seguro y el
+    SOAT y la tecnomecánica de cada vehículo activo; una fecha faltante deja
+    al transportista sin vigencia.
+    """
+    carrier_ids = list(carrier_ids)
+    if not carrier_ids:
+        return {}
+    today = today or datetime.utcnow().date()
+    dates = {
+        carrier_id: [license_expiry, insurance_expiry]
+        for carrier_id, license_expiry, insurance_expiry in connection.execute(
+            select(Carrier.id, Carrier.license_expiry_date, Carrier.insurance_expiry_date).where(
+                Carrier.id.in_(carrier_ids)
+            )
+        )
+    }
+    for carrier_id, soat_expiry, technomechanical_expiry in connection.execute(
+        select(Vehicle.carrier_id, Vehicle.soat_expiry, Vehicle.technomechanical_expiry).where(
+            Vehicle.carrier_id.in_(carrier_ids), Vehicle.is_active.isnot(False)
+        )
+    ):
+        if carrier_id in dates:
+            dates[carrier_id].extend([soat_expiry, technomechanical_expiry])
+
+    results = {}
+    for carrier_id, values in dates.items():
+        valid_until = None if None in values else min(values)
+        results[carrier_id] = (valid_until is not None and valid_until >= today, valid_until)
+    return results
+
+
+def update_compliance(session, carrier_ids, today=None):
+    """Escribir la vigencia recalculada y reflejarla en los objetos ya cargados"""
+    connection = session.connection()
+    results = compute_compliance(connection, carrier_ids, today)
+    if not results:
+        return results
+    table = Carrier.__table__
+    connection.execute(
+        update(table).where(table.c.id == bindparam('carrier_id')).values(
+            is_compliant=bindparam('compliant'), compliance_valid_until=bindparam('valid_until')
+        ),
+        [
+            {'carrier_id': carrier_id, 'compliant': compliant, 'valid_until': valid_until}
+            for carrier_id, (compliant, valid_until) in results.items()
+        ]
+    )
+    for carrier_id, (compliant, valid_until) in results.items():
+        carrier = session.identity_map.get(identity_key(Carrier, carrier_id))
+        if carrier is not None:
+            set_committed_value(carrier, 'is_compliant', compliant)
+            set_committed_value(carrier, 'compliance_valid_until', valid_until)
+    return results
+
+
+def rebuild_compliance(batch_size=1000):
+    """Recalcular la vigencia de todos los transportistas (tras la migración)"""
+    updated = 0
+    last_id = 0
+    while True:
+        carrier_ids = [
+            carrier_id for (carrier_id,) in db.session.query(Carrier.id).filter(
+                Carrier.id > last_id
+            ).order_by(Carrier.id).limit(batch_size)
+        ]
+        if not carrier_ids:
+            break
+        updated += len(update_compliance(db.session, carrier_ids))
+        db.session.commit()
+        last_id = carrier_ids[-1]
+    matching_index.invalidate()
+    return updated
+
+
+def expire_compliance(today=None):
+    """Quitar is_compliant a quienes tienen algún documento vencido; devuelve sus ids.
+
+    Un UPDATE sobre el índice (is_compliant, compliance_valid_until): solo
+    toca las filas que vencieron desde la última pasada.
+    """
+    today = today or datetime.utcnow().date()
+    expired_ids = db.session.execute(
+        update(Carrier).where(
+            Carrier.is_compliant.is_(True),
+            Carrier.compliance_valid_until < today
+        ).values(is_compliant=False).returning(Carrier.id),
+        execution_options={'synchronize_session': False}
+    ).scalars().all()
+    track_changed_carriers(db.session, expired_ids)
+    return expired_ids
+
+
+def create_reminders(today=None, reminder_days=None):
+    """Recordatorios de los vencimientos que caen a reminder_days días de hoy.
+
+    Una consulta por lista de fechas e índice y un solo INSERT para todas las
+    notificaciones; los recordatorios ya creados hoy no se repiten.
+    """
+    today = today or datetime.utcnow().date()
+    reminder_days = reminder_days or current_app.config.get('COMPLIANCE_REMINDER_DAYS', DEFAULT_REMINDER_DAYS)
+    due_dates = sorted({today + timedelta(days=days) for days in reminder_days})
+    items = [_item(row) for row in db.session.execute(_expiry_sources(lambda column: column.in_(due_dates)))]
+    if not items:
+        return 0
+
+    notifications = []
+    for item in items:
+        if item['document_id'] is not None:
+            entity_type, entity_id = 'document', item['document_id']
+        elif item['vehicle_id'] is not None:
+            entity_type, entity_id = 'vehicle', item['vehicle_id']
+        else:
+            entity_type, entity_id = 'carrier', item['carrier_id']
+        days_left = (item['expiry_date'] - today).days
+        when = {0: 'hoy', 1: 'mañana'}.get(days_left, f'en {days_left} días')
+        notifications.append({
+            'user_id': item['user_id'],
+            'title': f"{item['label']} por vencer",
+            'message': f"{item['label']} vence {when} ({item['expiry_date']:%d/%m/%Y})",
+            'notification_type': NotificationType.DOCUMENT_EXPIRING,
+            'is_read': False,
+            'related_entity_type': entity_type,
+            'related_entity_id': entity_id
+        })
+
+    start_of_day = datetime.combine(today, datetime.min.time())
+    already_sent = set(db.session.execute(
+        select(
+            Notification.user_id, Notification.related_entity_type,
+            Notification.related_entity_id, Notification.title
+        ).where(
+            Notification.user_id.in_({notification['user_id'] for notification in notifications}),
+            Notification.created_date >= start_of_day,
+            Notification.notification_type == NotificationType.DOCUMENT_EXPIRING
+        )
+    ).all())
+    notifications = [
+        notification for notification in notifications
+        if (
+            notification['user_id'], notification['related_entity_type'],
+            notification['related_entity_id'], notification['title']
+        ) not in already_sent
+    ]
+    if notifications:
+        now = datetime.utcnow()
+        for notification in notifications:
+            notification['created_date'] = now
+        db.session.execute(insert(Notification), notifications)
+        track_changed_users(db.session, {notification['user_id'] for notification in notifications})
+    return len(notifications)
+
+
+def scan_compliance(today=None, reminder_days=None):
+    """Pasada diaria: retirar del matching a los vencidos y crear recordatorios"""
+    today = today or datetime.utcnow().date()
+    try:
+        expired = expire_compliance(today)
+        reminders = create_reminders(today, reminder_days)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return {'expired': len(expired), 'reminders': reminders}
+
+
+def _changed(obj, columns):
+    state = inspect(obj)
+    return any(state.attrs[column].history.has_changes() for column in columns)
+
+
+@event.listens_for(Session, 'after_flush')
+def _refresh_compliance(session, flush_context):
+    carrier_ids = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Carrier):
+            if obj not in session.deleted and (obj in session.new or _changed(obj, CARRIER_COMPLIANCE_COLUMNS)):
+                carrier_ids.add(obj.id)
+        elif isinstance(obj, Vehicle):
+            if obj in session.new or obj in session.deleted or _changed(obj, VEHICLE_COMPLIANCE_COLUMNS):
+                carrier_ids.update(value for value in changed_values(obj, 'carrier_id') if value is not None)
+    if carrier_ids:
+        update_compliance(session, carrier_ids)
\ No newline at end of file
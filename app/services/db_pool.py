@@ -0,0 +1,129 @@
+import time
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+from sqlalchemy.pool import NullPool, QueuePool
+
+from app.services.metrics import metrics
+
+# Tamaños por perfil de despliegue; DB_POOL_SIZE y compañía los sobrescriben
+POOL_PROFILES = {
+    # Proceso web con hilos (gunicorn gthread): un hilo por conexión y algo de holgura
+    'web': {'pool_size': 5, 'max_overflow': 5, 'pool_timeout': 10, 'statement_timeout_ms': 30000},
+    # Barredores y workers de cola: una transacción a la vez
+    'worker': {'pool_size': 2, 'max_overflow': 0, 'pool_timeout': 30, 'statement_timeout_ms': 300000},
+    # Consola, migraciones y comandos de mantenimiento: sin límite por sentencia
+    'cli': {'pool_size': 1, 'max_overflow': 2, 'pool_timeout': 30, 'statement_timeout_ms': 0},
+}
+WAIT_BUCKETS_MS = (0.1, 0.5, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 5000, 10000)
+
+
+class MeteredQueuePool(QueuePool):
+    """QueuePool que mide cuánto espera cada checkout y cuántos agotan pool_timeout"""
+
+    metrics_name = 'primary'
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeout:
+            metrics.inc(f'db_pool_{self.metrics_name}_timeouts_total')
+            raise
+        finally:
+            metrics.histogram(f'db_pool_{self.metrics_name}_wait_ms', WAIT_BUCKETS_MS).observe(
+                (time.perf_counter() - start) * 1000.0
+            )
+
+    def recreate(self):
+        # dispose() (p. ej. tras el fork) crea un pool nuevo con los argumentos del constructor
+        pool = super().recreate()
+        pool.metrics_name = self.metrics_name
+        return pool
+
+
+def _profile(config):
+    return POOL_PROFILES[config.get('DB_POOL_PROFILE') or 'cli']
+
+
+def statement_timeout(config):
+    """Milisegundos de statement_timeout: DB_STATEMENT_TIMEOUT_MS o el del perfil; 0 desactiva"""
+    if config.get('DB_STATEMENT_TIMEOUT_MS') is not None:
+        return config['DB_STATEMENT_TIMEOUT_MS']
+    return _profile(config)['statement_timeout_ms']
+
+
+def engine_options(config, url=None):
+    """SQLALCHEMY_ENGINE_OPTIONS a partir de las variables DB_* de la configuración.
+
+    En PostgreSQL: pool medido con tamaños del perfil, pre_ping, recycle y
+    statement_timeout. Con DB_PGBOUNCER (PgBouncer en modo transaction) el
+    pool lo lleva PgBouncer: NullPool y el timeout con SET LOCAL al iniciar
+    cada transacción, porque PgBouncer no acepta parámetros de arranque.
+    SQLite conserva las opciones por defecto.
+    """
+    url = url or config['SQLALCHEMY_DATABASE_URI']
+    if not url.startswith('postgresql'):
+        return {}
+
+    options = {'pool_pre_ping': config.get('DB_POOL_PRE_PING', True)}
+    if config.get('DB_PGBOUNCER'):
+        options['poolclass'] = NullPool
+        return options
+
+    profile = _profile(config)
+    for option, key in (('pool_size', 'DB_POOL_SIZE'), ('max_overflow', 'DB_MAX_OVERFLOW'),
+                        ('pool_timeout', 'DB_POOL_TIMEOUT')):
+        options[option] = config[key] if config.get(key) is not None else profile[option]
+    options['poolclass'] = MeteredQueuePool
+    options['pool_recycle'] = config.get('DB_POOL_RECYCLE', 1800)
+    timeout = statement_timeout(config)
+    if timeout:
+        options['connect_args'] = {'options': f'-c statement_timeout={int(timeout)}'}
+    return options
+
+
+def instrument_engine(engine, name, statement_timeout_ms=None, pgbouncer=False):
+    """Registrar los medidores del pool de un engine y el timeout por transacción en modo PgBouncer"""
+    if isinstance(engine.pool, MeteredQueuePool):
+        engine.pool.metrics_name = name
+
+    if pgbouncer and statement_timeout_ms and engine.dialect.name == 'postgresql':
+        @event.listens_for(engine, 'begin')
+        def _set_statement_timeout(connection):
+            connection.exec_driver_sql(f'SET LOCAL statement_timeout = {int(statement_timeout_ms)}')
+
+    def snapshot():
+        # engine.pool se lee en cada llamada: dispose() lo reemplaza
+        pool = engine.pool
+        if not isinstance(pool, QueuePool):
+            return {'pool': type(pool).__name__}
+        return {
+            'pool': type(pool).__name__,
+            'size': pool.size(),
+            'checked_out': pool.checkedout(),
+            'checked_in': pool.checkedin(),
+            'overflow': max(pool.overflow(), 0),
+            'max_overflow': pool._max_overflow,
+        }
+
+    metrics.gauge(f'db_pool_{name}', snapshot)
+
+
+def init_app(app):
+    """Fijar SQLALCHEMY_ENGINE_OPTIONS; debe llamarse antes de db.init_app"""
+    options = engine_options(app.config)
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {**options, **app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})}
+
+
+def instrument_app(app):
+    """Medidores del engine principal y de las réplicas; después de db.init_app"""
+    from app import db
+
+    with app.app_context():
+        for key, engine in db.engines.items():
+            instrument_engine(
+                engine, key or 'primary',
+                statement_timeout_ms=statement_timeout(app.config),
+                pgbouncer=app.config.get('DB_PGBOUNCER', False)
+            )
\ No newline at end of file
@@ -0,0 +1,357 @@
+import bisect
+import math
+import re
+import threading
+import time
+
+from sqlalchemy import Float, bindparam, cast, event, func, inspect, literal, literal_column, or_, select, tuple_, update
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.orm.util import identity_key
+
+from app import db
+from app.models.carrier import Carrier
+from app.models.company import Company
+from app.models.user import User
+from app.models.types import json_list
+from app.models.vehicle import Vehicle
+from app.services.matching import normalize_text
+from app.services.replicas import primary_reads
+from app.services.stats import changed_values
+from app.services.transactions import track_on_commit
+
+TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+MAX_QUERY_TERMS = 8
+MIN_FUZZY_LENGTH = 3
+FUZZY_THRESHOLD = 0.4
+
+# Pesos de coincidencia en el índice en proceso
+EXACT_WEIGHT = 1.0
+PREFIX_WEIGHT = 0.8
+FUZZY_WEIGHT = 0.6
+
+# Columnas que alimentan el documento de búsqueda del conductor
+CARRIER_SEARCH_COLUMNS = (
+    'license_category', 'carrier_type', 'available_vehicle_types', 'cargo_specializations', 'usual_routes'
+)
+USER_SEARCH_COLUMNS = ('email', 'city', 'state')
+
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall(normalize_text(text))
+
+
+def document_from_parts(parts):
+    seen = set()
+    tokens = []
+    for part in parts:
+        for token in tokenize(part):
+            if token not in seen:
+                seen.add(token)
+                tokens.append(token)
+    return ' '.join(tokens)
+
+
+def build_search_documents(connection, carrier_ids):
+    """{carrier_id: documento} leído de la base: usuario, empresa, perfil y vehículos activos"""
+    carrier_ids = list(carrier_ids)
+    if not carrier_ids:
+        return {}
+    rows = connection.execute(
+        select(
+            Carrier.id, Carrier.license_category, Carrier.carrier_type, Carrier.available_vehicle_types,
+            Carrier.cargo_specializations, Carrier.usual_routes, User.email, User.city, User.state,
+            Company.legal_name, Company.commercial_name
+        ).join(User, User.id == Carrier.user_id).outerjoin(
+            Company, Company.user_id == User.id
+        ).where(Carrier.id.in_(carrier_ids))
+    ).all()
+    vehicles = {}
+    for carrier_id, vehicle_type, brand in connection.execute(
+        select(Vehicle.carrier_id, Vehicle.vehicle_type, Vehicle.brand).where(
+            Vehicle.carrier_id.in_(carrier_ids), Vehicle.is_active.isnot(False)
+        )
+    ):
+        vehicles.setdefault(carrier_id, []).extend([vehicle_type.value if vehicle_type else None, brand])
+
+    documents = {}
+    for row in rows:
+        parts = [row.email.split('@')[0], row.city, row.state, row.legal_name, row.commercial_name]
+        parts.extend([row.license_category, row.carrier_type.value if row.carrier_type else None])
+        parts.extend(json_list(row.available_vehicle_types))
+        parts.extend(json_list(row.cargo_specializations))
+        parts.extend(json_list(row.usual_routes))
+        parts.extend(vehicles.get(row.id, []))
+        documents[row.id] = document_from_parts(parts)
+    return documents
+
+
+def update_search_documents(session, carrier_ids):
+    """Escribir los documentos recalculados y reflejarlos en los objetos ya cargados"""
+    connection = session.connection()
+    documents = build_search_documents(connection, carrier_ids)
+    if not documents:
+        return documents
+    table = Carrier.__table__
+    connection.execute(
+        update(table).where(table.c.id == bindparam('carrier_id')).values(search_document=bindparam('document')),
+        [{'carrier_id': carrier_id, 'document': document} for carrier_id, document in documents.items()]
+    )
+    for carrier_id, document in documents.items():
+        carrier = session.identity_map.get(identity_key(Carrier, carrier_id))
+        if carrier is not None:
+            set_committed_value(carrier, 'search_document', document)
+    return documents
+
+
+def trigrams(token):
+    padded = f'  {token} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class DriverSearchIndex:
+    """Índice invertido en proceso sobre carriers.search_document.
+
+    Respaldo para bases sin tsvector/pg_trgm (SQLite en desarrollo y pruebas).
+    Cada término de la consulta debe coincidir exacto, por prefijo o, desde
+    MIN_FUZZY_LENGTH letras, por similitud de trigramas con algún término del
+    documento. El puntaje suma el peso de cada coincidencia por su idf.
+    """
+
+    def __init__(self, refresh_seconds=300):
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.RLock()
+        self._documents = {}
+        self._postings = {}
+        self._vocabulary = []
+        self._trigrams = {}
+        self._dirty = set()
+        self._loaded_at = None
+
+    def mark_dirty(self, carrier_ids):
+        with self._lock:
+            self._dirty.update(carrier_ids)
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = None
+
+    def _ensure_fresh(self):
+        # Del primario: una réplica atrasada devolvería documentos viejos y _dirty se vacía igual
+        with self._lock, primary_reads():
+            if self._loaded_at is None or time.monotonic() - self._loaded_at > self.refresh_seconds:
+                self._documents = {}
+                self._postings = {}
+                self._trigrams = {}
+                self._load()
+                self._loaded_at = time.monotonic()
+            elif self._dirty:
+                self._load(self._dirty)
+            self._dirty.clear()
+
+    def _load(self, carrier_ids=None):
+        query = db.session.query(Carrier.id, Carrier.search_document)
+        if carrier_ids is not None:
+            carrier_ids = set(carrier_ids)
+            query = query.filter(Carrier.id.in_(carrier_ids))
+            for carrier_id in carrier_ids:
+                self._remove(carrier_id)
+        for carrier_id, document in query.yield_per(5000):
+            self._add(carrier_id, (document or '').split())
+        self._vocabulary = sorted(self._postings)
+
+    def _add(self, carrier_id, tokens):
+        self._documents[carrier_id] = set(tokens)
+        for token in self._documents[carrier_id]:
+            if token not in self._postings:
+                self._postings[token] = set()
+                for gram in trigrams(token):
+                    self._trigrams.setdefault(gram, set()).add(token)
+            self._postings[token].add(carrier_id)
+
+    def _remove(self, carrier_id):
+        for token in self._documents.pop(carrier_id, ()):
+            postings = self._postings.get(token)
+            if postings is not None:
+                postings.discard(carrier_id)
+                if not postings:
+                    del self._postings[token]
+                    for gram in trigrams(token):
+                        self._trigrams.get(gram, set()).discard(token)
+
+    def _matches(self, term):
+        """{token: peso} de los términos del vocabulario que coinciden con term"""
+        matches = {}
+        start = bisect.bisect_left(self._vocabulary, term)
+        for token in self._vocabulary[start:]:
+            if not token.startswith(term):
+                break
+            matches[token] = EXACT_WEIGHT if token == term else PREFIX_WEIGHT
+        if matches or len(term) < MIN_FUZZY_LENGTH:
+            return matches
+
+        grams = trigrams(term)
+        overlap = {}
+        for gram in grams:
+            for token in self._trigrams.get(gram, ()):
+                overlap[token] = overlap.get(token, 0) + 1
+        for token, shared in overlap.items():
+            similarity = shared / float(len(grams | trigrams(token)))
+            if similarity >= FUZZY_THRESHOLD:
+                matches[token] = FUZZY_WEIGHT * similarity
+        return matches
+
+    def search(self, terms):
+        """[(puntaje, carrier_id)] de los conductores que cumplen todos los términos"""
+        self._ensure_fresh()
+        with self._lock:
+            total = max(len(self._documents), 1)
+            scores = None
+            for term in terms:
+                term_scores = {}
+                for token, weight in self._matches(term).items():
+                    postings = self._postings[token]
+                    value = weight * math.log(1 + total / len(postings))
+                    for carrier_id in postings:
+                        if value > term_scores.get(carrier_id, 0.0):
+                            term_scores[carrier_id] = value
+                if scores is None:
+                    scores = term_scores
+                else:
+                    scores = {
+                        carrier_id: score + term_scores[carrier_id]
+                        for carrier_id, score in scores.items() if carrier_id in term_scores
+                    }
+                if not scores:
+                    return []
+            return [(round(score, 6), carrier_id) for carrier_id, score in (scores or {}).items()]
+
+
+search_index = DriverSearchIndex()
+
+
+def postgres_match(terms):
+    """(condición, puntaje) de PostgreSQL: prefijos por tsvector y similitud por pg_trgm"""
+    # Misma expresión que ix_carriers_search_document_tsv para que el planner use el índice
+    document = func.coalesce(Carrier.search_document, literal_column("''"))
+    vector = func.to_tsvector(literal_column("'simple'"), document)
+    query_text = ' & '.join(f'{term}:*' for term in terms)
+    ts_query = func.to_tsquery(literal_column("'simple'"), query_text)
+    phrase = literal(' '.join(terms))
+    condition = or_(vector.op('@@')(ts_query), phrase.op('<%')(Carrier.search_document))
+    score = cast(func.ts_rank(vector, ts_query) + func.word_similarity(phrase, document), Float)
+    return condition, score
+
+
+def _postgres_search(terms, limit, after):
+    condition, score = postgres_match(terms)
+    query = db.session.query(score.label('score'), Carrier.id).filter(condition)
+    if after is not None:
+        query = query.filter(tuple_(score, Carrier.id) < tuple_(*after))
+    return [(row.score, row.id) for row in query.order_by(score.desc(), Carrier.id.desc()).limit(limit)]
+
+
+def _indexed_search(terms, limit, after):
+    ranked = sorted(search_index.search(terms), reverse=True)
+    if after is not None:
+        ranked = [item for item in ranked if item < tuple(after)]
+    return ranked[:limit]
+
+
+def search_drivers(text, limit=20, after=None):
+    """Conductores que coinciden con text, del más relevante al menos relevante.
+
+    Devuelve [(puntaje, carrier_id)]; after es la clave (puntaje, id) del
+    último elemento de la página anterior. En PostgreSQL usa el índice GIN de
+    tsvector (prefijos) y pg_trgm (errores de tipeo); en otras bases, el
+    índice invertido en proceso.
+    """
+    terms = tokenize(text)[:MAX_QUERY_TERMS]
+    if not terms:
+        return []
+    if db.engine.dialect.name == 'postgresql':
+        return _postgres_search(terms, limit, after)
+    return _indexed_search(terms, limit, after)
+
+
+def search_results(ranked):
+    """Serializar [(puntaje, carrier_id)] con una sola consulta, conservando el orden"""
+    if not ranked:
+        return []
+    rows = db.session.query(Carrier, User).join(User, User.id == Carrier.user_id).filter(
+        Carrier.id.in_([carrier_id for _, carrier_id in ranked])
+    )
+    by_id = {carrier.id: (carrier, user) for carrier, user in rows}
+    results = []
+    for score, carrier_id in ranked:
+        if carrier_id not in by_id:
+            continue
+        carrier, user = by_id[carrier_id]
+        results.append({
+            'id': carrier.id,
+            'city': user.city,
+            'license_category': carrier.license_category,
+            'vehicle_types': carrier.get_vehicle_types(),
+            'cargo_specializations': carrier.get_cargo_specializations(),
+            'usual_routes': carrier.get_usual_routes(),
+            'average_rating': carrier.average_rating or 0.0,
+            'completed_trips': carrier.completed_trips or 0,
+            'score': round(score, 4)
+        })
+    return results
+
+
+def rebuild_search_documents(batch_size=1000):
+    """Recalcular search_document de todos los conductores (tras la migración)"""
+    updated = 0
+    last_id = 0
+    while True:
+        carrier_ids = [
+            carrier_id for (carrier_id,) in db.session.query(Carrier.id).filter(
+                Carrier.id > last_id
+            ).order_by(Carrier.id).limit(batch_size)
+        ]
+        if not carrier_ids:
+            break
+        updated += len(update_search_documents(db.session, carrier_ids))
+        db.session.commit()
+        last_id = carrier_ids[-1]
+    search_index.invalidate()
+    return updated
+
+
+def _changed(obj, columns):
+    state = inspect(obj)
+    return any(state.attrs[column].history.has_changes() for column in columns)
+
+
+@event.listens_for(Session, 'after_flush')
+def _refresh_search_documents(session, flush_context):
+    carrier_ids = set()
+    deleted_ids = set()
+    user_ids = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Carrier):
+            if obj in session.deleted:
+                # Marcado sucio sin fila: _load lo saca del índice en proceso
+                deleted_ids.add(obj.id)
+            elif obj in session.new or _changed(obj, CARRIER_SEARCH_COLUMNS):
+                carrier_ids.add(obj.id)
+        elif isinstance(obj, User):
+            if obj in session.dirty and _changed(obj, USER_SEARCH_COLUMNS):
+                user_ids.add(obj.id)
+        elif isinstance(obj, Company):
+            user_ids.update(value for value in changed_values(obj, 'user_id') if value is not None)
+        elif isinstance(obj, Vehicle):
+            carrier_ids.update(value for value in changed_values(obj, 'carrier_id') if value is not None)
+    if deleted_ids:
+        track_on_commit(session, 'search_dirty_carriers', deleted_ids, search_index.mark_dirty)
+    if not carrier_ids and not user_ids:
+        return
+
+    if user_ids:
+        carrier_ids.update(session.connection().execute(
+            select(Carrier.id).where(Carrier.user_id.in_(user_ids))
+        ).scalars())
+    updated = update_search_documents(session, carrier_ids)
+    track_on_commit(session, 'search_dirty_carriers', updated, search_index.mark_dirty)
\ No newline at end of file
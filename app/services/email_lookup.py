@@ -0,0 +1,109 @@
+import hashlib
+import math
+import threading
+import time
+
+from sqlalchemy import exists
+
+from app import db
+from app.models.user import User
+from app.services.replicas import primary_reads
+
+DEFAULT_ERROR_RATE = 0.01
+MIN_CAPACITY = 10000
+SYNC_INTERVAL_SECONDS = 5.0
+
+
+class BloomFilter:
+    """Filtro de Bloom sobre un bytearray: sin falsos negativos"""
+
+    def __init__(self, capacity, error_rate=DEFAULT_ERROR_RATE):
+        self.capacity = capacity
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, int(round(self.size / capacity * math.log(2))))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, value):
+        # Doble hashing: h1 + i*h2 con un solo digest
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, value):
+        for position in self._positions(value):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, value):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+
+
+def email_exists_in_db(email):
+    """EXISTS sobre el índice único de users.email, sin traer la fila"""
+    return db.session.query(exists().where(User.email == email)).scalar()
+
+
+class EmailRegistry:
+    """Filtro de Bloom de los emails registrados delante del EXISTS.
+
+    Se construye en el primer uso y se pone al día cada SYNC_INTERVAL_SECONDS
+    leyendo solo los usuarios con id mayor al último visto, así los registros
+    hechos en otros procesos también entran al filtro. Un negativo del filtro
+    se responde sin tocar la base; un positivo se confirma con EXISTS.
+    """
+
+    def __init__(self, error_rate=DEFAULT_ERROR_RATE, sync_interval=SYNC_INTERVAL_SECONDS):
+        self.error_rate = error_rate
+        self.sync_interval = sync_interval
+        self._lock = threading.Lock()
+        self._filter = None
+        self._last_id = 0
+        self._synced_at = 0.0
+
+    def _rebuild(self):
+        total = db.session.query(db.func.count(User.id)).scalar() or 0
+        bloom = BloomFilter(max(MIN_CAPACITY, total * 2), self.error_rate)
+        last_id = 0
+        for user_id, email in db.session.query(User.id, User.email).yield_per(5000):
+            bloom.add(email.lower())
+            last_id = max(last_id, user_id)
+        self._filter = bloom
+        self._last_id = last_id
+        self._synced_at = time.monotonic()
+
+    def _sync(self):
+        rows = db.session.query(User.id, User.email).filter(User.id > self._last_id).all()
+        for user_id, email in rows:
+            self._filter.add(email.lower())
+            self._last_id = max(self._last_id, user_id)
+        self._synced_at = time.monotonic()
+        if self._filter.count > self._filter.capacity:
+            self._rebuild()
+
+    def _ensure_ready(self):
+        # Del primario: un id que la réplica aún no tiene quedaría atrás de _last_id para siempre
+        with self._lock, primary_reads():
+            if self._filter is None:
+                self._rebuild()
+            elif time.monotonic() - self._synced_at >= self.sync_interval:
+                self._sync()
+
+    def add(self, email):
+        """Registrar un email recién confirmado en la base"""
+        with self._lock:
+            if self._filter is not None:
+                self._filter.add(email.lower())
+
+    def might_exist(self, email):
+        self._ensure_ready()
+        return email.lower() in self._filter
+
+    def exists(self, email):
+        if not self.might_exist(email):
+            return False
+        return email_exists_in_db(email)
+
+
+email_registry = EmailRegistry()
\ No newline at end of file
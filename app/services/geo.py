@@ -0,0 +1,146 @@
+import math
+
+import numpy as np
+
+# Alfabeto base32 estándar de geohash
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+# Precisión almacenada en shipments.origin_geohash (celdas de ~1.2 km x 0.6 km)
+STORED_PRECISION = 6
+
+# Máximo de celdas por consulta antes de bajar a una precisión más gruesa
+MAX_QUERY_CELLS = 64
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE_LAT = 111.32
+
+
+def geohash_encode(lat, lng, precision=STORED_PRECISION):
+    """Codificar una coordenada como geohash"""
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    chars = []
+    bit = 0
+    value = 0
+    even = True  # Los bits pares corresponden a la longitud
+
+    while len(chars) < precision:
+        if even:
+            mid = (lng_range[0] + lng_range[1]) / 2
+            if lng >= mid:
+                value = (value << 1) | 1
+                lng_range[0] = mid
+            else:
+                value = value << 1
+                lng_range[1] = mid
+        else:
+            mid = (lat_range[0] + lat_range[1]) / 2
+            if lat >= mid:
+                value = (value << 1) | 1
+                lat_range[0] = mid
+            else:
+                value = value << 1
+                lat_range[1] = mid
+        even = not even
+        bit += 1
+        if bit == 5:
+            chars.append(GEOHASH_ALPHABET[value])
+            bit = 0
+            value = 0
+
+    return ''.join(chars)
+
+
+def geohash_cell_size(precision):
+    """Tamaño (alto, ancho) en grados de una celda geohash"""
+    bits = precision * 5
+    lng_bits = (bits + 1) // 2
+    lat_bits = bits // 2
+    return 180.0 / (2 ** lat_bits), 360.0 / (2 ** lng_bits)
+
+
+def bounding_boxes(lat, lng, radius_km):
+    """Cajas (min_lat, min_lng, max_lat, max_lng) que contienen el radio dado.
+
+    Si el radio cruza el antimeridiano devuelve dos cajas, una a cada lado de
+    ±180°; si alcanza un polo, la caja abarca todas las longitudes.
+    """
+    delta_lat = radius_km / KM_PER_DEGREE_LAT
+    cos_lat = max(math.cos(math.radians(lat)), 0.01)
+    delta_lng = radius_km / (KM_PER_DEGREE_LAT * cos_lat)
+    min_lat = max(lat - delta_lat, -90.0)
+    max_lat = min(lat + delta_lat, 90.0)
+
+    if delta_lng >= 180.0 or min_lat <= -90.0 or max_lat >= 90.0:
+        return [(min_lat, -180.0, max_lat, 180.0)]
+    min_lng = lng - delta_lng
+    max_lng = lng + delta_lng
+    if min_lng < -180.0:
+        return [(min_lat, min_lng + 360.0, max_lat, 180.0), (min_lat, -180.0, max_lat, max_lng)]
+    if max_lng > 180.0:
+        return [(min_lat, min_lng, max_lat, 180.0), (min_lat, -180.0, max_lat, max_lng - 360.0)]
+    return [(min_lat, min_lng, max_lat, max_lng)]
+
+
+def _cells_for_box(box, precision):
+    min_lat, min_lng, max_lat, max_lng = box
+    cell_lat, cell_lng = geohash_cell_size(precision)
+
+    # Alinear al borde inferior de la celda y recorrer por centros
+    start_lat = math.floor((min_lat + 90.0) / cell_lat) * cell_lat - 90.0
+    start_lng = math.floor((min_lng + 180.0) / cell_lng) * cell_lng - 180.0
+
+    cells = set()
+    cur_lat = start_lat
+    while cur_lat <= max_lat:
+        cur_lng = start_lng
+        center_lat = min(cur_lat + cell_lat / 2, 90.0)
+        while cur_lng <= max_lng:
+            center_lng = min(cur_lng + cell_lng / 2, 180.0)
+            cells.add(geohash_encode(center_lat, center_lng, precision))
+            cur_lng += cell_lng
+        cur_lat += cell_lat
+    return cells
+
+
+def covering_cells(lat, lng, radius_km, max_cells=MAX_QUERY_CELLS):
+    """Prefijos geohash que cubren el círculo; usa la precisión más fina que quepa en max_cells"""
+    boxes = bounding_boxes(lat, lng, radius_km)
+    for precision in range(STORED_PRECISION, 0, -1):
+        cell_lat, cell_lng = geohash_cell_size(precision)
+        estimated = sum(
+            (math.ceil((box[2] - box[0]) / cell_lat) + 1) * (math.ceil((box[3] - box[1]) / cell_lng) + 1)
+            for box in boxes
+        )
+        if estimated > max_cells * 2:
+            continue
+        cells = set().union(*(_cells_for_box(box, precision) for box in boxes))
+        if len(cells) <= max_cells:
+            return sorted(cells)
+    return sorted(set().union(*(_cells_for_box(box, 1) for box in boxes)))
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """Distancia de círculo máximo entre dos puntos en km"""
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lng2 - lng1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def haversine_km_batch(lat1, lng1, lat2, lng2):
+    """Distancias de círculo máximo vectorizadas.
+
+    Acepta escalares o secuencias del mismo largo (se aplica broadcasting de
+    NumPy) y devuelve un ndarray en km. Las coordenadas faltantes (None/NaN)
+    producen NaN en la posición correspondiente.
+    """
+    lat1 = np.radians(np.asarray(lat1, dtype=float))
+    lng1 = np.radians(np.asarray(lng1, dtype=float))
+    lat2 = np.radians(np.asarray(lat2, dtype=float))
+    lng2 = np.radians(np.asarray(lng2, dtype=float))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + \
+        np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.minimum(1.0, np.sqrt(a)))
\ No newline at end of file
@@ -0,0 +1,229 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from flask_login import UserMixin
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from app import db
+from app.models.carrier import Carrier
+from app.models.company import Company
+from app.models.user import User, UserType, AccountStatus
+from app.services.metrics import metrics
+from app.services.replicas import primary_reads
+from app.services.transactions import track_on_commit
+
+DEFAULT_TTL_SECONDS = 30
+DEFAULT_MAX_ENTRIES = 10000
+
+# Cambios en estas columnas afectan la identidad o los permisos de la sesión
+IDENTITY_COLUMNS = ('account_status', 'password_hash', 'user_type', 'email')
+
+# Columnas de Company con las que se arma el nombre que muestran las plantillas base
+DISPLAY_NAME_COLUMNS = ('commercial_name', 'trade_name', 'legal_name')
+
+
+class LocalIdentityCache:
+    """LRU en proceso con expiración por entrada"""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            expires_at, data = entry
+            if expires_at < time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return data
+
+    def set(self, user_id, data):
+        with self._lock:
+            self._entries[user_id] = (time.monotonic() + self.ttl, data)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class RedisIdentityCache:
+    """Backend compartido entre procesos; requiere el paquete redis"""
+
+    def __init__(self, url, ttl=DEFAULT_TTL_SECONDS, prefix='identity:'):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError('IDENTITY_CACHE_URL requiere el paquete redis')
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, user_id):
+        raw = self.client.get(f'{self.prefix}{user_id}')
+        return json.loads(raw) if raw else None
+
+    def set(self, user_id, data):
+        self.client.setex(f'{self.prefix}{user_id}', self.ttl, json.dumps(data))
+
+    def delete(self, user_id):
+        self.client.delete(f'{self.prefix}{user_id}')
+
+
+class CachedUser(UserMixin):
+    """Identidad liviana para current_user.
+
+    Cubre lo que las vistas y las plantillas base consultan en cada request
+    (id, tipo, estado, id del perfil, nombre para mostrar). Cualquier otro atributo (company, carrier, phone, ...) carga el
+    User completo la primera vez que se pide dentro del request, y también
+    se asigna en él para que el commit lo guarde.
+    """
+
+    def __init__(self, data):
+        # Directo al __dict__: __setattr__ reenvía las asignaciones al User
+        self.__dict__.update(
+            id=data['id'],
+            email=data['email'],
+            user_type=UserType(data['user_type']),
+            account_status=AccountStatus(data['account_status']) if data['account_status'] else None,
+            company_id=data['company_id'],
+            carrier_id=data['carrier_id'],
+            display_name=data.get('display_name') or data['email'].split('@')[0],
+            _user=None
+        )
+
+    @property
+    def is_active(self):
+        return self.account_status == AccountStatus.ACTIVE
+
+    def get_id(self):
+        return str(self.id)
+
+    def load(self):
+        """User completo, cargado a lo sumo una vez por request"""
+        if self._user is None:
+            self._user = db.session.get(User, self.id)
+        return self._user
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.load(), name)
+
+    def __setattr__(self, name, value):
+        if name.startswith('_'):
+            object.__setattr__(self, name, value)
+            return
+        setattr(self.load(), name, value)
+        # Los campos cacheados se leen del proxy: se mantienen al día con el User
+        if name in self.__dict__:
+            object.__setattr__(self, name, value)
+
+    def __repr__(self):
+        return f'<CachedUser {self.email} - {self.user_type.value}>'
+
+
+class IdentityCache:
+    """Caché de identidades para el user_loader: LRU local y backend compartido opcional.
+
+    El TTL acota cuánto tarda otro proceso en ver un cambio; en el proceso que
+    hace el cambio la invalidación es inmediata tras el commit.
+    """
+
+    def __init__(self):
+        self.local = LocalIdentityCache()
+        self.shared = None
+
+    def init_app(self, app):
+        ttl = app.config.get('IDENTITY_CACHE_TTL', DEFAULT_TTL_SECONDS)
+        self.local = LocalIdentityCache(app.config.get('IDENTITY_CACHE_SIZE', DEFAULT_MAX_ENTRIES), ttl)
+        url = app.config.get('IDENTITY_CACHE_URL')
+        self.shared = RedisIdentityCache(url, ttl) if url else None
+
+    def _query(self, user_id):
+        # Del primario: lo leído queda en caché hasta el TTL aunque la réplica alcance después
+        with primary_reads():
+            row = db.session.query(
+                User.id, User.email, User.user_type, User.account_status, Company.id, Carrier.id,
+                Company.commercial_name, Company.trade_name, Company.legal_name
+            ).outerjoin(Company, Company.user_id == User.id).outerjoin(
+                Carrier, Carrier.user_id == User.id
+            ).filter(User.id == user_id).first()
+        if row is None:
+            return None
+        return {
+            'id': row[0],
+            'email': row[1],
+            'user_type': row[2].value,
+            'account_status': row[3].value if row[3] else None,
+            'company_id': row[4],
+            'carrier_id': row[5],
+            'display_name': User.build_display_name(row[1], row[6], row[7], row[8])
+        }
+
+    def get(self, user_id):
+        data = self.local.get(user_id)
+        if data is None and self.shared is not None:
+            data = self.shared.get(user_id)
+            if data is not None:
+                self.local.set(user_id, data)
+        if data is not None:
+            metrics.inc('identity_cache_hits_total')
+            return data
+
+        metrics.inc('identity_cache_misses_total')
+        data = self._query(user_id)
+        if data is not None:
+            self.local.set(user_id, data)
+            if self.shared is not None:
+                self.shared.set(user_id, data)
+        return data
+
+    def load_user(self, user_id):
+        data = self.get(user_id)
+        return CachedUser(data) if data is not None else None
+
+    def invalidate(self, user_ids):
+        for user_id in user_ids:
+            self.local.delete(user_id)
+            if self.shared is not None:
+                self.shared.delete(user_id)
+
+
+identity_cache = IdentityCache()
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_changed_identities(session, flush_context):
+    changed = set()
+    for obj in session.dirty:
+        if isinstance(obj, User) and obj.id is not None:
+            state = inspect(obj)
+            if any(state.attrs[column].history.has_changes() for column in IDENTITY_COLUMNS):
+                changed.add(obj.id)
+        elif isinstance(obj, Company) and obj.user_id is not None:
+            state = inspect(obj)
+            if any(state.attrs[column].history.has_changes() for column in DISPLAY_NAME_COLUMNS):
+                changed.add(obj.user_id)
+    for obj in list(session.new) + list(session.deleted):
+        if isinstance(obj, User) and obj.id is not None:
+            changed.add(obj.id)
+        elif isinstance(obj, (Company, Carrier)) and obj.user_id is not None:
+            changed.add(obj.user_id)
+    if changed:
+        track_on_commit(session, 'identity_dirty_users', changed, identity_cache.invalidate)
\ No newline at end of file
@@ -0,0 +1,66 @@
+import io
+
+from PIL import Image, ImageOps
+
+from app.services.blobs import write_bytes
+
+JPEG_QUALITY = 85
+MAX_PIXELS = 40_000_000
+
+# Más píxeles que esto se trata como bomba de descompresión y se rechaza
+Image.MAX_IMAGE_PIXELS = MAX_PIXELS
+
+
+class InvalidImage(ValueError):
+    """El archivo no es una imagen que se pueda procesar"""
+
+
+def _normalize(image):
+    """Aplicar la orientación EXIF y llevar a RGB (o RGBA si hay transparencia)"""
+    image = ImageOps.exif_transpose(image)
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        return image.convert('RGBA'), 'PNG'
+    return image.convert('RGB'), 'JPEG'
+
+
+def process_image(source_path, blob_root, variants):
+    """Generar las variantes redimensionadas de una imagen, sin metadatos.
+
+    Corre en el pool de procesos, fuera del hilo del request: solo depende de
+    Pillow y del sistema de archivos. variants va de nombre a lado máximo en
+    píxeles; cada variante se guarda en el almacén por contenido. Devuelve las
+    dimensiones de la imagen y, por variante, sha256, dimensiones y tamaño.
+    """
+    try:
+        with Image.open(source_path) as image:
+            image.verify()
+        with Image.open(source_path) as image:
+            image.load()
+            normalized, image_format = _normalize(image)
+    except (OSError, SyntaxError, ValueError, Image.DecompressionBombError) as error:
+        raise InvalidImage(f'Imagen inválida o dañada ({type(error).__name__})')
+
+    options = {'optimize': True}
+    if image_format == 'JPEG':
+        options.update(quality=JPEG_QUALITY, progressive=True)
+
+    results = {}
+    for name, max_side in variants.items():
+        resized = normalized.copy()
+        resized.thumbnail((max_side, max_side), Image.LANCZOS)
+        buffer = io.BytesIO()
+        # Sin exif= ni pnginfo=: la copia guardada no lleva los metadatos del original
+        resized.save(buffer, image_format, **options)
+        data = buffer.getvalue()
+        results[name] = {
+            'sha256': write_bytes(blob_root, data),
+            'width': resized.width,
+            'height': resized.height,
+            'size': len(data)
+        }
+    return {
+        'width': normalized.width,
+        'height': normalized.height,
+        'mime_type': 'image/png' if image_format == 'PNG' else 'image/jpeg',
+        'variants': results
+    }
\ No newline at end of file
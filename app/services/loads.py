@@ -0,0 +1,92 @@
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app import db
+from app.models.shipment import Shipment, ShipmentStatus
+from app.services.geo import covering_cells, haversine_km_batch
+from datetime import datetime, timedelta
+
+# Estados en los que una carga todavía puede ser tomada por un transportista
+OPEN_STATUSES = [ShipmentStatus.PUBLISHED, ShipmentStatus.PENDING_QUOTES]
+
+# Agrupación de estados usada por los listados de empresas y transportistas
+STATUS_GROUPS = {
+    'published': OPEN_STATUSES,
+    'in_progress': [ShipmentStatus.ASSIGNED, ShipmentStatus.IN_TRANSIT],
+    'completed': [ShipmentStatus.DELIVERED],
+    'cancelled': [ShipmentStatus.CANCELLED, ShipmentStatus.DISPUTED],
+}
+
+DEFAULT_RADIUS_KM = 80
+MAX_RADIUS_KM = 500
+DEFAULT_WINDOW_HOURS = 48
+MAX_WINDOW_HOURS = 24 * 30
+
+
+def open_loads_query(hours=DEFAULT_WINDOW_HOURS, now=None):
+    """Cargas abiertas con recogida dentro de la ventana indicada"""
+    now = now or datetime.utcnow()
+    return Shipment.query.filter(
+        Shipment.status.in_(OPEN_STATUSES),
+        Shipment.pickup_date >= now,
+        Shipment.pickup_date <= now + timedelta(hours=hours)
+    )
+
+
+def find_nearby_loads(lat, lng, radius_km=DEFAULT_RADIUS_KM, hours=DEFAULT_WINDOW_HOURS, limit=50, now=None, after=None):
+    """Cargas cuyo origen está a menos de radius_km, ordenadas por cercanía.
+
+    Devuelve una lista de tuplas (shipment, distancia_km). El filtro grueso usa
+    los prefijos geohash indexados, de modo que solo se leen las cargas de las
+    celdas vecinas; el filtro fino se hace con la distancia real. after es la
+    clave (distancia, id) del último elemento de la página anterior.
+    """
+    cells = covering_cells(lat, lng, radius_km)
+    candidates = open_loads_query(hours, now).filter(
+        db.or_(*[Shipment.origin_geohash.like(f'{cell}%') for cell in cells])
+    ).all()
+
+    if not candidates:
+        return []
+    
+    distances = haversine_km_batch(
+        lat, lng,
+        [shipment.origin_lat for shipment in candidates],
+        [shipment.origin_lng for shipment in candidates]
+    )
+    results = [
+        (shipment, float(distance))
+        for shipment, distance in zip(candidates, distances)
+        if distance <= radius_km
+    ]
+
+    results.sort(key=lambda item: (item[1], item[0].id))
+    if after is not None:
+        results = [item for item in results if (item[1], item[0].id) > tuple(after)]
+    return results[:limit]
+
+
+def ensure_route_distances(shipments):
+    """Calcular en un solo paso vectorizado las distancias de ruta que falten.
+
+    Solo completa route_distance_km en memoria para mostrarlo: las vistas que
+    lo usan son GET y no confirman nada. En la base lo mantienen el listener
+    de inserción/actualización de Shipment y el backfill de la migración; el
+    valor se fija como ya confirmado para no ensuciar los objetos ni provocar
+    un UPDATE por autoflush. Devuelve la cantidad de cargas completadas.
+    """
+    pending = [
+        shipment for shipment in shipments
+        if shipment.route_distance_km is None and shipment.has_route_coordinates
+    ]
+    if not pending:
+        return 0
+    
+    distances = haversine_km_batch(
+        [shipment.origin_lat for shipment in pending],
+        [shipment.origin_lng for shipment in pending],
+        [shipment.destination_lat for shipment in pending],
+        [shipment.destination_lng for shipment in pending]
+    )
+    for shipment, distance in zip(pending, distances):
+        set_committed_value(shipment, 'route_distance_km', float(distance))
+    return len(pending)
\ No newline at end of file
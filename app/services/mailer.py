@@ -0,0 +1,140 @@
+import logging
+import random
+import smtplib
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app, render_template
+from flask_mail import Message
+
+from app import db, mail
+from app.models.outbox import OutboundEmail, OutboxStatus
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 50
+DEFAULT_MAX_ATTEMPTS = 6
+DEFAULT_RETRY_BASE_SECONDS = 30
+MAX_RETRY_DELAY = timedelta(hours=6)
+
+# Errores tras los cuales la conexión SMTP ya no sirve para el resto del lote
+CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError)
+
+
+def enqueue_email(recipient, subject, template, **context):
+    """Renderizar emails/<template>.html y .txt y dejar el mensaje en la bandeja de salida.
+
+    No hace commit: el mensaje se confirma en la misma transacción que el
+    cambio que lo origina (por ejemplo el registro del usuario).
+    """
+    email = OutboundEmail(
+        recipient=recipient,
+        subject=subject,
+        html_body=render_template(f'emails/{template}.html', **context),
+        text_body=render_template(f'emails/{template}.txt', **context),
+        status=OutboxStatus.PENDING,
+        attempts=0,
+        next_attempt_at=datetime.utcnow()
+    )
+    db.session.add(email)
+    return email
+
+
+def retry_delay(attempts, base_seconds=DEFAULT_RETRY_BASE_SECONDS):
+    """Backoff exponencial con jitter: base, 2*base, 4*base... hasta MAX_RETRY_DELAY"""
+    delay = timedelta(seconds=base_seconds * 2 ** (attempts - 1))
+    delay = min(delay, MAX_RETRY_DELAY)
+    return delay * random.uniform(0.8, 1.2)
+
+
+def _claim_batch(batch_size, now):
+    query = OutboundEmail.query.filter(
+        OutboundEmail.status == OutboxStatus.PENDING,
+        OutboundEmail.next_attempt_at <= now
+    ).order_by(OutboundEmail.next_attempt_at, OutboundEmail.id).limit(batch_size)
+    # Con varios workers, cada uno toma filas distintas (ignorado por SQLite)
+    return query.with_for_update(skip_locked=True).all()
+
+
+def _record_failure(email, error, now, max_attempts, base_seconds):
+    email.attempts += 1
+    email.last_error = f'{type(error).__name__}: {error}'[:1000]
+    if email.attempts >= max_attempts:
+        email.status = OutboxStatus.FAILED
+        logger.error('Email %s a %s descartado tras %s intentos', email.id, email.recipient, email.attempts)
+    else:
+        email.next_attempt_at = now + retry_delay(email.attempts, base_seconds)
+
+
+def dispatch_pending(batch_size=None):
+    """Enviar un lote de la bandeja de salida por una sola conexión SMTP.
+
+    Devuelve (enviados, fallidos). Requiere contexto de aplicación.
+    """
+    config = current_app.config
+    batch_size = batch_size or config.get('MAIL_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+    max_attempts = config.get('MAIL_MAX_ATTEMPTS', DEFAULT_MAX_ATTEMPTS)
+    base_seconds = config.get('MAIL_RETRY_BASE_SECONDS', DEFAULT_RETRY_BASE_SECONDS)
+
+    now = datetime.utcnow()
+    batch = _claim_batch(batch_size, now)
+    if not batch:
+        db.session.rollback()
+        return 0, 0
+
+    sent = failed = 0
+    try:
+        with mail.connect() as connection:
+            for email in batch:
+                try:
+                    connection.send(Message(
+                        subject=email.subject,
+                        recipients=[email.recipient],
+                        html=email.html_body,
+                        body=email.text_body
+                    ))
+                except CONNECTION_ERRORS as error:
+                    # El resto del lote queda pendiente para la próxima conexión
+                    _record_failure(email, error, now, max_attempts, base_seconds)
+                    failed += 1
+                    break
+                except Exception as error:
+                    _record_failure(email, error, now, max_attempts, base_seconds)
+                    failed += 1
+                else:
+                    email.status = OutboxStatus.SENT
+                    email.attempts += 1
+                    email.sent_date = datetime.utcnow()
+                    email.last_error = None
+                    sent += 1
+    except Exception as error:
+        # No se pudo abrir (o cerrar) la conexión: todo lo no enviado se reprograma
+        logger.warning('Servidor SMTP no disponible: %s', error)
+        for email in batch:
+            if email.status == OutboxStatus.PENDING and email.next_attempt_at <= now:
+                _record_failure(email, error, now, max_attempts, base_seconds)
+                failed += 1
+
+    db.session.commit()
+    return sent, failed
+
+
+def run_worker(interval=5.0, batch_size=None, once=False):
+    """Bucle del worker: vacía la bandeja por lotes y duerme cuando no hay trabajo"""
+    batch_size = batch_size or current_app.config.get('MAIL_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+    total_sent = total_failed = 0
+    while True:
+        try:
+            sent, failed = dispatch_pending(batch_size)
+        except Exception:
+            db.session.rollback()
+            logger.exception('Error despachando la bandeja de salida')
+            sent, failed = 0, 0
+            if once:
+                raise
+        total_sent += sent
+        total_failed += failed
+        if once and sent + failed < batch_size:
+            return total_sent, total_failed
+        if sent + failed < batch_size:
+            time.sleep(interval)
\ No newline at end of file
@@ -0,0 +1,309 @@
+import heapq
+import math
+import threading
+import time
+import unicodedata
+
+from sqlalchemy import case, event, func
+from sqlalchemy.orm import Session
+
+from app import db
+from app.models.carrier import Carrier
+from app.models.shipment import Shipment, CargoType
+from app.models.vehicle import Vehicle
+from app.services.loads import open_loads_query
+from app.services.replicas import primary_reads
+from app.services.transactions import track_on_commit
+
+# Etiquetas libres (perfil del transportista) -> tipo de carga
+CARGO_ALIASES = {
+    'general': CargoType.GENERAL_MERCHANDISE,
+    'mercancia general': CargoType.GENERAL_MERCHANDISE,
+    'carga general': CargoType.GENERAL_MERCHANDISE,
+    'alimentos': CargoType.FOOD,
+    'comida': CargoType.FOOD,
+    'materiales de construccion': CargoType.CONSTRUCTION_MATERIALS,
+    'construccion': CargoType.CONSTRUCTION_MATERIALS,
+    'electronicos': CargoType.ELECTRONICS,
+    'electronica': CargoType.ELECTRONICS,
+    'muebles': CargoType.FURNITURE,
+    'quimicos': CargoType.CHEMICALS,
+    'refrigerada': CargoType.REFRIGERATED,
+    'refrigerados': CargoType.REFRIGERATED,
+    'carga refrigerada': CargoType.REFRIGERATED,
+    'peligrosa': CargoType.DANGEROUS_GOODS,
+    'mercancia peligrosa': CargoType.DANGEROUS_GOODS,
+    'carga peligrosa': CargoType.DANGEROUS_GOODS,
+}
+for _cargo_type in CargoType:
+    CARGO_ALIASES[_cargo_type.value] = _cargo_type
+    CARGO_ALIASES[_cargo_type.value.replace('_', ' ')] = _cargo_type
+
+ROUTE_SEPARATORS = ('→', '->', '–', '—', '-')
+
+DEFAULT_TOP_K = 10
+MAX_TOP_K = 100
+CANDIDATE_LOADS_LIMIT = 500
+
+
+def normalize_text(value):
+    """Minúsculas, sin tildes y con espacios colapsados"""
+    if not value:
+        return ''
+    value = unicodedata.normalize('NFKD', str(value))
+    value = ''.join(ch for ch in value if not unicodedata.combining(ch))
+    return ' '.join(value.lower().split())
+
+
+def cargo_type_for(label):
+    return CARGO_ALIASES.get(normalize_text(label))
+
+
+def lane_key(origin_city, destination_city):
+    return f'{normalize_text(origin_city)}|{normalize_text(destination_city)}'
+
+
+def parse_route(route):
+    """'Bogotá - Medellín' -> ('bogota', 'medellin')"""
+    for separator in ROUTE_SEPARATORS:
+        if separator in route:
+            origin, destination = route.split(separator, 1)
+            origin, destination = normalize_text(origin), normalize_text(destination)
+            if origin and destination:
+                return origin, destination
+    return None
+
+
+class CarrierProfile:
+    """Instantánea de los datos de un transportista relevantes para el matching"""
+
+    __slots__ = (
+        'carrier_id', 'user_id', 'max_capacity_kg', 'max_volume_m3', 'refrigerated',
+        'dangerous_goods', 'average_rating', 'completed_trips', 'cargo_types', 'lanes', 'origins'
+    )
+
+    def __init__(self, carrier, vehicle_stats=None):
+        max_weight, max_volume, any_refrigeration = vehicle_stats or (None, None, False)
+        capacities = [value for value in (carrier.max_capacity_kg, max_weight) if value]
+
+        self.carrier_id = carrier.id
+        self.user_id = carrier.user_id
+        self.max_capacity_kg = max(capacities) if capacities else None
+        self.max_volume_m3 = max_volume
+        self.refrigerated = bool(carrier.has_refrigerated_equipment or any_refrigeration)
+        self.dangerous_goods = bool(carrier.has_dangerous_goods_cert)
+        self.average_rating = carrier.average_rating or 0.0
+        self.completed_trips = carrier.completed_trips or 0
+
+        self.cargo_types = set()
+        for label in carrier.get_cargo_specializations():
+            cargo_type = cargo_type_for(label)
+            if cargo_type:
+                self.cargo_types.add(cargo_type)
+
+        self.lanes = set()
+        self.origins = set()
+        for route in carrier.get_usual_routes():
+            parsed = parse_route(route) if isinstance(route, str) else None
+            if parsed:
+                self.lanes.add(f'{parsed[0]}|{parsed[1]}')
+                self.origins.add(parsed[0])
+
+    def can_carry(self, shipment):
+        """Reglas duras de elegibilidad"""
+        if shipment.cargo_type == CargoType.REFRIGERATED and not self.refrigerated:
+            return False
+        if shipment.cargo_type == CargoType.DANGEROUS_GOODS and not self.dangerous_goods:
+            return False
+        if self.cargo_types and shipment.cargo_type not in self.cargo_types:
+            return False
+        if self.max_capacity_kg is not None and shipment.weight_kg > self.max_capacity_kg:
+            return False
+        if self.max_volume_m3 is not None and shipment.volume_m3 and shipment.volume_m3 > self.max_volume_m3:
+            return False
+        return True
+
+    def score(self, shipment):
+        """Puntaje de afinidad; mayor es mejor"""
+        score = 0.0
+        lane = lane_key(shipment.origin_city, shipment.destination_city)
+        if lane in self.lanes:
+            score += 3.0
+        elif normalize_text(shipment.origin_city) in self.origins:
+            score += 1.0
+        if shipment.cargo_type in self.cargo_types:
+            score += 1.5
+        score += 2.0 * (self.average_rating / 5.0)
+        score += min(math.log1p(self.completed_trips) / 5.0, 1.0)
+        if self.max_capacity_kg:
+            # Preferir vehículos que se aprovechen bien sobre los sobredimensionados
+            score += shipment.weight_kg / self.max_capacity_kg
+        return score
+
+    def to_dict(self):
+        return {
+            'carrier_id': self.carrier_id,
+            'average_rating': self.average_rating,
+            'completed_trips': self.completed_trips,
+            'max_capacity_kg': self.max_capacity_kg,
+            'refrigerated': self.refrigerated,
+            'dangerous_goods': self.dangerous_goods,
+            'cargo_types': sorted(cargo_type.value for cargo_type in self.cargo_types)
+        }
+
+
+class MatchingIndex:
+    """Índice invertido en memoria de transportistas para el matching.
+
+    Mantiene tipo de carga -> transportistas y ruta -> transportistas con las
+    columnas JSON ya decodificadas. Los cambios confirmados en Carrier/Vehicle
+    marcan al transportista como sucio y se recargan en la siguiente consulta;
+    la recarga completa periódica cubre cambios hechos por otros procesos.
+    """
+
+    def __init__(self, refresh_seconds=300):
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.RLock()
+        self._profiles = {}
+        self._by_cargo = {}
+        self._generalists = set()
+        self._by_lane = {}
+        self._dirty = set()
+        self._loaded_at = None
+
+    def mark_dirty(self, carrier_ids):
+        with self._lock:
+            self._dirty.update(carrier_ids)
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = None
+
+    def _ensure_fresh(self):
+        # Del primario: una réplica atrasada devolvería filas viejas y _dirty se vacía igual
+        with self._lock, primary_reads():
+            expired = self._loaded_at is None or time.monotonic() - self._loaded_at > self.refresh_seconds
+            if expired:
+                self._rebuild()
+            elif self._dirty:
+                self._reload(self._dirty)
+            self._dirty.clear()
+
+    def _load_profiles(self, carrier_ids=None):
+        # Los transportistas con documentos vencidos no entran al índice
+        carriers = Carrier.query.filter(Carrier.is_compliant.is_(True))
+        vehicles = db.session.query(
+            Vehicle.carrier_id,
+            func.max(Vehicle.max_weight_kg),
+            func.max(Vehicle.capacity_m3),
+            func.max(case((Vehicle.has_refrigeration.is_(True), 1), else_=0))
+        ).filter(Vehicle.is_active.is_(True)).group_by(Vehicle.carrier_id)
+        if carrier_ids is not None:
+            carriers = carriers.filter(Carrier.id.in_(carrier_ids))
+            vehicles = vehicles.filter(Vehicle.carrier_id.in_(carrier_ids))
+
+        vehicle_stats = {
+            carrier_id: (max_weight, max_volume, bool(refrigeration))
+            for carrier_id, max_weight, max_volume, refrigeration in vehicles
+        }
+        return [CarrierProfile(carrier, vehicle_stats.get(carrier.id)) for carrier in carriers]
+
+    def _add(self, profile):
+        self._profiles[profile.carrier_id] = profile
+        if profile.cargo_types:
+            for cargo_type in profile.cargo_types:
+                self._by_cargo.setdefault(cargo_type, set()).add(profile.carrier_id)
+        else:
+            self._generalists.add(profile.carrier_id)
+        for lane in profile.lanes:
+            self._by_lane.setdefault(lane, set()).add(profile.carrier_id)
+
+    def _remove(self, carrier_id):
+        profile = self._profiles.pop(carrier_id, None)
+        if profile is None:
+            return
+        for cargo_type in profile.cargo_types:
+            self._by_cargo.get(cargo_type, set()).discard(carrier_id)
+        self._generalists.discard(carrier_id)
+        for lane in profile.lanes:
+            self._by_lane.get(lane, set()).discard(carrier_id)
+
+    def _rebuild(self):
+        self._profiles = {}
+        self._by_cargo = {}
+        self._generalists = set()
+        self._by_lane = {}
+        for profile in self._load_profiles():
+            self._add(profile)
+        self._loaded_at = time.monotonic()
+
+    def _reload(self, carrier_ids):
+        carrier_ids = list(carrier_ids)
+        for carrier_id in carrier_ids:
+            self._remove(carrier_id)
+        for profile in self._load_profiles(carrier_ids):
+            self._add(profile)
+
+    def profile(self, carrier_id):
+        self._ensure_fresh()
+        return self._profiles.get(carrier_id)
+
+    def eligible_carriers(self, shipment, lane_only=False):
+        """Transportistas que pueden llevar la carga; con lane_only, solo los que hacen esa ruta"""
+        self._ensure_fresh()
+        with self._lock:
+            candidate_ids = self._by_cargo.get(shipment.cargo_type, set()) | self._generalists
+            if lane_only:
+                candidate_ids &= self._by_lane.get(lane_key(shipment.origin_city, shipment.destination_city), set())
+            profiles = [self._profiles[carrier_id] for carrier_id in candidate_ids]
+        return [profile for profile in profiles if profile.can_carry(shipment)]
+
+    def top_carriers(self, shipment, k=DEFAULT_TOP_K, lane_only=False):
+        """Los k transportistas elegibles con mejor puntaje para una carga"""
+        scored = ((profile.score(shipment), profile) for profile in self.eligible_carriers(shipment, lane_only))
+        return heapq.nlargest(k, scored, key=lambda item: item[0])
+
+    def top_shipments(self, carrier_id, k=DEFAULT_TOP_K, now=None):
+        """Las k cargas abiertas con mejor puntaje para un transportista"""
+        profile = self.profile(carrier_id)
+        if profile is None:
+            return []
+
+        query = open_loads_query(hours=24 * 14, now=now)
+        allowed = set(profile.cargo_types) if profile.cargo_types else set(CargoType)
+        if not profile.refrigerated:
+            allowed.discard(CargoType.REFRIGERATED)
+        if not profile.dangerous_goods:
+            allowed.discard(CargoType.DANGEROUS_GOODS)
+        if not allowed:
+            return []
+        query = query.filter(Shipment.cargo_type.in_(allowed))
+        if profile.max_capacity_kg is not None:
+            query = query.filter(Shipment.weight_kg <= profile.max_capacity_kg)
+
+        candidates = query.order_by(Shipment.pickup_date).limit(CANDIDATE_LOADS_LIMIT).all()
+        scored = (
+            (profile.score(shipment), shipment)
+            for shipment in candidates if profile.can_carry(shipment)
+        )
+        return heapq.nlargest(k, scored, key=lambda item: item[0])
+
+
+matching_index = MatchingIndex()
+
+
+def track_changed_carriers(session, carrier_ids):
+    """Marcar transportistas para recargar en el índice cuando la sesión confirme"""
+    track_on_commit(session, 'matching_dirty_carriers', carrier_ids, matching_index.mark_dirty)
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_changed_carriers(session, flush_context):
+    changed = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Carrier) and obj.id is not None:
+            changed.add(obj.id)
+        elif isinstance(obj, Vehicle) and obj.carrier_id is not None:
+            changed.add(obj.carrier_id)
+    if changed:
+        track_changed_carriers(session, changed)
\ No newline at end of file
@@ -0,0 +1,80 @@
+import bisect
+import threading
+
+DEFAULT_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class Histogram:
+    """Histograma acumulativo con cubetas fijas"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS_MS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.total += value
+            self.count += 1
+
+    def snapshot(self):
+        with self._lock:
+            cumulative = 0
+            buckets = {}
+            for bound, count in zip(self.buckets, self.counts):
+                cumulative += count
+                buckets[str(bound)] = cumulative
+            buckets['+Inf'] = cumulative + self.counts[-1]
+            return {
+                'count': self.count,
+                'sum': round(self.total, 3),
+                'avg': round(self.total / self.count, 3) if self.count else 0.0,
+                'buckets': buckets
+            }
+
+
+class MetricsRegistry:
+    """Registro en proceso de contadores, medidores e histogramas"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+
+    def inc(self, name, amount=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def gauge(self, name, callback):
+        """Registrar un medidor calculado al momento de leer las métricas"""
+        self._gauges[name] = callback
+
+    def histogram(self, name, buckets=DEFAULT_BUCKETS_MS):
+        with self._lock:
+            if name not in self._histograms:
+                self._histograms[name] = Histogram(buckets)
+            return self._histograms[name]
+
+    def snapshot(self):
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = dict(self._histograms)
+        gauges = {}
+        for name, callback in self._gauges.items():
+            try:
+                gauges[name] = callback()
+            except Exception:
+                gauges[name] = None
+        return {
+            'counters': counters,
+            'gauges': gauges,
+            'histograms': {name: histogram.snapshot() for name, histogram in histograms.items()}
+        }
+
+
+metrics = MetricsRegistry()
\ No newline at end of file
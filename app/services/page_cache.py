@@ -0,0 +1,242 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, request
+from flask.globals import request_ctx
+from flask_login import current_user
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+
+from app.models.carrier import Carrier
+from app.models.company import Company
+from app.models.document import Document
+from app.models.notification import Notification
+from app.models.quote import Quote
+from app.models.shipment import Shipment
+from app.models.user import User
+from app.models.vehicle import Vehicle
+from app.services.metrics import metrics
+from app.services.replicas import primary_reads
+from app.services.transactions import track_on_commit
+
+DEFAULT_TTL_SECONDS = 60
+DEFAULT_MAX_ENTRIES = 5000
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+class LocalPageCache:
+    """LRU en proceso acotado por número de entradas y por bytes, con expiración por entrada"""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES, ttl=DEFAULT_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.size = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._versions = {}
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, body = entry
+            if expires_at < time.monotonic():
+                self._pop(key)
+                return None
+            self._entries.move_to_end(key)
+            return body
+
+    def set(self, key, body):
+        with self._lock:
+            self._pop(key)
+            self._entries[key] = (time.monotonic() + self.ttl, body)
+            self.size += len(body)
+            while self._entries and (len(self._entries) > self.max_entries or self.size > self.max_bytes):
+                self._pop(next(iter(self._entries)))
+
+    def _pop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry[1])
+
+    def version(self, user_id):
+        return self._versions.get(user_id, 0)
+
+    def bump(self, user_ids):
+        # Las entradas de la versión anterior ya no se piden y salen por LRU o TTL
+        with self._lock:
+            for user_id in user_ids:
+                self._versions[user_id] = self._versions.get(user_id, 0) + 1
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class RedisPageCache:
+    """Backend compartido entre procesos; requiere el paquete redis.
+
+    Las versiones viven en Redis (INCR), así que un cambio confirmado en
+    cualquier proceso invalida las páginas de todos.
+    """
+
+    def __init__(self, url, ttl=DEFAULT_TTL_SECONDS, prefix='page:'):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError('PAGE_CACHE_URL requiere el paquete redis')
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key):
+        return self.client.get(f'{self.prefix}{key}')
+
+    def set(self, key, body):
+        self.client.setex(f'{self.prefix}{key}', self.ttl, body)
+
+    def version(self, user_id):
+        return int(self.client.get(f'{self.prefix}version:{user_id}') or 0)
+
+    def bump(self, user_ids):
+        pipeline = self.client.pipeline(transaction=False)
+        for user_id in user_ids:
+            pipeline.incr(f'{self.prefix}version:{user_id}')
+        pipeline.execute()
+
+
+class PageCache:
+    """Caché de páginas renderizadas por usuario y token de versión.
+
+    La clave lleva la versión del usuario, que sube cuando se confirman
+    cambios en su perfil o en sus cargas, ofertas o notificaciones; una
+    página cacheada nunca sobrevive a un cambio propio. Con el backend local
+    cada proceso tiene sus versiones y el TTL acota cuánto tarda otro worker
+    en ver el cambio; con PAGE_CACHE_URL las versiones son compartidas. El
+    ETag es el hash del cuerpo, así que la revalidación del navegador nunca
+    confirma un HTML distinto del que tiene.
+    """
+
+    def __init__(self):
+        self.backend = LocalPageCache()
+        self.enabled = True
+
+    def init_app(self, app):
+        self.enabled = app.config.get('PAGE_CACHE_ENABLED', True)
+        ttl = app.config.get('PAGE_CACHE_TTL', DEFAULT_TTL_SECONDS)
+        url = app.config.get('PAGE_CACHE_URL')
+        if url:
+            self.backend = RedisPageCache(url, ttl)
+        else:
+            self.backend = LocalPageCache(
+                app.config.get('PAGE_CACHE_SIZE', DEFAULT_MAX_ENTRIES),
+                app.config.get('PAGE_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES),
+                ttl
+            )
+            metrics.gauge('page_cache_entries', lambda: len(self.backend))
+
+    def key(self, user_id):
+        return f'{user_id}:{self.backend.version(user_id)}:{request.endpoint}:{request.full_path}'
+
+    def bump(self, user_ids):
+        if user_ids:
+            self.backend.bump(user_ids)
+
+
+page_cache = PageCache()
+
+
+def cached_page(view):
+    """Cachear el HTML de una vista GET por usuario; va debajo de @login_required.
+
+    Solo se guardan respuestas 200 en HTML cuyo render no leyó mensajes
+    flash: una página que los muestra nunca entra en la caché, así que servir
+    desde ella no se come ni repite mensajes. Los fallos se renderizan contra
+    el primario; solo los aciertos ahorran la consulta.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not page_cache.enabled or request.method != 'GET':
+            return view(*args, **kwargs)
+
+        key = page_cache.key(current_user.id)
+        body = page_cache.backend.get(key)
+        if body is not None:
+            metrics.inc('page_cache_hits_total')
+            response = current_app.response_class(body, mimetype='text/html')
+        else:
+            metrics.inc('page_cache_misses_total')
+            # Del primario: la versión pudo subir por la escritura de otro usuario, sin ventana
+            # de lectura-tras-escritura para este, y una réplica atrasada quedaría guardada
+            # bajo la versión nueva
+            with primary_reads():
+                response = current_app.make_response(view(*args, **kwargs))
+            if (response.status_code != 200 or response.mimetype != 'text/html'
+                    or response.direct_passthrough or request_ctx.flashes is not None):
+                return response
+            body = response.get_data()
+            page_cache.backend.set(key, body)
+
+        # ETag del cuerpo, no de la clave: las versiones locales vuelven a 0 en cada worker y
+        # reinicio, y un If-None-Match viejo no debe recibir 304 por un HTML distinto
+        response.set_etag(hashlib.sha1(body).hexdigest())
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        return response.make_conditional(request)
+    return wrapper
+
+
+def track_changed_users(session, user_ids=(), company_ids=(), carrier_ids=(), shipment_ids=()):
+    """Marcar usuarios cuyas páginas cambian cuando la sesión confirme.
+
+    Para escrituras con Core (UPDATE o INSERT masivos) que no pasan por los
+    eventos del ORM. Empresas, transportistas y cargas se traducen a los
+    usuarios dueños con la conexión de la sesión.
+    """
+    changed = {user_id for user_id in user_ids if user_id is not None}
+    connection = session.connection()
+    shipment_ids = {shipment_id for shipment_id in shipment_ids if shipment_id is not None}
+    company_ids = {company_id for company_id in company_ids if company_id is not None}
+    carrier_ids = {carrier_id for carrier_id in carrier_ids if carrier_id is not None}
+    if shipment_ids:
+        for company_id, carrier_id in connection.execute(
+            select(Shipment.company_id, Shipment.carrier_id).where(Shipment.id.in_(shipment_ids))
+        ):
+            company_ids.add(company_id)
+            if carrier_id is not None:
+                carrier_ids.add(carrier_id)
+    if company_ids:
+        changed.update(connection.execute(select(Company.user_id).where(Company.id.in_(company_ids))).scalars())
+    if carrier_ids:
+        changed.update(connection.execute(select(Carrier.user_id).where(Carrier.id.in_(carrier_ids))).scalars())
+    if changed:
+        track_on_commit(session, 'page_cache_dirty_users', changed, page_cache.bump)
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_changed_pages(session, flush_context):
+    user_ids, company_ids, carrier_ids, shipment_ids = set(), set(), set(), set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, (User, Notification)):
+            user_ids.add(obj.id if isinstance(obj, User) else obj.user_id)
+        elif isinstance(obj, (Company, Carrier)):
+            user_ids.add(obj.user_id)
+        elif isinstance(obj, Shipment):
+            company_ids.add(obj.company_id)
+            # Al reasignar una carga cambian las páginas del transportista anterior y del nuevo
+            carrier_ids.update(inspect(obj).attrs.carrier_id.history.sum())
+        elif isinstance(obj, Quote):
+            shipment_ids.add(obj.shipment_id)
+            carrier_ids.add(obj.carrier_id)
+        elif isinstance(obj, Vehicle):
+            carrier_ids.add(obj.carrier_id)
+        elif isinstance(obj, Document):
+            {'user': user_ids, 'company': company_ids, 'carrier': carrier_ids}.get(obj.entity_type, set()).add(
+                obj.entity_id
+            )
+    if user_ids or company_ids or carrier_ids or shipment_ids:
+        track_changed_users(session, user_ids, company_ids, carrier_ids, shipment_ids)
\ No newline at end of file
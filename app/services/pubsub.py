@@ -0,0 +1,262 @@
+import json
+import logging
+import queue
+import threading
+import time
+
+from app import db
+from app.models.shipment import Shipment
+from app.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class Event:
+    """Mensaje publicado en un tema"""
+
+    __slots__ = ('topic', 'name', 'data', 'published_at')
+
+    def __init__(self, topic, name, data):
+        self.topic = topic
+        self.name = name
+        self.data = data
+        self.published_at = time.monotonic()
+
+    def to_sse(self):
+        return f'event: {self.name}\ndata: {json.dumps(self.data, default=str)}\n\n'
+
+
+class Subscription:
+    """Cola acotada de eventos para un espectador conectado"""
+
+    def __init__(self, topics, max_queue=100):
+        self.topics = tuple(topics)
+        self.closed = False
+        self._queue = queue.Queue(maxsize=max_queue)
+
+    def deliver(self, event):
+        try:
+            self._queue.put_nowait(event)
+            return True
+        except queue.Full:
+            # Espectador lento: se descarta el evento más antiguo
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                pass
+            metrics.inc('pubsub_dropped_total')
+            try:
+                self._queue.put_nowait(event)
+                return True
+            except queue.Full:
+                return False
+
+    def get(self, timeout=None):
+        try:
+            event = self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        metrics.histogram('pubsub_fanout_latency_ms').observe((time.monotonic() - event.published_at) * 1000.0)
+        return event
+
+
+class StreamLimitReached(RuntimeError):
+    """El proceso ya tiene SSE_MAX_STREAMS streams abiertos"""
+
+
+class RedisRelay:
+    """Reparte los eventos entre procesos con Redis pub/sub; requiere el paquete redis.
+
+    publish manda el evento a Redis y un hilo por proceso, arrancado con la
+    primera suscripción, lo recibe y lo entrega a las suscripciones locales:
+    un espectador conectado a cualquier worker ve los puntos volcados en
+    cualquier otro.
+    """
+
+    def __init__(self, url, deliver, prefix='pubsub:'):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError('PUBSUB_URL requiere el paquete redis')
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self._deliver = deliver
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def publish(self, topic, name, data):
+        self.client.publish(f'{self.prefix}{topic}', json.dumps({'name': name, 'data': data}, default=str))
+
+    def start(self):
+        # Tras el fork el hilo del padre no existe en el worker: is_alive() es False
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='pubsub-relay', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                listener = self.client.pubsub(ignore_subscribe_messages=True)
+                listener.psubscribe(f'{self.prefix}*')
+                for message in listener.listen():
+                    channel = message['channel']
+                    if isinstance(channel, bytes):
+                        channel = channel.decode()
+                    payload = json.loads(message['data'])
+                    self._deliver(channel[len(self.prefix):], payload['name'], payload['data'])
+            except Exception:
+                logger.exception('Relay de pub/sub desconectado; reintentando')
+                time.sleep(1.0)
+
+
+class Broker:
+    """Pub/sub de eventos en vivo para los streams SSE.
+
+    Las suscripciones viven en el proceso. Sin PUBSUB_URL un evento solo
+    llega a los espectadores del mismo proceso que lo publicó; con
+    PUBSUB_URL pasa por Redis y llega a los de todos. Cada stream ocupa un
+    hilo del servidor mientras está abierto, así que max_streams los limita
+    para que el resto del sitio siga atendiendo.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._topics = {}
+        self._streams = 0
+        self.max_streams = None
+        self.relay = None
+
+    def init_app(self, app):
+        self.max_streams = app.config.get('SSE_MAX_STREAMS')
+        url = app.config.get('PUBSUB_URL')
+        self.relay = RedisRelay(url, self._deliver) if url else None
+
+    def subscribe(self, topics, max_queue=100):
+        """Nueva suscripción; StreamLimitReached si el proceso ya tiene max_streams abiertos"""
+        subscription = Subscription(topics, max_queue)
+        with self._lock:
+            if self.max_streams and self._streams >= self.max_streams:
+                metrics.inc('sse_connections_rejected_total')
+                raise StreamLimitReached(f'{self._streams} streams abiertos')
+            self._streams += 1
+            for topic in subscription.topics:
+                self._topics.setdefault(topic, set()).add(subscription)
+        if self.relay is not None:
+            self.relay.start()
+        metrics.inc('sse_connections_opened_total')
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """Cerrar la suscripción; se puede llamar más de una vez (fin del stream y cierre de la respuesta)"""
+        with self._lock:
+            if subscription.closed:
+                return
+            subscription.closed = True
+            self._streams -= 1
+            for topic in subscription.topics:
+                subscribers = self._topics.get(topic)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._topics[topic]
+        metrics.inc('sse_connections_closed_total')
+
+    def has_subscribers(self, topic=None, prefix=None):
+        if self.relay is not None:
+            # Los espectadores pueden estar en otro proceso
+            return True
+        with self._lock:
+            if topic is not None:
+                return bool(self._topics.get(topic))
+            return any(name.startswith(prefix) for name in self._topics)
+
+    def publish(self, topic, name, data):
+        metrics.inc('pubsub_published_total')
+        if self.relay is not None:
+            self.relay.publish(topic, name, data)
+            return None
+        return self._deliver(topic, name, data)
+
+    def _deliver(self, topic, name, data):
+        """Copiar el evento a las suscripciones locales del tema; devuelve cuántas lo recibieron"""
+        with self._lock:
+            subscribers = list(self._topics.get(topic, ()))
+        if not subscribers:
+            return 0
+        event = Event(topic, name, data)
+        delivered = sum(1 for subscription in subscribers if subscription.deliver(event))
+        metrics.inc('pubsub_delivered_total', delivered)
+        return delivered
+
+    def connection_counts(self):
+        """Suscripciones activas agrupadas por tipo de tema (shipment, company, ...)"""
+        with self._lock:
+            unique = set()
+            by_kind = {}
+            for topic, subscribers in self._topics.items():
+                kind = topic.split(':', 1)[0]
+                by_kind[kind] = by_kind.get(kind, 0) + len(subscribers)
+                unique.update(subscribers)
+        by_kind['total'] = len(unique)
+        return by_kind
+
+
+broker = Broker()
+metrics.gauge('sse_connections', broker.connection_counts)
+
+
+def publish_location_updates(points_by_shipment):
+    """Listener del volcado de GPS: difunde la última posición de cada carga.
+
+    Se ejecuta una vez por volcado; la única consulta (empresa de cada carga)
+    solo se hace si hay paneles de empresa suscritos, y es independiente del
+    número de espectadores.
+    """
+    latest = {
+        shipment_id: max(rows, key=lambda row: row['timestamp'])
+        for shipment_id, rows in points_by_shipment.items()
+    }
+
+    company_ids = {}
+    if broker.has_subscribers(prefix='company:'):
+        company_ids = dict(
+            db.session.query(Shipment.id, Shipment.company_id).filter(Shipment.id.in_(list(latest)))
+        )
+
+    for shipment_id, row in latest.items():
+        data = {
+            'shipment_id': shipment_id,
+            'lat': row['latitude'],
+            'lng': row['longitude'],
+            'timestamp': row['timestamp'].isoformat(),
+            'location': row.get('location'),
+            'points': len(points_by_shipment[shipment_id])
+        }
+        broker.publish(f'shipment:{shipment_id}', 'location', data)
+        if shipment_id in company_ids:
+            broker.publish(f'company:{company_ids[shipment_id]}', 'location', data)
+
+def event_stream(subscription, snapshot=None, heartbeat=15.0, max_duration=300.0):
+    """Generador SSE: instantánea inicial, eventos y comentarios de latido.
+
+    El stream ocupa un hilo del servidor mientras dura; al llegar a
+    max_duration se cierra para que el navegador reconecte (EventSource lo
+    hace solo) y la conexión vuelva a pasar por el límite de streams.
+    """
+    deadline = time.monotonic() + max_duration
+    try:
+        yield f'retry: {int(heartbeat * 1000)}\n\n'
+        if snapshot is not None:
+            yield Event(None, 'snapshot', snapshot).to_sse()
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            event = subscription.get(timeout=min(heartbeat, remaining))
+            if event is None:
+                yield ': heartbeat\n\n'
+            else:
+                yield event.to_sse()
+    finally:
+        broker.unsubscribe(subscription)
\ No newline at end of file
@@ -0,0 +1,119 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+from app import db
+from app.models.carrier import Carrier
+from app.models.message import Message
+from app.models.notification import Notification
+from app.models.quote import Quote, QuoteStatus
+from app.models.shipment import Shipment, ShipmentStatus
+from app.models.tracking import TrackingEvent
+from app.models.vehicle import Vehicle
+from app.services.driver_search import postgres_match
+
+
+class Explain(Executable, ClauseElement):
+    """EXPLAIN de una sentencia, con los parámetros enlazados por SQLAlchemy"""
+
+    inherit_cache = False
+
+    def __init__(self, statement):
+        self.statement = statement
+
+
+@compiles(Explain)
+def _compile_explain(element, compiler, **kw):
+    if compiler.dialect.name == 'postgresql':
+        prefix = 'EXPLAIN (FORMAT JSON) '
+    else:
+        prefix = 'EXPLAIN QUERY PLAN '
+    return prefix + compiler.process(element.statement, **kw)
+
+
+def hot_queries():
+    """Consultas de las rutas calientes: (nombre, tabla, sentencia, dialectos o None)"""
+    now = datetime.utcnow()
+    return [
+        ('cargas abiertas por fecha de recogida', 'shipments',
+         select(Shipment.id).where(
+             Shipment.status == ShipmentStatus.PUBLISHED,
+             Shipment.pickup_date >= now,
+             Shipment.pickup_date <= now + timedelta(hours=48)
+         ), None),
+        ('cargas cercanas por geohash', 'shipments',
+         select(Shipment.id).where(
+             Shipment.origin_geohash.like('d2g6%'),
+             Shipment.pickup_date >= now
+         ), ('postgresql',)),
+        ('cargas de una empresa por estado', 'shipments',
+         select(Shipment.id).where(Shipment.company_id == 1, Shipment.status == ShipmentStatus.IN_TRANSIT), None),
+        ('viajes de un transportista por estado', 'shipments',
+         select(Shipment.id).where(Shipment.carrier_id == 1, Shipment.status == ShipmentStatus.DELIVERED), None),
+        ('ofertas pendientes de una carga', 'quotes',
+         select(Quote.id).where(Quote.shipment_id == 1, Quote.status == QuoteStatus.PENDING), None),
+        ('ofertas pendientes vencidas', 'quotes',
+         select(Quote.id).where(
+             Quote.status == QuoteStatus.PENDING, Quote.expiry_date < now
+         ).order_by(Quote.expiry_date, Quote.id), None),
+        ('notificaciones sin leer', 'notifications',
+         select(Notification.id).where(
+             Notification.user_id == 1, Notification.is_read.is_(False)
+         ).order_by(Notification.created_date.desc()), None),
+        ('línea de tiempo de seguimiento', 'tracking_events',
+         select(TrackingEvent.id).where(TrackingEvent.shipment_id == 1).order_by(TrackingEvent.timestamp), None),
+        ('mensajes de una conversación', 'messages',
+         select(Message.id).where(Message.conversation_id == 1).order_by(Message.sent_date), None),
+        ('transportistas con documentos vencidos', 'carriers',
+         select(Carrier.id).where(
+             Carrier.is_compliant.is_(True), Carrier.compliance_valid_until < now.date()
+         ), None),
+        ('SOAT por vencer', 'vehicles',
+         select(Vehicle.id).where(Vehicle.soat_expiry.between(now.date(), (now + timedelta(days=30)).date())), None),
+        ('búsqueda de conductores', 'carriers',
+         select(Carrier.id).where(postgres_match(['bogota', 'refri'])[0]), ('postgresql',)),
+    ]
+
+
+def _plan_nodes(plan):
+    yield plan
+    for child in plan.get('Plans', []):
+        yield from _plan_nodes(child)
+
+
+def sequential_scans(connection, statement, table):
+    """Líneas del plan que recorren la tabla completa; lista vacía si usa índices"""
+    dialect = connection.dialect.name
+    if dialect == 'postgresql':
+        # Con tablas pequeñas el planificador prefiere Seq Scan aunque exista el
+        # índice; deshabilitarlo deja solo los recorridos sin índice utilizable
+        connection.exec_driver_sql('SET LOCAL enable_seqscan = off')
+        document = connection.execute(Explain(statement)).scalar()
+        root = document[0]['Plan']
+        return [
+            f"Seq Scan on {node['Relation Name']}"
+            for node in _plan_nodes(root)
+            if node.get('Node Type') == 'Seq Scan' and node.get('Relation Name') == table
+        ]
+
+    rows = connection.execute(Explain(statement)).fetchall()
+    details = [row[-1] for row in rows]
+    return [
+        detail for detail in details
+        if detail.startswith(f'SCAN {table}') and 'USING' not in detail
+    ]
+
+
+def check_hot_query_plans():
+    """Ejecutar EXPLAIN sobre las consultas calientes; devuelve (nombre, problemas)"""
+    results = []
+    with db.engine.connect() as connection:
+        dialect = connection.dialect.name
+        for name, table, statement, dialects in hot_queries():
+            if dialects and dialect not in dialects:
+                continue
+            with connection.begin():
+                results.append((name, sequential_scans(connection, statement, table)))
+    return results
\ No newline at end of file
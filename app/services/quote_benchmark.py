@@ -0,0 +1,134 @@
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import delete, func, insert, select
+
+from app import db
+from app.models.carrier import Carrier, CarrierType
+from app.models.company import Company, CompanyType
+from app.models.company_stats import CompanyStats
+from app.models.quote import Quote, QuoteStatus
+from app.models.shipment import Shipment, ShipmentStatus, CargoType
+from app.models.user import User, UserType, AccountStatus
+from app.services.quotes import AcceptanceError, accept_quote
+from app.services.search_benchmark import percentile
+
+
+def _seed(carriers):
+    """Empresa, carga publicada y una oferta pendiente por conductor; devuelve ids"""
+    now = datetime.utcnow()
+    user_rows = [dict(
+        email='bench.company@benchmark.invalid', password_hash='-', user_type=UserType.COMPANY,
+        phone='0', address='-', city='Bogotá', account_status=AccountStatus.ACTIVE
+    )] + [dict(
+        email=f'bench.bidder{index}@benchmark.invalid', password_hash='-', user_type=UserType.CARRIER,
+        phone='0', address='-', city='Bogotá', account_status=AccountStatus.ACTIVE
+    ) for index in range(carriers)]
+    user_ids = db.session.execute(insert(User).returning(User.id, sort_by_parameter_order=True), user_rows).scalars().all()
+
+    company_id = db.session.execute(insert(Company).returning(Company.id), dict(
+        user_id=user_ids[0], legal_name='Benchmark', company_type=CompanyType.LEGAL
+    )).scalar_one()
+    carrier_ids = db.session.execute(
+        insert(Carrier).returning(Carrier.id, sort_by_parameter_order=True),
+        [dict(user_id=user_id, carrier_type=CarrierType.INDIVIDUAL) for user_id in user_ids[1:]]
+    ).scalars().all()
+    shipment_id = db.session.execute(insert(Shipment).returning(Shipment.id), dict(
+        company_id=company_id, title='Benchmark', cargo_type=CargoType.GENERAL_MERCHANDISE,
+        origin_address='-', origin_city='Bogotá', destination_address='-', destination_city='Medellín',
+        weight_kg=1000, pickup_date=now + timedelta(days=1), delivery_deadline=now + timedelta(days=3),
+        offered_price=1000000, status=ShipmentStatus.PUBLISHED
+    )).scalar_one()
+    db.session.execute(insert(Quote), [dict(
+        shipment_id=shipment_id, carrier_id=carrier_id, bid_amount=900000 + index,
+        status=QuoteStatus.PENDING, bid_date=now
+    ) for index, carrier_id in enumerate(carrier_ids)])
+    db.session.commit()
+    return user_ids, company_id, carrier_ids, shipment_id
+
+
+def _cleanup(user_ids, company_id, carrier_ids, shipment_id):
+    db.session.rollback()
+    db.session.execute(delete(Quote).where(Quote.shipment_id == shipment_id))
+    db.session.execute(delete(Shipment).where(Shipment.id == shipment_id))
+    db.session.execute(delete(CompanyStats).where(CompanyStats.company_id == company_id))
+    db.session.execute(delete(Company).where(Company.id == company_id))
+    db.session.execute(delete(Carrier).where(Carrier.id.in_(carrier_ids)))
+    db.session.execute(delete(User).where(User.id.in_(user_ids)))
+    db.session.commit()
+
+
+def run_benchmark(carriers=200, workers=32):
+    """Aceptar en paralelo la misma carga con una oferta distinta por hilo.
+
+    Los datos sintéticos se confirman (cada hilo usa su propia conexión) y se
+    borran al final. Comprueba que hubo exactamente un ganador y que todas las
+    demás ofertas quedaron rechazadas; devuelve un dict con conteos y
+    percentiles de latencia en ms.
+    """
+    app = current_app._get_current_object()
+    ids = _seed(carriers)
+    _, company_id, carrier_ids, shipment_id = ids
+    start = threading.Event()
+    lock = threading.Lock()
+    outcomes = {'accepted': 0, 'conflicts': 0, 'errors': 0}
+    samples = []
+
+    def attempt(carrier_id):
+        with app.app_context():
+            start.wait()
+            started = time.perf_counter()
+            try:
+                accept_quote(shipment_id, carrier_id, company_id=company_id)
+                outcome = 'accepted'
+            except AcceptanceError:
+                outcome = 'conflicts'
+            except Exception:
+                outcome = 'errors'
+            elapsed = (time.perf_counter() - started) * 1000
+            with lock:
+                outcomes[outcome] += 1
+                samples.append(elapsed)
+
+    try:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(attempt, carrier_id) for carrier_id in carrier_ids]
+            # Todos los hilos arrancan a la vez contra la misma fila
+            start.set()
+            for future in futures:
+                future.result()
+        wall_ms = (time.perf_counter() - started) * 1000
+
+        db.session.rollback()
+        shipment = db.session.get(Shipment, shipment_id)
+        by_status = dict(db.session.execute(
+            select(Quote.status, func.count()).where(Quote.shipment_id == shipment_id).group_by(Quote.status)
+        ).all())
+        winners = by_status.get(QuoteStatus.ACCEPTED, 0)
+        report = {
+            'dialect': db.engine.dialect.name,
+            'attempts': carriers,
+            'workers': workers,
+            **outcomes,
+            'accepted_quotes': winners,
+            'rejected_quotes': by_status.get(QuoteStatus.REJECTED, 0),
+            'pending_quotes': by_status.get(QuoteStatus.PENDING, 0),
+            'shipment_status': shipment.status.value,
+            'consistent': (
+                outcomes['accepted'] == 1 and winners == 1
+                and by_status.get(QuoteStatus.REJECTED, 0) == carriers - 1
+                and shipment.status == ShipmentStatus.ASSIGNED
+            ),
+            'wall_ms': round(wall_ms, 1),
+            'p50_ms': round(statistics.median(samples), 2),
+            'p95_ms': round(percentile(samples, 0.95), 2),
+            'max_ms': round(max(samples), 2)
+        }
+    finally:
+        _cleanup(*ids)
+    return report
\ No newline at end of file
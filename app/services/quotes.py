@@ -0,0 +1,191 @@
+import logging
+import time
+from datetime import datetime
+from decimal import Decimal
+
+from flask import current_app
+from sqlalchemy import Boolean, case, insert, literal, select, update
+
+from app import db
+from app.models.carrier import Carrier
+from app.models.notification import Notification, NotificationType
+from app.models.quote import Quote, QuoteStatus
+from app.models.shipment import Shipment, ShipmentStatus
+from app.services.loads import OPEN_STATUSES
+from app.services.page_cache import track_changed_users
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_EXPIRY_BATCH_SIZE = 500
+
+
+class AcceptanceError(ValueError):
+    """La carga u oferta no admite la aceptación pedida"""
+
+    def __init__(self, message, status_code=409):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def _lock_shipment(shipment_id):
+    """Bloquear solo la fila de la carga hasta el commit (SELECT ... FOR UPDATE)"""
+    query = Shipment.query.filter(Shipment.id == shipment_id).populate_existing()
+    if db.session.get_bind().dialect.name == 'sqlite':
+        # SQLite ignora FOR UPDATE: una escritura inocua sobre la fila toma el
+        # bloqueo de escritura antes de leer, y las demás aceptaciones esperan
+        db.session.execute(
+            update(Shipment).where(Shipment.id == shipment_id).values(id=Shipment.id),
+            execution_options={'synchronize_session': False}
+        )
+    else:
+        query = query.with_for_update()
+    shipment = query.one_or_none()
+    if shipment is None:
+        raise AcceptanceError('Carga no encontrada', 404)
+    return shipment
+
+
+def accept_quote(shipment_id, carrier_id, company_id=None, direct=False):
+    """Asignar la carga al transportista aceptando su oferta.
+
+    Con la fila de la carga bloqueada, las aceptaciones concurrentes de la
+    misma carga se atienden una detrás de otra y solo la primera la encuentra
+    abierta; las de otras cargas no esperan. company_id restringe la
+    aceptación al dueño de la carga. Con direct (el transportista acepta la
+    carga), si no tiene oferta pendiente se crea una al precio publicado.
+    Devuelve la oferta ganadora.
+    """
+    try:
+        shipment = _lock_shipment(shipment_id)
+        if company_id is not None and shipment.company_id != company_id:
+            raise AcceptanceError('No autorizado', 403)
+        if shipment.status not in OPEN_STATUSES:
+            raise AcceptanceError('La carga ya fue asignada')
+
+        quote = Quote.query.filter(
+            Quote.shipment_id == shipment.id,
+            Quote.carrier_id == carrier_id,
+            Quote.status == QuoteStatus.PENDING
+        ).order_by(Quote.bid_date.desc(), Quote.id.desc()).with_for_update().first()
+        if quote is None:
+            if not direct:
+                raise AcceptanceError('El conductor no tiene una oferta pendiente para esta carga', 404)
+            quote = Quote(
+                shipment_id=shipment.id, carrier_id=carrier_id,
+                bid_amount=shipment.offered_price, status=QuoteStatus.PENDING
+            )
+            db.session.add(quote)
+            db.session.flush()
+        elif quote.is_expired:
+            raise AcceptanceError('La oferta expiró')
+
+        now = datetime.utcnow()
+        # Una sola sentencia: la ganadora pasa a ACCEPTED y las demás pendientes a REJECTED
+        answered = db.session.execute(
+            update(Quote).where(
+                Quote.shipment_id == shipment.id,
+                Quote.status == QuoteStatus.PENDING
+            ).values(
+                status=case(
+                    (Quote.id == quote.id, literal(QuoteStatus.ACCEPTED, Quote.status.type)),
+                    else_=literal(QuoteStatus.REJECTED, Quote.status.type)
+                ),
+                response_date=now
+            ).returning(Quote.carrier_id),
+            execution_options={'synchronize_session': False}
+        ).scalars().all()
+        track_changed_users(db.session, carrier_ids=answered)
+
+        final_price = Decimal(quote.counter_offer or quote.bid_amount)
+        shipment.carrier_id = carrier_id
+        shipment.status = ShipmentStatus.ASSIGNED
+        shipment.assigned_date = now
+        shipment.final_price = final_price
+        shipment.commission_amount = (
+            final_price * Decimal(shipment.commission_percentage or 0) / 100
+        ).quantize(Decimal('0.01'))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return quote
+
+
+def _notify_expired(quote_ids, now):
+    """Una notificación por oferta expirada para su transportista, en un solo INSERT ... SELECT"""
+    rows = select(
+        Carrier.user_id,
+        literal('Oferta expirada'),
+        literal('Tu oferta para la carga "') + Shipment.title + literal('" expiró sin respuesta'),
+        literal(NotificationType.QUOTE_EXPIRED, Notification.notification_type.type),
+        literal(False, Boolean),
+        literal('quote'),
+        Quote.id,
+        literal(now, Notification.created_date.type)
+    ).join(Carrier, Carrier.id == Quote.carrier_id).join(Shipment, Shipment.id == Quote.shipment_id).where(
+        Quote.id.in_(quote_ids)
+    )
+    db.session.execute(insert(Notification).from_select([
+        'user_id', 'title', 'message', 'notification_type', 'is_read',
+        'related_entity_type', 'related_entity_id', 'created_date'
+    ], rows))
+
+
+def expire_due_quotes(batch_size=None, now=None):
+    """Expirar un lote de ofertas pendientes vencidas; devuelve cuántas.
+
+    El lote se toma con FOR UPDATE SKIP LOCKED para que varios barredores (o
+    una aceptación en curso) no compitan por las mismas filas, y se marca con
+    un único UPDATE sobre el índice (status, expiry_date).
+    """
+    batch_size = batch_size or current_app.config.get('QUOTE_EXPIRY_BATCH_SIZE', DEFAULT_EXPIRY_BATCH_SIZE)
+    now = now or datetime.utcnow()
+    due = select(Quote.id, Quote.shipment_id, Quote.carrier_id).where(
+        Quote.status == QuoteStatus.PENDING,
+        Quote.expiry_date < now
+    ).order_by(Quote.expiry_date, Quote.id).limit(batch_size).with_for_update(skip_locked=True)
+    try:
+        rows = db.session.execute(due).all()
+        if not rows:
+            db.session.rollback()
+            return 0
+        quote_ids = [row.id for row in rows]
+
+        db.session.execute(
+            update(Quote).where(
+                Quote.id.in_(quote_ids),
+                Quote.status == QuoteStatus.PENDING
+            ).values(status=QuoteStatus.EXPIRED, response_date=now),
+            execution_options={'synchronize_session': False}
+        )
+        _notify_expired(quote_ids, now)
+        track_changed_users(
+            db.session,
+            shipment_ids={row.shipment_id for row in rows},
+            carrier_ids={row.carrier_id for row in rows}
+        )
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return len(quote_ids)
+
+
+def run_expiry_sweeper(interval=60.0, batch_size=None, once=False):
+    """Bucle del barredor: expira por lotes hasta vaciar y duerme entre pasadas"""
+    batch_size = batch_size or current_app.config.get('QUOTE_EXPIRY_BATCH_SIZE', DEFAULT_EXPIRY_BATCH_SIZE)
+    total = 0
+    while True:
+        try:
+            expired = expire_due_quotes(batch_size)
+        except Exception:
+            logger.exception('Error expirando ofertas')
+            expired = 0
+            if once:
+                raise
+        total += expired
+        if expired < batch_size:
+            if once:
+                return total
+            time.sleep(interval)
\ No newline at end of file
@@ -0,0 +1,86 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+
+
+# Mismo token bucket que RateLimiter.hit, atómico dentro de Redis
+TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(bucket[1]) or burst
+local updated = tonumber(bucket[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return {allowed, tostring(tokens)}
+"""
+
+
+class RedisBuckets:
+    """Fichas compartidas entre procesos; requiere el paquete redis"""
+
+    def __init__(self, url, prefix='ratelimit:'):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError('RATELIMIT_URL requiere el paquete redis')
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self._script = self.client.register_script(TOKEN_BUCKET_SCRIPT)
+
+    def take(self, name, key, rate, burst):
+        """(permitido, fichas restantes)"""
+        allowed, tokens = self._script(keys=[f'{self.prefix}{name}:{key}'], args=[rate, burst, time.time()])
+        return bool(allowed), float(tokens)
+
+
+class RateLimiter:
+    """Token bucket por cliente, en proceso o compartido.
+
+    Cada clave recibe burst fichas y recupera rate fichas por segundo. Las
+    claves menos usadas se descartan al superar max_keys para acotar memoria.
+    Con RATELIMIT_URL las fichas viven en Redis y el límite vale para todos
+    los workers juntos; sin él cada proceso lleva su propia cuenta.
+    """
+
+    def __init__(self, rate, burst, max_keys=50000, name='default'):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.max_keys = max_keys
+        self.name = name
+        self.shared = None
+        self._lock = threading.Lock()
+        self._buckets = OrderedDict()
+
+    def init_app(self, app):
+        url = app.config.get('RATELIMIT_URL')
+        self.shared = RedisBuckets(url) if url else None
+
+    def hit(self, key):
+        """Consumir una ficha; devuelve (permitido, segundos hasta la próxima ficha)"""
+        if self.shared is not None:
+            allowed, tokens = self.shared.take(self.name, key, self.rate, self.burst)
+            retry_after = 0 if allowed else max(1, math.ceil((1 - tokens) / self.rate))
+            return allowed, retry_after
+
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        retry_after = 0 if allowed else max(1, math.ceil((1 - tokens) / self.rate))
+        return allowed, retry_after
\ No newline at end of file
@@ -0,0 +1,201 @@
+import itertools
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import has_request_context, request, session as flask_session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, text
+
+from app.services.metrics import metrics
+from app.services.transactions import track_on_commit
+
+logger = logging.getLogger(__name__)
+
+REPLICA_BIND_PREFIX = 'replica_'
+# Ventana de lectura-tras-escritura en la cookie de sesión: vale entre workers
+PRIMARY_UNTIL_KEY = '_primary_until'
+READ_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# Retraso de una réplica de streaming; 0 si ya aplicó todo lo recibido o si es un primario
+POSTGRES_LAG_QUERY = text(
+    'SELECT CASE WHEN NOT pg_is_in_recovery() THEN 0 '
+    'WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 '
+    'ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END'
+)
+
+
+class ReplicaRouter:
+    """Réplicas de lectura configuradas y su salud.
+
+    El retraso de cada réplica se mide como mucho cada REPLICA_CHECK_INTERVAL
+    segundos, en el primer uso después de vencer (sin hilo aparte). Una
+    réplica que no responde o que va más atrás que REPLICA_MAX_LAG_SECONDS
+    queda fuera hasta la siguiente medición; sin réplicas sanas se lee del
+    primario.
+    """
+
+    def __init__(self):
+        self.keys = []
+        self.max_lag = 5.0
+        self.check_interval = 5.0
+        self.window = 5.0
+        self._status = {}
+        self._lock = threading.Lock()
+        self._turn = itertools.count()
+
+    def init_app(self, app):
+        self.max_lag = app.config.get('REPLICA_MAX_LAG_SECONDS', self.max_lag)
+        self.check_interval = app.config.get('REPLICA_CHECK_INTERVAL', self.check_interval)
+        self.window = app.config.get('READ_AFTER_WRITE_SECONDS', self.window)
+        self.keys = sorted(key for key in app.config.get('SQLALCHEMY_BINDS', {}) if key.startswith(REPLICA_BIND_PREFIX))
+        self._status = {}
+        if self.keys:
+            app.before_request(_route_request)
+            metrics.gauge('db_replicas', self.snapshot)
+
+    def _measure(self, engine):
+        with engine.connect() as connection:
+            if connection.dialect.name == 'postgresql':
+                return float(connection.execute(POSTGRES_LAG_QUERY).scalar() or 0)
+            connection.execute(text('SELECT 1'))
+            return 0.0
+
+    def _healthy(self, key, engine):
+        now = time.monotonic()
+        status = self._status.get(key)
+        if status is None or status['checked_at'] + self.check_interval < now:
+            with self._lock:
+                status = self._status.get(key)
+                if status is None or status['checked_at'] + self.check_interval < now:
+                    try:
+                        lag = self._measure(engine)
+                        error = None
+                    except Exception as exc:
+                        lag, error = None, f'{type(exc).__name__}: {exc}'[:200]
+                        logger.warning('Réplica %s sin respuesta: %s', key, error)
+                    healthy = error is None and lag <= self.max_lag
+                    if not healthy:
+                        metrics.inc('db_replica_unhealthy_checks_total')
+                    status = {'checked_at': now, 'lag_seconds': lag, 'healthy': healthy, 'error': error}
+                    self._status[key] = status
+        return status['healthy']
+
+    def engine_for_read(self, engines):
+        """Engine de una réplica sana (por turnos) o None para usar el primario"""
+        if not self.keys:
+            return None
+        start = next(self._turn)
+        for offset in range(len(self.keys)):
+            key = self.keys[(start + offset) % len(self.keys)]
+            engine = engines.get(key)
+            if engine is not None and self._healthy(key, engine):
+                return engine
+        metrics.inc('db_replica_fallbacks_total')
+        return None
+
+    def snapshot(self):
+        return {
+            key: {name: value for name, value in status.items() if name != 'checked_at'}
+            for key, status in self._status.items()
+        }
+
+
+replica_router = ReplicaRouter()
+
+
+class RoutingSession(Session):
+    """Session que manda las lecturas de requests de solo lectura a una réplica.
+
+    Van al primario: toda escritura (INSERT/UPDATE/DELETE, flush, FOR
+    UPDATE), session.connection() sin sentencia, y cualquier lectura
+    posterior a una escritura en la misma sesión. Las lecturas van a réplica
+    solo si el request las habilitó (GET sin escrituras recientes del
+    usuario) o dentro de replica_reads().
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and self._reads_from_replica(clause):
+            engine = replica_router.engine_for_read(self._db.engines)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def _reads_from_replica(self, clause):
+        if getattr(clause, 'is_dml', False) or getattr(clause, '_for_update_arg', None) is not None:
+            # Desde aquí la sesión lee del primario: ve lo que acaba de escribir
+            _mark_written(self)
+            return False
+        if self._flushing or clause is None:
+            return False
+        if not (self.info.get('replica_reads') or self.info.get('replica_depth')):
+            return False
+        return not (self.info.get('primary_depth') or self.info.get('wrote'))
+
+
+def configure_binds(app):
+    """Agregar REPLICA_DATABASE_URLS a SQLALCHEMY_BINDS como replica_0, replica_1, ...; antes de db.init_app"""
+    from app.services.db_pool import engine_options
+
+    binds = dict(app.config.get('SQLALCHEMY_BINDS') or {})
+    for index, url in enumerate(app.config.get('REPLICA_DATABASE_URLS') or ()):
+        if url.startswith('postgresql://'):
+            url = url.replace('postgresql://', 'postgresql+psycopg2://', 1)
+        binds[f'{REPLICA_BIND_PREFIX}{index}'] = {'url': url, **engine_options(app.config, url)}
+    app.config['SQLALCHEMY_BINDS'] = binds
+
+
+def _route_request():
+    """before_request: habilitar réplicas para lecturas fuera de la ventana de lectura-tras-escritura"""
+    from app import db
+
+    if request.method not in READ_METHODS:
+        return
+    if flask_session.get(PRIMARY_UNTIL_KEY, 0) > time.time():
+        metrics.inc('db_read_after_write_primary_total')
+        return
+    db.session.info['replica_reads'] = True
+
+
+def _set_depth(name, delta):
+    from app import db
+
+    info = db.session.info
+    info[name] = info.get(name, 0) + delta
+
+
+@contextmanager
+def replica_reads():
+    """Leer de réplica en el bloque aunque el request no sea de solo lectura (reportes, CLI)"""
+    _set_depth('replica_depth', 1)
+    try:
+        yield
+    finally:
+        _set_depth('replica_depth', -1)
+
+
+@contextmanager
+def primary_reads():
+    """Leer del primario en el bloque aunque el request sea de solo lectura"""
+    _set_depth('primary_depth', 1)
+    try:
+        yield
+    finally:
+        _set_depth('primary_depth', -1)
+
+
+def _mark_written(session):
+    session.info['wrote'] = True
+    track_on_commit(session, 'read_after_write', (), _open_read_after_write_window)
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _mark_flushed(session, flush_context):
+    _mark_written(session)
+
+
+def _open_read_after_write_window(_):
+    # Los próximos requests del mismo usuario leen del primario hasta que la réplica alcance
+    if replica_router.keys and has_request_context():
+        flask_session[PRIMARY_UNTIL_KEY] = time.time() + replica_router.window
\ No newline at end of file
@@ -0,0 +1,107 @@
+import random
+import statistics
+import time
+
+from sqlalchemy import insert, text
+
+from app import db
+from app.models.carrier import Carrier, CarrierType
+from app.models.user import User, UserType, AccountStatus
+from app.services import driver_search
+
+CITIES = [
+    'Bogotá', 'Medellín', 'Cali', 'Barranquilla', 'Cartagena', 'Bucaramanga', 'Pereira', 'Manizales',
+    'Cúcuta', 'Ibagué', 'Santa Marta', 'Villavicencio', 'Pasto', 'Montería', 'Neiva', 'Armenia'
+]
+VEHICLE_TYPES = ['Camión', 'Furgón', 'Tractomula', 'Camioneta', 'Refrigerado', 'Cisterna', 'Volqueta']
+SPECIALIZATIONS = [
+    'Alimentos', 'Refrigerados', 'Químicos', 'Construcción', 'Electrónica', 'Muebles',
+    'Mercancía general', 'Farmacéuticos', 'Mudanzas', 'Carga peligrosa'
+]
+LICENSE_CATEGORIES = ['B2', 'B3', 'C1', 'C2', 'C3']
+QUERIES = [
+    'bogota', 'medellin refrigerado', 'cali', 'tractomula', 'bog', 'medel', 'c3',
+    'alimentos barranquilla', 'quimicos cisterna', 'bogta', 'medelin', 'furgon muebles',
+    'santa marta', 'refrigerados bogota medellin', 'construccion volqueta', 'electronica'
+]
+
+
+def _synthetic_rows(count, seed):
+    generator = random.Random(seed)
+    users = []
+    carriers = []
+    for index in range(count):
+        city = generator.choice(CITIES)
+        vehicle_types = generator.sample(VEHICLE_TYPES, generator.randint(1, 3))
+        specializations = generator.sample(SPECIALIZATIONS, generator.randint(1, 3))
+        routes = [
+            f'{generator.choice(CITIES)} - {generator.choice(CITIES)}'
+            for _ in range(generator.randint(0, 3))
+        ]
+        license_category = generator.choice(LICENSE_CATEGORIES)
+        email = f'bench.driver{index}@benchmark.invalid'
+        users.append(dict(
+            email=email, password_hash='-', user_type=UserType.CARRIER, phone='0',
+            address='-', city=city, account_status=AccountStatus.ACTIVE
+        ))
+        carriers.append(dict(
+            carrier_type=CarrierType.INDIVIDUAL, license_category=license_category,
+            available_vehicle_types=vehicle_types, cargo_specializations=specializations,
+            usual_routes=routes,
+            search_document=driver_search.document_from_parts(
+                [email.split('@')[0], city, license_category, CarrierType.INDIVIDUAL.value]
+                + vehicle_types + specializations + routes
+            )
+        ))
+    return users, carriers
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def run_benchmark(carriers=0, queries=200, limit=20, seed=7):
+    """Medir la latencia de search_drivers + search_results.
+
+    Con carriers > 0 inserta conductores sintéticos dentro de una transacción
+    que se revierte al final, así que puede correrse contra una base con
+    datos reales sin dejar rastro. Devuelve un dict con percentiles en ms.
+    """
+    report = {'dialect': db.engine.dialect.name, 'synthetic_carriers': carriers}
+    try:
+        if carriers:
+            started = time.perf_counter()
+            users, profiles = _synthetic_rows(carriers, seed)
+            user_ids = db.session.execute(insert(User).returning(User.id, sort_by_parameter_order=True), users).scalars().all()
+            for profile, user_id in zip(profiles, user_ids):
+                profile['user_id'] = user_id
+            db.session.execute(insert(Carrier), profiles)
+            if report['dialect'] == 'postgresql':
+                db.session.execute(text('ANALYZE carriers'))
+            report['seed_ms'] = round((time.perf_counter() - started) * 1000, 1)
+
+        driver_search.search_index.invalidate()
+        started = time.perf_counter()
+        driver_search.search_drivers(QUERIES[0], limit)
+        report['warmup_ms'] = round((time.perf_counter() - started) * 1000, 1)
+
+        generator = random.Random(seed)
+        samples = []
+        for _ in range(queries):
+            query = generator.choice(QUERIES)
+            started = time.perf_counter()
+            driver_search.search_results(driver_search.search_drivers(query, limit))
+            samples.append((time.perf_counter() - started) * 1000)
+    finally:
+        db.session.rollback()
+        driver_search.search_index.invalidate()
+
+    report.update(
+        queries=len(samples),
+        p50_ms=round(statistics.median(samples), 2),
+        p95_ms=round(percentile(samples, 0.95), 2),
+        p99_ms=round(percentile(samples, 0.99), 2),
+        max_ms=round(max(samples), 2)
+    )
+    return report
\ No newline at end of file
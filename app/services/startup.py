@@ -0,0 +1,82 @@
+import logging
+import os
+
+from jinja2 import FileSystemBytecodeCache
+from sqlalchemy import text
+
+from app import db
+from app.services.blobs import resolve_folder
+
+logger = logging.getLogger(__name__)
+
+
+class SchemaOutOfDate(RuntimeError):
+    """La base no está en la revisión de Alembic que espera el código"""
+
+
+def expected_revisions(app):
+    """Cabezas de migrations/versions: lo que el código espera encontrar en alembic_version"""
+    from alembic.script import ScriptDirectory
+
+    directory = app.extensions['migrate'].directory
+    if not os.path.isabs(directory):
+        directory = os.path.join(os.path.dirname(app.root_path), directory)
+    return set(ScriptDirectory(directory).get_heads())
+
+
+def check_schema_revision(app):
+    """Comparar alembic_version con las migraciones en una sola consulta; falla si no coinciden.
+
+    Reemplaza al db.create_all() de cada proceso: el esquema lo crea y
+    actualiza flask db upgrade, y aquí solo se confirma que ya se corrió.
+    """
+    expected = expected_revisions(app)
+    with app.app_context():
+        try:
+            with db.engine.connect() as connection:
+                current = set(connection.execute(text('SELECT version_num FROM alembic_version')).scalars())
+        except Exception as error:
+            raise SchemaOutOfDate(f'No se pudo leer alembic_version ({type(error).__name__}); corre flask db upgrade')
+        # La conexión de la verificación no debe heredarse a los workers
+        db.engine.dispose()
+    if current != expected:
+        raise SchemaOutOfDate(
+            f"La base está en {', '.join(sorted(current)) or 'ninguna revisión'} y el código espera "
+            f"{', '.join(sorted(expected))}; corre flask db upgrade"
+        )
+    return current
+
+
+def configure_template_cache(app):
+    """Guardar el bytecode de las plantillas en disco; debe llamarse antes del primer uso de jinja_env"""
+    folder = app.config.get('JINJA_CACHE_FOLDER')
+    if not folder:
+        return None
+    with app.app_context():
+        folder = resolve_folder(folder)
+    os.makedirs(folder, exist_ok=True)
+    app.jinja_options = {**app.jinja_options, 'bytecode_cache': FileSystemBytecodeCache(folder)}
+    return folder
+
+
+def preload_templates(app):
+    """Compilar todas las plantillas; con preload de gunicorn los workers las heredan ya compiladas"""
+    names = app.jinja_env.list_templates(filter_func=lambda name: name.endswith('.html'))
+    for name in names:
+        app.jinja_env.get_template(name)
+    return len(names)
+
+
+def prepare_for_serving(app):
+    """Arranque del servidor web: verificar la revisión y dejar todo cargado antes del fork"""
+    if app.config.get('STARTUP_CHECK_SCHEMA', True):
+        check_schema_revision(app)
+    templates = preload_templates(app)
+    logger.info('Aplicación lista: %s plantillas compiladas', templates)
+    return app
+
+
+def dispose_after_fork(app):
+    """Hook post_fork: el worker abre sus propias conexiones y no reutiliza las del proceso padre"""
+    with app.app_context():
+        db.engine.dispose(close=False)
\ No newline at end of file
@@ -0,0 +1,71 @@
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+
+from flask import current_app
+
+from app.services.blobs import resolve_folder
+
+# Cada corrida es un intérprete nuevo: los tiempos de import solo se miden bien en frío
+PHASES_SCRIPT = '''
+import json, sys, time
+timings = {}
+start = time.perf_counter()
+def mark(name):
+    global start
+    now = time.perf_counter()
+    timings[name] = round((now - start) * 1000, 2)
+    start = now
+import flask, sqlalchemy, jinja2
+mark('import_dependencias')
+import app
+mark('import_app')
+import app.models
+mark('import_modelos')
+app_object = app.create_app()
+mark('create_app')
+from app.services import startup
+if sys.argv[1] == '1':
+    startup.check_schema_revision(app_object)
+    mark('verificar_revision')
+startup.preload_templates(app_object)
+mark('precargar_plantillas')
+app_object.test_client().get('/')
+mark('primer_request')
+print(json.dumps(timings))
+'''
+
+
+def _run_once(check_schema):
+    root = os.path.dirname(current_app.root_path)
+    output = subprocess.run(
+        [sys.executable, '-c', PHASES_SCRIPT, '1' if check_schema else '0'],
+        cwd=root, capture_output=True, text=True, check=True,
+        env={**os.environ, 'PYTHONPATH': root}
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def _summary(runs):
+    return {phase: round(statistics.median(run[phase] for run in runs), 2) for phase in runs[0]}
+
+
+def run_benchmark(runs=5, check_schema=True):
+    """Medir el arranque por fases (ms, mediana de varias corridas en procesos nuevos).
+
+    La primera corrida parte sin caché de bytecode de Jinja; las siguientes
+    la reutilizan, que es el caso de un reinicio o de un worker nuevo.
+    """
+    folder = current_app.config.get('JINJA_CACHE_FOLDER')
+    if folder:
+        shutil.rmtree(resolve_folder(folder), ignore_errors=True)
+    cold = _run_once(check_schema)
+    warm = [_run_once(check_schema) for _ in range(runs)]
+    report = {f'frío_{phase}_ms': value for phase, value in cold.items()}
+    report['frío_total_ms'] = round(sum(cold.values()), 2)
+    report.update({f'{phase}_ms': value for phase, value in _summary(warm).items()})
+    report['total_ms'] = round(sum(_summary(warm).values()), 2)
+    return report
\ No newline at end of file
@@ -0,0 +1,379 @@
+from datetime import datetime
+from decimal import Decimal
+
+from sqlalchemy import Float, case, cast, event, func, inspect, insert, select, update
+from sqlalchemy.orm import Session
+
+from app import db
+from app.models.carrier import Carrier
+from app.models.company import Company
+from app.models.company_stats import CompanyStats
+from app.models.payment import Payment, PaymentStatus
+from app.models.rating_histogram import CarrierRatingHistogram, RatingDimension
+from app.models.review import Review
+from app.models.shipment import Shipment, ShipmentStatus
+from app.services.loads import STATUS_GROUPS
+from app.services.matching import matching_index, track_changed_carriers
+
+COUNTER_COLUMNS = ('total_loads', 'published', 'in_progress', 'completed', 'cancelled', 'rating_sum', 'rating_count')
+
+# Columna de Review que alimenta cada dimensión del histograma
+RATING_DIMENSIONS = {
+    RatingDimension.OVERALL: 'rating',
+    RatingDimension.PUNCTUALITY: 'punctuality_rating',
+    RatingDimension.COMMUNICATION: 'communication_rating',
+    RatingDimension.CONDITION: 'condition_rating',
+}
+
+
+def status_group(status):
+    for name, statuses in STATUS_GROUPS.items():
+        if status in statuses:
+            return name
+    return None
+
+
+def changed_values(obj, attribute):
+    """(valor anterior, valor actual) de un atributo según el historial de la sesión"""
+    history = inspect(obj).attrs[attribute].history
+    if history.added or history.deleted:
+        old = history.deleted[0] if history.deleted else None
+        new = history.added[0] if history.added else None
+        return old, new
+    current = getattr(obj, attribute)
+    return current, current
+
+
+def upsert_deltas(connection, model, keys, deltas):
+    """Sumar deltas a filas de agregados, creando la fila si no existe.
+
+    keys son las columnas de la clave primaria y deltas va de la tupla de
+    valores de la clave a {columna: incremento}. Un único INSERT ... ON
+    CONFLICT DO UPDATE por fila, de modo que dos transacciones concurrentes
+    nunca pisan el incremento de la otra.
+    """
+    table = model.__table__
+    if connection.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif connection.dialect.name == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        dialect_insert = None
+
+    now = datetime.utcnow()
+    # Orden fijo de claves para no provocar interbloqueos entre transacciones
+    for key_values in sorted(deltas):
+        changes = {name: value for name, value in deltas[key_values].items() if value}
+        if not changes:
+            continue
+        key = dict(zip(keys, key_values))
+        if dialect_insert is None:
+            result = connection.execute(
+                update(table).where(*[table.c[name] == value for name, value in key.items()]).values(
+                    {name: table.c[name] + value for name, value in changes.items()}, updated_date=now
+                )
+            )
+            if result.rowcount == 0:
+                connection.execute(insert(table).values({**key, 'updated_date': now, **changes}))
+            continue
+        statement = dialect_insert(table).values({**key, 'updated_date': now, **changes})
+        statement = statement.on_conflict_do_update(
+            index_elements=list(keys),
+            set_={
+                **{name: table.c[name] + statement.excluded[name] for name in changes},
+                'updated_date': statement.excluded.updated_date
+            }
+        )
+        connection.execute(statement)
+
+
+def _add(deltas, key, column, amount):
+    if key is None or column is None or not amount:
+        return
+    row = deltas.setdefault(key, {})
+    row[column] = row.get(column, 0) + amount
+
+
+class _Deltas:
+    """Incrementos acumulados durante un flush"""
+
+    def __init__(self):
+        self.companies = {}
+        self.carriers = {}
+        self.histograms = {}
+        self.reviews = []
+
+    def __bool__(self):
+        return bool(self.companies or self.carriers or self.histograms or self.reviews)
+
+
+def _carrier_trip_column(status):
+    if status == ShipmentStatus.DELIVERED:
+        return 'completed_trips'
+    if status == ShipmentStatus.DISPUTED:
+        return 'disputed_trips'
+    return None
+
+
+def _shipment_deltas(deltas, shipment, sign=0):
+    """sign=1 carga nueva, -1 carga borrada, 0 posible cambio de estado, empresa o transportista"""
+    if sign:
+        status = shipment.status or ShipmentStatus.PUBLISHED
+        _add(deltas.companies, shipment.company_id, 'total_loads', sign)
+        _add(deltas.companies, shipment.company_id, status_group(status), sign)
+        _add(deltas.carriers, shipment.carrier_id, _carrier_trip_column(status), sign)
+        return
+
+    old_company, new_company = changed_values(shipment, 'company_id')
+    old_carrier, new_carrier = changed_values(shipment, 'carrier_id')
+    old_status, new_status = changed_values(shipment, 'status')
+
+    old_group, new_group = status_group(old_status), status_group(new_status)
+    if old_company != new_company or old_group != new_group:
+        _add(deltas.companies, old_company, 'total_loads', -1)
+        _add(deltas.companies, old_company, old_group, -1)
+        _add(deltas.companies, new_company, 'total_loads', 1)
+        _add(deltas.companies, new_company, new_group, 1)
+
+    if old_carrier != new_carrier or old_status != new_status:
+        _add(deltas.carriers, old_carrier, _carrier_trip_column(old_status), -1)
+        _add(deltas.carriers, new_carrier, _carrier_trip_column(new_status), 1)
+
+
+def _payment_deltas(deltas, payment, sign=0):
+    completed = PaymentStatus.COMPLETED
+    if sign:
+        if payment.status == completed:
+            _add(deltas.companies, payment.company_id, 'total_spent', sign * Decimal(payment.amount or 0))
+            _add(deltas.carriers, payment.carrier_id, 'total_earnings', sign * Decimal(payment.carrier_payment or 0))
+        return
+
+    old_status, new_status = changed_values(payment, 'status')
+    if old_status != completed and new_status != completed:
+        return
+    old_amount, new_amount = changed_values(payment, 'amount')
+    old_earning, new_earning = changed_values(payment, 'carrier_payment')
+    old_company, new_company = changed_values(payment, 'company_id')
+    old_carrier, new_carrier = changed_values(payment, 'carrier_id')
+    if old_status == completed:
+        _add(deltas.companies, old_company, 'total_spent', -Decimal(old_amount or 0))
+        _add(deltas.carriers, old_carrier, 'total_earnings', -Decimal(old_earning or 0))
+    if new_status == completed:
+        _add(deltas.companies, new_company, 'total_spent', Decimal(new_amount or 0))
+        _add(deltas.carriers, new_carrier, 'total_earnings', Decimal(new_earning or 0))
+
+
+def _review_deltas(connection, deltas):
+    """Repartir las calificaciones entre empresas y transportistas calificados"""
+    user_ids = {review.reviewed_id for _, review in deltas.reviews}
+    companies = dict(connection.execute(
+        select(Company.user_id, Company.id).where(Company.user_id.in_(user_ids))
+    ).all())
+    carriers = dict(connection.execute(
+        select(Carrier.user_id, Carrier.id).where(Carrier.user_id.in_(user_ids))
+    ).all())
+
+    for sign, review in deltas.reviews:
+        company_id = companies.get(review.reviewed_id)
+        _add(deltas.companies, company_id, 'rating_sum', sign * (review.rating or 0))
+        _add(deltas.companies, company_id, 'rating_count', sign)
+
+        carrier_id = carriers.get(review.reviewed_id)
+        if carrier_id is None:
+            continue
+        _add(deltas.carriers, carrier_id, 'rating_sum', sign * (review.rating or 0))
+        _add(deltas.carriers, carrier_id, 'rating_count', sign)
+        for dimension, attribute in RATING_DIMENSIONS.items():
+            stars = getattr(review, attribute)
+            if stars is not None and 1 <= stars <= 5:
+                _add(deltas.histograms, (carrier_id, dimension, stars), 'count', sign)
+
+
+def _apply_carrier_deltas(connection, deltas):
+    """Actualizar sumas, conteos y promedios del transportista en un solo UPDATE (O(1))"""
+    table = Carrier.__table__
+
+    def plus(name, changes):
+        return func.coalesce(table.c[name], 0) + changes.get(name, 0)
+
+    for carrier_id in sorted(deltas):
+        changes = {name: value for name, value in deltas[carrier_id].items() if value}
+        values = {}
+        if 'rating_sum' in changes or 'rating_count' in changes:
+            rating_sum, rating_count = plus('rating_sum', changes), plus('rating_count', changes)
+            values.update(
+                rating_sum=rating_sum,
+                rating_count=rating_count,
+                average_rating=case((rating_count > 0, cast(rating_sum, Float) / rating_count), else_=0.0)
+            )
+        if 'completed_trips' in changes or 'disputed_trips' in changes:
+            completed, disputed = plus('completed_trips', changes), plus('disputed_trips', changes)
+            values.update(
+                completed_trips=completed,
+                disputed_trips=disputed,
+                successful_delivery_rate=case(
+                    (completed + disputed > 0, cast(completed, Float) / (completed + disputed)), else_=0.0
+                )
+            )
+        if 'total_earnings' in changes:
+            values['total_earnings'] = plus('total_earnings', changes)
+        if values:
+            connection.execute(update(table).where(table.c.id == carrier_id).values(values))
+
+
+@event.listens_for(Session, 'after_flush')
+def _maintain_aggregates(session, flush_context):
+    deltas = _Deltas()
+    for sign, objects in ((1, session.new), (0, session.dirty), (-1, session.deleted)):
+        for obj in objects:
+            if isinstance(obj, Shipment):
+                _shipment_deltas(deltas, obj, sign)
+            elif isinstance(obj, Payment):
+                _payment_deltas(deltas, obj, sign)
+            elif isinstance(obj, Review) and sign:
+                deltas.reviews.append((sign, obj))
+    if not deltas:
+        return
+
+    connection = session.connection()
+    if deltas.reviews:
+        _review_deltas(connection, deltas)
+    if deltas.companies:
+        upsert_deltas(connection, CompanyStats, ('company_id',), {
+            (company_id,): changes for company_id, changes in deltas.companies.items()
+        })
+    if deltas.carriers:
+        _apply_carrier_deltas(connection, deltas.carriers)
+        # El índice de matching debe releer la reputación actualizada
+        track_changed_carriers(session, deltas.carriers)
+    if deltas.histograms:
+        upsert_deltas(connection, CarrierRatingHistogram, ('carrier_id', 'dimension', 'stars'), deltas.histograms)
+
+
+def company_stats(company_id):
+    """Estadísticas de una empresa con una búsqueda por clave primaria"""
+    stats = db.session.get(CompanyStats, company_id)
+    if stats is None:
+        stats = CompanyStats(company_id=company_id, total_spent=0, **{name: 0 for name in COUNTER_COLUMNS})
+    return stats
+
+
+def carrier_reputation(carrier):
+    """Reputación ya agregada del transportista e histograma de estrellas por dimensión"""
+    histogram = {dimension: {stars: 0 for stars in range(1, 6)} for dimension in RATING_DIMENSIONS}
+    rows = CarrierRatingHistogram.query.filter(CarrierRatingHistogram.carrier_id == carrier.id)
+    for row in rows:
+        if row.dimension in histogram and row.stars in histogram[row.dimension]:
+            histogram[row.dimension][row.stars] = row.count
+    return {
+        'carrier_id': carrier.id,
+        'average_rating': round(carrier.average_rating or 0.0, 2),
+        'rating_count': carrier.rating_count or 0,
+        'completed_trips': carrier.completed_trips or 0,
+        'disputed_trips': carrier.disputed_trips or 0,
+        'successful_delivery_rate': round(carrier.successful_delivery_rate or 0.0, 4),
+        'total_earnings': float(carrier.total_earnings or 0),
+        'histogram': histogram
+    }
+
+
+def rebuild_company_stats():
+    """Recalcular company_stats desde cero a partir de shipments, payments y reviews.
+
+    Reemplaza la tabla completa en una transacción; conviene correrlo con poco
+    tráfico porque los incrementos confirmados durante el cálculo se pierden.
+    """
+    rows = {
+        company_id: dict(company_id=company_id, total_spent=Decimal(0), **{name: 0 for name in COUNTER_COLUMNS})
+        for (company_id,) in db.session.query(Company.id)
+    }
+
+    loads = db.session.query(Shipment.company_id, Shipment.status, func.count(Shipment.id)).group_by(
+        Shipment.company_id, Shipment.status
+    )
+    for company_id, status, count in loads:
+        row = rows.get(company_id)
+        if row is None:
+            continue
+        row['total_loads'] += count
+        group = status_group(status or ShipmentStatus.PUBLISHED)
+        if group:
+            row[group] += count
+
+    spent = db.session.query(Payment.company_id, func.sum(Payment.amount)).filter(
+        Payment.status == PaymentStatus.COMPLETED
+    ).group_by(Payment.company_id)
+    for company_id, total in spent:
+        if company_id in rows:
+            rows[company_id]['total_spent'] = Decimal(total or 0)
+
+    ratings = db.session.query(Company.id, func.sum(Review.rating), func.count(Review.id)).join(
+        Review, Review.reviewed_id == Company.user_id
+    ).group_by(Company.id)
+    for company_id, rating_sum, rating_count in ratings:
+        rows[company_id]['rating_sum'] = int(rating_sum or 0)
+        rows[company_id]['rating_count'] = rating_count
+
+    now = datetime.utcnow()
+    db.session.execute(CompanyStats.__table__.delete())
+    if rows:
+        db.session.execute(insert(CompanyStats), [dict(row, updated_date=now) for row in rows.values()])
+    db.session.commit()
+    return len(rows)
+
+def rebuild_carrier_reputation():
+    """Recalcular desde cero la reputación de los transportistas y sus histogramas"""
+    aggregates = {
+        carrier_id: dict(
+            id=carrier_id, rating_sum=0, rating_count=0, completed_trips=0, disputed_trips=0,
+            total_earnings=Decimal(0), average_rating=0.0, successful_delivery_rate=0.0
+        )
+        for (carrier_id,) in db.session.query(Carrier.id)
+    }
+
+    trips = db.session.query(Shipment.carrier_id, Shipment.status, func.count(Shipment.id)).filter(
+        Shipment.carrier_id.isnot(None),
+        Shipment.status.in_([ShipmentStatus.DELIVERED, ShipmentStatus.DISPUTED])
+    ).group_by(Shipment.carrier_id, Shipment.status)
+    for carrier_id, status, count in trips:
+        if carrier_id in aggregates:
+            aggregates[carrier_id][_carrier_trip_column(status)] = count
+
+    earnings = db.session.query(Payment.carrier_id, func.sum(Payment.carrier_payment)).filter(
+        Payment.status == PaymentStatus.COMPLETED
+    ).group_by(Payment.carrier_id)
+    for carrier_id, total in earnings:
+        if carrier_id in aggregates:
+            aggregates[carrier_id]['total_earnings'] = Decimal(total or 0)
+
+    histograms = {}
+    reviews = db.session.query(Carrier.id, Review).join(Review, Review.reviewed_id == Carrier.user_id)
+    for carrier_id, review in reviews.yield_per(1000):
+        row = aggregates[carrier_id]
+        row['rating_sum'] += review.rating or 0
+        row['rating_count'] += 1
+        for dimension, attribute in RATING_DIMENSIONS.items():
+            stars = getattr(review, attribute)
+            if stars is not None and 1 <= stars <= 5:
+                key = (carrier_id, dimension, stars)
+                histograms[key] = histograms.get(key, 0) + 1
+
+    for row in aggregates.values():
+        if row['rating_count']:
+            row['average_rating'] = row['rating_sum'] / row['rating_count']
+        finished = row['completed_trips'] + row['disputed_trips']
+        if finished:
+            row['successful_delivery_rate'] = row['completed_trips'] / finished
+
+    now = datetime.utcnow()
+    if aggregates:
+        db.session.execute(update(Carrier), list(aggregates.values()))
+    db.session.execute(CarrierRatingHistogram.__table__.delete())
+    if histograms:
+        db.session.execute(insert(CarrierRatingHistogram), [
+            dict(carrier_id=carrier_id, dimension=dimension, stars=stars, count=count, updated_date=now)
+            for (carrier_id, dimension, stars), count in histograms.items()
+        ])
+    db.session.commit()
+    matching_index.invalidate()
+    return len(aggregates)
\ No newline at end of file
@@ -0,0 +1,327 @@
+import atexit
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import bindparam, insert, or_, update
+from sqlalchemy.exc import DataError, IntegrityError
+from sqlalchemy.orm.exc import StaleDataError
+
+from app import db
+from app.models.shipment import Shipment, ShipmentStatus
+from app.models.tracking import TrackingEvent, TrackingEventType
+from app.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Los puntos GPS crudos se guardan como IN_TRANSIT con is_raw
+GPS_EVENT_TYPE = TrackingEventType.IN_TRANSIT
+
+# Estados en los que un transportista puede reportar ubicación
+TRACKABLE_STATUSES = [ShipmentStatus.ASSIGNED, ShipmentStatus.IN_TRANSIT]
+
+MAX_POINTS_PER_REQUEST = 500
+MAX_FLUSH_ATTEMPTS = 3
+MAX_CLOCK_SKEW = timedelta(minutes=5)
+
+
+class InvalidPoint(ValueError):
+    """Punto GPS con datos faltantes o fuera de rango"""
+
+
+def parse_point(data):
+    """Normalizar un punto recibido por la API a (shipment_id, timestamp, lat, lng, extra)"""
+    if not isinstance(data, dict):
+        raise InvalidPoint('Punto invalido')
+    try:
+        shipment_id = int(data['shipment_id'])
+        lat = float(data['lat'])
+        lng = float(data['lng'])
+    except (KeyError, TypeError, ValueError):
+        raise InvalidPoint('shipment_id, lat y lng son obligatorios')
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        raise InvalidPoint('Coordenadas invalidas')
+
+    raw_timestamp = data.get('timestamp')
+    now = datetime.utcnow()
+    if raw_timestamp is None:
+        timestamp = now
+    else:
+        try:
+            if isinstance(raw_timestamp, (int, float)):
+                # Epoch en milisegundos, como lo reporta el navegador
+                timestamp = datetime.utcfromtimestamp(raw_timestamp / 1000.0)
+            else:
+                timestamp = datetime.fromisoformat(str(raw_timestamp).replace('Z', '+00:00'))
+                if timestamp.tzinfo is not None:
+                    timestamp = (timestamp - timestamp.utcoffset()).replace(tzinfo=None)
+        except (TypeError, ValueError, OverflowError, OSError):
+            raise InvalidPoint('timestamp invalido')
+    if timestamp > now + MAX_CLOCK_SKEW:
+        raise InvalidPoint('timestamp en el futuro')
+
+    extra = {}
+    if data.get('location'):
+        extra['location'] = str(data['location'])[:200]
+    if data.get('eta_minutes') is not None:
+        try:
+            extra['estimated_remaining_time'] = int(data['eta_minutes'])
+        except (TypeError, ValueError):
+            raise InvalidPoint('eta_minutes invalido')
+    return shipment_id, timestamp, lat, lng, extra
+
+
+class LocationBuffer:
+    """Buffer en proceso de puntos GPS con volcado por lotes.
+
+    Los puntos se deduplican por (carga, timestamp) y se escriben con un único
+    INSERT masivo cuando el buffer llega a flush_size o cuando el punto más
+    antiguo supera flush_interval segundos. Shipment.current_location y
+    last_update se actualizan una sola vez por carga en cada volcado, y solo
+    si el punto es más nuevo que el guardado.
+
+    Si el lote falla por un error de datos (carga borrada, valor inválido) se
+    reintenta carga por carga: las demás se escriben y los puntos de la carga
+    que falla vuelven al buffer hasta max_attempts veces antes de
+    descartarse. Un error de conexión devuelve todo el lote sin contar
+    intentos.
+    """
+
+    def __init__(self, flush_size=500, flush_interval=2.0, max_points=10000, max_attempts=MAX_FLUSH_ATTEMPTS):
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.max_points = max_points
+        self.max_attempts = max_attempts
+        self.app = None
+        self._points = {}
+        self._attempts = {}
+        self._oldest = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._thread_pid = None
+        self._flush_listeners = []
+        self.last_flush_duration = 0.0
+        self.last_flush_size = 0
+
+    def init_app(self, app):
+        self.app = app
+        self.flush_size = app.config.get('TRACKING_FLUSH_SIZE', self.flush_size)
+        self.flush_interval = app.config.get('TRACKING_FLUSH_INTERVAL', self.flush_interval)
+        self.max_points = app.config.get('TRACKING_BUFFER_LIMIT', self.max_points)
+        self.max_attempts = app.config.get('TRACKING_MAX_FLUSH_ATTEMPTS', self.max_attempts)
+        atexit.register(self._flush_at_exit)
+
+    def _flush_at_exit(self):
+        if not self._points or self._thread_pid != os.getpid():
+            return
+        try:
+            with self.app.app_context():
+                self.flush()
+        except Exception:
+            logger.exception('Error volcando puntos GPS al terminar el proceso')
+
+    def on_flush(self, callback):
+        """Registrar callback(points_by_shipment) que se llama tras cada volcado confirmado"""
+        self._flush_listeners.append(callback)
+        return callback
+
+    def __len__(self):
+        return len(self._points)
+
+    def backpressure(self):
+        """Nivel de llenado (0..1) y segundos sugeridos antes de reintentar"""
+        level = len(self._points) / float(self.max_points)
+        retry_after = 0
+        if level >= 1:
+            retry_after = max(1, int(round(self.flush_interval + self.last_flush_duration)))
+        elif level >= 0.5:
+            retry_after = max(1, int(round(self.flush_interval)))
+        return {'level': round(min(level, 1.0), 3), 'retry_after': retry_after}
+
+    def add(self, points):
+        """Agregar puntos ya validados; devuelve (aceptados, duplicados) o None si el buffer está lleno"""
+        self._ensure_thread()
+        accepted = 0
+        duplicates = 0
+        with self._lock:
+            if len(self._points) + len(points) > self.max_points:
+                return None
+            for shipment_id, timestamp, lat, lng, extra in points:
+                key = (shipment_id, timestamp)
+                if key in self._points:
+                    duplicates += 1
+                    continue
+                self._points[key] = (lat, lng, extra)
+                accepted += 1
+            if self._points and self._oldest is None:
+                self._oldest = time.monotonic()
+            full = len(self._points) >= self.flush_size
+        if full:
+            self._wakeup.set()
+        return accepted, duplicates
+
+    def _ensure_thread(self):
+        # El hilo se crea en el primer uso de cada proceso (seguro tras fork)
+        if self._thread is not None and self._thread_pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread_pid == os.getpid() and self._thread.is_alive():
+                return
+            self._thread_pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='tracking-flusher', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            with self._lock:
+                due = self._oldest is not None and (
+                    len(self._points) >= self.flush_size or
+                    time.monotonic() - self._oldest >= self.flush_interval
+                )
+            if not due:
+                continue
+            try:
+                with self.app.app_context():
+                    self.flush()
+            except Exception:
+                logger.exception('Error volcando puntos GPS')
+
+    def _take(self):
+        with self._lock:
+            points = self._points
+            self._points = {}
+            self._oldest = None
+        return points
+
+    def _restore(self, points):
+        with self._lock:
+            for key, value in points.items():
+                if len(self._points) >= self.max_points:
+                    break
+                self._points.setdefault(key, value)
+            if self._points and self._oldest is None:
+                self._oldest = time.monotonic()
+
+    def _write(self, points):
+        """INSERT de los puntos y UPDATE de la última posición de cada carga, en una transacción"""
+        rows = []
+        latest = {}
+        for (shipment_id, timestamp), (lat, lng, extra) in points.items():
+            rows.append(dict(
+                shipment_id=shipment_id,
+                event_type=GPS_EVENT_TYPE,
+                is_raw=True,
+                timestamp=timestamp,
+                latitude=lat,
+                longitude=lng,
+                **extra
+            ))
+            current = latest.get(shipment_id)
+            if current is None or timestamp > current[0]:
+                latest[shipment_id] = (timestamp, lat, lng, extra)
+
+        table = Shipment.__table__
+        db.session.execute(insert(TrackingEvent), rows)
+        # Un lote atrasado no pisa una posición más nueva ya guardada
+        db.session.execute(
+            update(table).where(
+                table.c.id == bindparam('shipment_id'),
+                or_(table.c.last_update.is_(None), table.c.last_update < bindparam('timestamp'))
+            ).values(current_location=bindparam('location'), last_update=bindparam('timestamp')),
+            [
+                {
+                    'shipment_id': shipment_id,
+                    'location': extra.get('location') or f'{lat:.5f},{lng:.5f}',
+                    'timestamp': timestamp
+                }
+                for shipment_id, (timestamp, lat, lng, extra) in latest.items()
+            ]
+        )
+        db.session.commit()
+        return rows
+
+    def _write_each(self, points):
+        """Escribir carga por carga tras un error de datos; devuelve las filas escritas"""
+        groups = {}
+        for key, value in points.items():
+            groups.setdefault(key[0], {})[key] = value
+        written = []
+        for shipment_id, group in groups.items():
+            try:
+                written.extend(self._write(group))
+            except Exception as error:
+                db.session.rollback()
+                if isinstance(error, (DataError, IntegrityError, StaleDataError)):
+                    self._give_up_or_retry(shipment_id, group, error)
+                else:
+                    self._restore(group)
+        return written
+
+    def _give_up_or_retry(self, shipment_id, group, error):
+        retry = {}
+        for key, value in group.items():
+            attempts = self._attempts.pop(key, 0) + 1
+            if attempts < self.max_attempts:
+                retry[key] = value
+                self._attempts[key] = attempts
+        dropped = len(group) - len(retry)
+        if dropped:
+            metrics.inc('tracking_points_dropped_total', dropped)
+            logger.warning('Descartados %s puntos GPS de la carga %s: %s', dropped, shipment_id, error)
+        self._restore(retry)
+
+    def flush(self):
+        """Escribir los puntos pendientes; requiere contexto de aplicación"""
+        with self._flush_lock:
+            points = self._take()
+            if not points:
+                return 0
+
+            started = time.monotonic()
+            try:
+                rows = self._write(points)
+            except (DataError, IntegrityError, StaleDataError):
+                db.session.rollback()
+                metrics.inc('tracking_flush_split_total')
+                rows = self._write_each(points)
+            except Exception:
+                db.session.rollback()
+                self._restore(points)
+                raise
+            # Solo quedan intentos de los puntos que siguen en el buffer
+            with self._lock:
+                self._attempts = {key: count for key, count in self._attempts.items() if key in self._points}
+
+            self.last_flush_duration = time.monotonic() - started
+            self.last_flush_size = len(rows)
+
+            by_shipment = {}
+            for row in rows:
+                by_shipment.setdefault(row['shipment_id'], []).append(row)
+            for callback in self._flush_listeners if by_shipment else ():
+                try:
+                    callback(by_shipment)
+                except Exception:
+                    logger.exception('Error en listener de volcado GPS')
+            return len(rows)
+
+
+location_buffer = LocationBuffer()
+
+
+def trackable_shipment_ids(carrier_id, shipment_ids):
+    """Subconjunto de cargas asignadas al transportista que admiten seguimiento"""
+    if not shipment_ids:
+        return set()
+    rows = db.session.query(Shipment.id).filter(
+        Shipment.id.in_(shipment_ids),
+        Shipment.carrier_id == carrier_id,
+        Shipment.status.in_(TRACKABLE_STATUSES)
+    )
+    return {row.id for row in rows}
\ No newline at end of file
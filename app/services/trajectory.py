@@ -0,0 +1,228 @@
+import math
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete
+
+from app import db
+from app.models.tracking import TrackingEvent
+from app.models.trajectory import TrajectorySegment
+from app.services.geo import EARTH_RADIUS_KM
+
+POLYLINE_PRECISION = 1e5
+MAX_SEGMENT_POINTS = 2000
+DEFAULT_COMPACTION_WINDOW = timedelta(hours=1)
+EPOCH = datetime(1970, 1, 1)
+
+
+def _encode_signed(value, output):
+    value = ~(value << 1) if value < 0 else value << 1
+    while value >= 0x20:
+        output.append(chr((0x20 | (value & 0x1f)) + 63))
+        value >>= 5
+    output.append(chr(value + 63))
+
+
+def _decode_signed(text, index):
+    result = 0
+    shift = 0
+    while True:
+        byte = ord(text[index]) - 63
+        index += 1
+        result |= (byte & 0x1f) << shift
+        shift += 5
+        if byte < 0x20:
+            break
+    value = ~(result >> 1) if result & 1 else result >> 1
+    return value, index
+
+
+def encode_polyline(coordinates):
+    """Codificar [(lat, lng), ...] con el algoritmo polyline (deltas enteros)"""
+    output = []
+    prev_lat = prev_lng = 0
+    for lat, lng in coordinates:
+        lat_e5 = int(round(lat * POLYLINE_PRECISION))
+        lng_e5 = int(round(lng * POLYLINE_PRECISION))
+        _encode_signed(lat_e5 - prev_lat, output)
+        _encode_signed(lng_e5 - prev_lng, output)
+        prev_lat, prev_lng = lat_e5, lng_e5
+    return ''.join(output)
+
+
+def decode_polyline(text):
+    coordinates = []
+    index = 0
+    lat = lng = 0
+    while index < len(text):
+        delta_lat, index = _decode_signed(text, index)
+        delta_lng, index = _decode_signed(text, index)
+        lat += delta_lat
+        lng += delta_lng
+        coordinates.append((lat / POLYLINE_PRECISION, lng / POLYLINE_PRECISION))
+    return coordinates
+
+
+def encode_times(timestamps):
+    """Primer instante en segundos desde epoch y luego deltas, con la misma codificación"""
+    output = []
+    previous = 0
+    for timestamp in timestamps:
+        seconds = int(round((timestamp - EPOCH).total_seconds()))
+        _encode_signed(seconds - previous, output)
+        previous = seconds
+    return ''.join(output)
+
+
+def decode_times(text):
+    timestamps = []
+    index = 0
+    seconds = 0
+    while index < len(text):
+        delta, index = _decode_signed(text, index)
+        seconds += delta
+        timestamps.append(EPOCH + timedelta(seconds=seconds))
+    return timestamps
+
+
+def _perpendicular_distance_m(point, start, end):
+    """Distancia del punto al segmento start-end en una proyección local (metros)"""
+    lat0 = math.radians(start[0])
+    scale = EARTH_RADIUS_KM * 1000.0
+
+    def project(p):
+        return (math.radians(p[1]) * math.cos(lat0) * scale, math.radians(p[0]) * scale)
+
+    px, py = project(point)
+    ax, ay = project(start)
+    bx, by = project(end)
+    dx, dy = bx - ax, by - ay
+    if dx == 0 and dy == 0:
+        return math.hypot(px - ax, py - ay)
+    t = max(0.0, min(1.0, ((px - ax) * dx + (py - ay) * dy) / (dx * dx + dy * dy)))
+    return math.hypot(px - (ax + t * dx), py - (ay + t * dy))
+
+
+def douglas_peucker(points, tolerance_m):
+    """Simplificar una trayectoria [(lat, lng, ...), ...] conservando extremos"""
+    if len(points) < 3 or tolerance_m <= 0:
+        return list(points)
+
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        max_distance = 0.0
+        index = None
+        for i in range(first + 1, last):
+            distance = _perpendicular_distance_m(points[i], points[first], points[last])
+            if distance > max_distance:
+                max_distance = distance
+                index = i
+        if index is not None and max_distance > tolerance_m:
+            keep[index] = True
+            stack.append((first, index))
+            stack.append((index, last))
+    return [point for point, kept in zip(points, keep) if kept]
+
+
+def _raw_points_query(shipment_id):
+    return TrackingEvent.query.filter(
+        TrackingEvent.shipment_id == shipment_id,
+        TrackingEvent.is_raw.is_(True),
+        TrackingEvent.latitude.isnot(None),
+        TrackingEvent.longitude.isnot(None)
+    )
+
+
+def compact_shipment(shipment_id, before):
+    """Mover los puntos GPS crudos anteriores a before a segmentos compactos.
+
+    Solo toca filas con is_raw (las que escribe LocationBuffer); los eventos
+    semánticos, aunque sean IN_TRANSIT sin descripción, se conservan enteros.
+    """
+    raw = _raw_points_query(shipment_id).filter(
+        TrackingEvent.timestamp < before
+    ).order_by(TrackingEvent.timestamp, TrackingEvent.id).with_entities(
+        TrackingEvent.id, TrackingEvent.timestamp, TrackingEvent.latitude, TrackingEvent.longitude
+    ).all()
+    if not raw:
+        return 0
+
+    for start in range(0, len(raw), MAX_SEGMENT_POINTS):
+        chunk = raw[start:start + MAX_SEGMENT_POINTS]
+        db.session.add(TrajectorySegment(
+            shipment_id=shipment_id,
+            start_time=chunk[0].timestamp,
+            end_time=chunk[-1].timestamp,
+            point_count=len(chunk),
+            encoded_path=encode_polyline([(row.latitude, row.longitude) for row in chunk]),
+            encoded_times=encode_times([row.timestamp for row in chunk])
+        ))
+    db.session.execute(
+        delete(TrackingEvent).where(TrackingEvent.id.in_([row.id for row in raw])),
+        execution_options={'synchronize_session': False}
+    )
+    db.session.commit()
+    return len(raw)
+
+
+def compact_trajectories(window=DEFAULT_COMPACTION_WINDOW, now=None):
+    """Compactar todas las cargas con puntos crudos más antiguos que la ventana"""
+    before = (now or datetime.utcnow()) - window
+    shipment_ids = [
+        row.shipment_id for row in db.session.query(TrackingEvent.shipment_id).filter(
+            TrackingEvent.is_raw.is_(True),
+            TrackingEvent.latitude.isnot(None),
+            TrackingEvent.timestamp < before
+        ).distinct()
+    ]
+    compacted = 0
+    for shipment_id in shipment_ids:
+        compacted += compact_shipment(shipment_id, before)
+    return len(shipment_ids), compacted
+
+
+def load_trajectory(shipment_id, since=None):
+    """Trayectoria completa [(lat, lng, timestamp), ...] en orden cronológico"""
+    segments = TrajectorySegment.query.filter(TrajectorySegment.shipment_id == shipment_id)
+    if since is not None:
+        segments = segments.filter(TrajectorySegment.end_time >= since)
+
+    points = []
+    for segment in segments.order_by(TrajectorySegment.start_time):
+        coordinates = decode_polyline(segment.encoded_path)
+        timestamps = decode_times(segment.encoded_times)
+        points.extend((lat, lng, timestamp) for (lat, lng), timestamp in zip(coordinates, timestamps))
+
+    raw = _raw_points_query(shipment_id)
+    if since is not None:
+        raw = raw.filter(TrackingEvent.timestamp >= since)
+    points.extend(
+        (row.latitude, row.longitude, row.timestamp)
+        for row in raw.with_entities(TrackingEvent.latitude, TrackingEvent.longitude, TrackingEvent.timestamp)
+    )
+
+    if since is not None:
+        points = [point for point in points if point[2] >= since]
+    points.sort(key=lambda point: point[2])
+    return points
+
+
+def replay(shipment_id, tolerance_m=25.0, since=None):
+    """Trayectoria simplificada y eventos semánticos (recogida, retrasos, entrega)"""
+    points = load_trajectory(shipment_id, since)
+    simplified = douglas_peucker(points, tolerance_m)
+
+    events = TrackingEvent.query.filter(
+        TrackingEvent.shipment_id == shipment_id,
+        TrackingEvent.is_raw.is_(False)
+    ).order_by(TrackingEvent.timestamp).all()
+
+    return {
+        'shipment_id': shipment_id,
+        'tolerance_m': tolerance_m,
+        'original_points': len(points),
+        'points': [[round(lat, 5), round(lng, 5), timestamp.isoformat()] for lat, lng, timestamp in simplified],
+        'events': [event.to_dict() for event in events]
+    }
\ No newline at end of file
@@ -0,0 +1,40 @@
+import logging
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+PENDING_KEY = 'on_commit'
+
+
+def track_on_commit(session, key, ids, callback):
+    """Juntar ids bajo key y llamar callback(ids) una vez cuando la sesión confirme.
+
+    Pensado para los listeners after_flush que invalidan cachés o índices en
+    proceso: varias llamadas con la misma key en una transacción acumulan los
+    ids y el callback corre una sola vez tras el commit; un rollback los
+    descarta. ids puede ser vacío cuando solo importa que hubo cambios.
+    """
+    pending = session.info.setdefault(PENDING_KEY, {})
+    if key not in pending:
+        pending[key] = (set(), callback)
+    pending[key][0].update(ids)
+
+
+@event.listens_for(Session, 'after_commit')
+def _run_on_commit(session):
+    pending = session.info.pop(PENDING_KEY, None)
+    if not pending:
+        return
+    for key, (ids, callback) in pending.items():
+        # Los datos ya están confirmados: un backend caído no debe impedir las demás invalidaciones
+        try:
+            callback(ids)
+        except Exception:
+            logger.exception('Falló la acción posterior al commit %s', key)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_on_commit(session):
+    session.info.pop(PENDING_KEY, None)
\ No newline at end of file
@@ -0,0 +1,362 @@
+import hashlib
+import logging
+import multiprocessing
+import os
+import secrets
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from functools import partial
+
+from flask import Request, current_app
+from werkzeug.utils import secure_filename
+
+from app import db
+from app.models.document import Document
+from app.models.media import Media, MediaStatus, MediaType
+from app.models.user import User, UserType
+from app.services.blobs import (
+    blob_key, blob_path, blob_url, commit_file, register_blob, resolve_folder, store_root, temporary_file
+)
+from app.services.imaging import InvalidImage, process_image
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+DEFAULT_SPOOL_SIZE = 256 * 1024
+DEFAULT_VARIANTS = {'large': 1024, 'medium': 256, 'small': 64}
+
+# Tipo real del archivo por sus primeros bytes; la extensión no se toma en cuenta
+SIGNATURES = (
+    (b'\xff\xd8\xff', 'image/jpeg', 'jpg'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png', 'png'),
+    (b'GIF87a', 'image/gif', 'gif'),
+    (b'GIF89a', 'image/gif', 'gif'),
+    (b'%PDF-', 'application/pdf', 'pdf'),
+)
+IMAGE_TYPES = {'image/jpeg', 'image/png', 'image/gif'}
+DOCUMENT_TYPES = {'application/pdf', 'image/jpeg', 'image/png'}
+
+
+class UploadError(ValueError):
+    """Archivo rechazado: tipo no permitido o demasiado grande"""
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class UploadRequest(Request):
+    """Request que recibe los archivos del multipart en SpooledTemporaryFile.
+
+    Werkzeug ya lee el cuerpo por bloques; aquí se fija cuánto de cada archivo
+    puede quedar en memoria (UPLOAD_SPOOL_SIZE) antes de pasar a disco y en
+    qué directorio (UPLOAD_TMP_FOLDER), así un cuerpo de 16 MB no ocupa RAM.
+    """
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        config = current_app.config
+        return tempfile.SpooledTemporaryFile(
+            max_size=config.get('UPLOAD_SPOOL_SIZE', DEFAULT_SPOOL_SIZE),
+            mode='rb+',
+            dir=config.get('UPLOAD_TMP_FOLDER')
+        )
+
+
+def sniff_type(stream):
+    """(mime_type, extensión) según la firma del archivo; (None, None) si no se reconoce"""
+    head = stream.read(16)
+    stream.seek(0)
+    for signature, mime_type, extension in SIGNATURES:
+        if head.startswith(signature):
+            return mime_type, extension
+    return None, None
+
+
+def copy_stream(stream, descriptor, max_bytes):
+    """Copiar un stream a un descriptor por bloques, hasheando en la misma pasada; devuelve (bytes, sha256).
+
+    Si se supera max_bytes se corta sin terminar de copiar.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    with os.fdopen(descriptor, 'wb') as target:
+        while True:
+            chunk = stream.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > max_bytes:
+                raise UploadError('El archivo supera el tamaño máximo permitido', 413)
+            digest.update(chunk)
+            target.write(chunk)
+    return size, digest.hexdigest()
+
+
+def save_stream(stream, directory, file_name, max_bytes):
+    """Copiar un stream a directory/file_name por bloques; devuelve (bytes, sha256).
+
+    Se escribe a un temporal en el mismo directorio y se renombra al final,
+    de modo que nunca queda un archivo a medio escribir con el nombre
+    definitivo.
+    """
+    os.makedirs(directory, exist_ok=True)
+    descriptor, temporary_path = tempfile.mkstemp(dir=directory, prefix='.upload-')
+    try:
+        size, sha256 = copy_stream(stream, descriptor, max_bytes)
+        os.replace(temporary_path, os.path.join(directory, file_name))
+    except BaseException:
+        _discard(temporary_path)
+        raise
+    return size, sha256
+
+
+def store_upload(file_storage, folder, allowed_types, max_bytes):
+    """Validar por firma y guardar un archivo recibido; devuelve (ruta, bytes, mime_type)"""
+    mime_type, extension = sniff_type(file_storage.stream)
+    if mime_type not in allowed_types:
+        raise UploadError('Tipo de archivo no permitido')
+    file_name = f'{secrets.token_hex(16)}.{extension}'
+    directory = resolve_folder(folder)
+    size, _ = save_stream(file_storage.stream, directory, file_name, max_bytes)
+    return os.path.join(directory, file_name), size, mime_type
+
+
+def store_blob(file_storage, allowed_types, max_bytes):
+    """Validar por firma y guardar un archivo en el almacén por contenido.
+
+    El sha256 sale de la misma copia al temporal, sin releer el archivo. La
+    fila del blob se registra en la transacción actual antes de mover el
+    archivo, para que blob-gc no lo recoja mientras se confirma quien lo
+    referencia. Devuelve (sha256, bytes, mime_type, extensión).
+    """
+    mime_type, extension = sniff_type(file_storage.stream)
+    if mime_type not in allowed_types:
+        raise UploadError('Tipo de archivo no permitido')
+    root = store_root()
+    descriptor, temporary_path = temporary_file(root)
+    try:
+        size, sha256 = copy_stream(file_storage.stream, descriptor, max_bytes)
+        register_blob(db.session.connection(), sha256, size, mime_type)
+        commit_file(root, temporary_path, sha256)
+    except BaseException:
+        _discard(temporary_path)
+        raise
+    return sha256, size, mime_type, extension
+
+
+class ImagePipeline:
+    """Pool de procesos para redimensionar imágenes fuera del hilo del request.
+
+    El pool se crea en el primer uso de cada proceso (después del fork de
+    gunicorn) con el método spawn, para no heredar conexiones ni locks del
+    worker web. Al terminar cada imagen se actualiza su fila de Media.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ProcessPoolExecutor(
+                    max_workers=current_app.config.get('IMAGE_PROCESS_WORKERS', 2),
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+                self._pid = os.getpid()
+            return self._executor
+
+    def submit(self, media):
+        """Encolar el procesamiento de un Media PENDING ya confirmado"""
+        app = current_app._get_current_object()
+        future = self._get_executor().submit(
+            process_image,
+            media.file_path,
+            resolve_folder(app.config['BLOB_STORE_FOLDER']),
+            app.config.get('IMAGE_VARIANTS', DEFAULT_VARIANTS)
+        )
+        future.add_done_callback(partial(_finish_processing, app, media.id))
+        return future
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            if self._executor is not None and self._pid == os.getpid():
+                self._executor.shutdown(wait=wait)
+            self._executor = None
+
+
+image_pipeline = ImagePipeline()
+
+
+def apply_processing_result(media, result):
+    """Marcar el Media como listo con sus variantes; devuelve el original de staging a borrar.
+
+    Las variantes ya están en el almacén por contenido; aquí se registran
+    como blobs públicos y el hook de ref_count suma la referencia al guardar.
+    """
+    mime_type = result['mime_type']
+    connection = db.session.connection()
+    root = store_root()
+    variants = {}
+    for name, variant in result['variants'].items():
+        register_blob(connection, variant['sha256'], variant['size'], mime_type, public=True)
+        # Con la fila ya bloqueada: si blob-gc borró el archivo después de escribirlo, se
+        # revierte y el original de staging queda para flask reprocess-media
+        if not os.path.exists(blob_path(root, variant['sha256'])):
+            raise FileNotFoundError(f'Variante {name} recolectada antes de registrarla')
+        variants[name] = {
+            'sha256': variant['sha256'],
+            'url': blob_url(variant['sha256'], mime_type),
+            'width': variant['width'],
+            'height': variant['height'],
+            'size': variant['size']
+        }
+    main = max(variants.values(), key=lambda variant: variant['width'] * variant['height'])
+    staging_path = media.file_path
+
+    media.file_name = main['url'].rsplit('/', 1)[-1]
+    media.file_path = main['url']
+    media.file_size = main['size']
+    media.mime_type = mime_type
+    media.width = result['width']
+    media.height = result['height']
+    media.variants = variants
+    media.processing_status = MediaStatus.READY
+    media.processing_error = None
+    media.processed_date = datetime.utcnow()
+
+    if media.media_type == MediaType.PROFILE and media.entity_type == 'user' and media.is_primary:
+        user = db.session.get(User, media.entity_id)
+        if user is not None:
+            preferred = variants.get('medium') or variants[max(variants, key=lambda name: variants[name]['width'])]
+            user.profile_picture = preferred['url']
+    return staging_path
+
+
+def _discard(path):
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+
+def _finish_processing(app, media_id, future):
+    """Callback del pool: corre en un hilo del proceso web con su propio contexto"""
+    with app.app_context():
+        try:
+            media = db.session.get(Media, media_id)
+            if media is None or media.processing_status != MediaStatus.PENDING:
+                return
+            try:
+                result = future.result()
+            except InvalidImage as error:
+                media.processing_status = MediaStatus.FAILED
+                media.processing_error = str(error)[:1000]
+                discard = media.file_path
+            except Exception as error:
+                # Falla del pool (proceso muerto, etc.): el original se conserva
+                # para que flask reprocess-media lo reintente
+                logger.warning('Error procesando media %s: %s', media_id, error)
+                media.processing_error = f'{type(error).__name__}: {error}'[:1000]
+                discard = None
+            else:
+                discard = apply_processing_result(media, result)
+            db.session.commit()
+            if discard:
+                _discard(discard)
+        except Exception:
+            db.session.rollback()
+            logger.exception('Error guardando el resultado del media %s', media_id)
+
+
+def upload_profile_picture(user, file_storage):
+    """Guardar la foto en staging, crear su Media PENDING y encolar el procesamiento"""
+    config = current_app.config
+    path, size, mime_type = store_upload(
+        file_storage, config['UPLOAD_STAGING_FOLDER'], IMAGE_TYPES, config['PROFILE_PICTURE_MAX_BYTES']
+    )
+    try:
+        Media.query.filter(
+            Media.media_type == MediaType.PROFILE,
+            Media.entity_type == 'user',
+            Media.entity_id == user.id,
+            Media.is_primary.is_(True)
+        ).update({'is_primary': False}, synchronize_session=False)
+        media = Media(
+            media_type=MediaType.PROFILE,
+            entity_type='user',
+            entity_id=user.id,
+            file_name=os.path.basename(path),
+            file_path=path,
+            file_size=size,
+            mime_type=mime_type,
+            is_primary=True,
+            uploaded_by=user.id,
+            processing_status=MediaStatus.PENDING
+        )
+        db.session.add(media)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        _discard(path)
+        raise
+    image_pipeline.submit(media)
+    return media
+
+
+def upload_document(user, file_storage, document_type, expiry_date=None):
+    """Guardar un documento en el almacén por contenido y registrarlo a nombre del perfil del usuario"""
+    if user.user_type == UserType.CARRIER and user.carrier_id:
+        entity_type, entity_id = 'carrier', user.carrier_id
+    elif user.user_type == UserType.COMPANY and user.company_id:
+        entity_type, entity_id = 'company', user.company_id
+    else:
+        entity_type, entity_id = 'user', user.id
+
+    try:
+        sha256, size, _, extension = store_blob(file_storage, DOCUMENT_TYPES, current_app.config['MAX_CONTENT_LENGTH'])
+        document = Document(
+            document_type=document_type,
+            entity_type=entity_type,
+            entity_id=entity_id,
+            file_name=secure_filename(file_storage.filename or '') or f'{sha256[:16]}.{extension}',
+            file_path=blob_key(sha256),
+            file_size=size,
+            sha256=sha256,
+            expiry_date=expiry_date
+        )
+        db.session.add(document)
+        db.session.commit()
+    except Exception:
+        # El archivo puede estar compartido con otros documentos: si quedó
+        # sin referencias lo recoge flask blob-gc
+        db.session.rollback()
+        raise
+    return document
+
+
+def reprocess_pending(stale_minutes=10):
+    """Reencolar los Media que siguen PENDING (p. ej. tras reiniciar el servidor) y esperarlos"""
+    cutoff = datetime.utcnow() - timedelta(minutes=stale_minutes)
+    pending = Media.query.filter(
+        Media.processing_status == MediaStatus.PENDING,
+        Media.upload_date < cutoff
+    ).order_by(Media.id).all()
+    futures = []
+    for media in pending:
+        if os.path.exists(media.file_path):
+            futures.append(image_pipeline.submit(media))
+        else:
+            media.processing_status = MediaStatus.FAILED
+            media.processing_error = 'El archivo original ya no existe'
+    db.session.commit()
+    for future in futures:
+        try:
+            future.result()
+        except Exception:
+            pass
+    image_pipeline.shutdown()
+    return len(futures)
\ No newline at end of file
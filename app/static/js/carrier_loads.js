@@ -3,7 +3,7 @@ class CarrierLoads {
     constructor() {
         this.currentView = 'grid';
         this.currentFilter = 'all';
-        this.currentSort = 'newest';
+        this.currentSort = 'recommended';
         this.loads = [];
         this.filteredLoads = [];
         this.currentLoadId = null;
@@ -26,7 +26,7 @@ class CarrierLoads {
         this.setupEventListeners();
         this.setupFilters();
         this.setupModals();
-        this.loadSampleData();
+        this.loadRecommendedLoads();
         
         console.log('Carrier Loads initialized');
     }
@@ -164,84 +164,60 @@ class CarrierLoads {
         this.filtersSidebar = document.getElementById('carrierFiltersSidebar');
     }
 
-    loadSampleData() {
-        // Sample loads data - in real app, this would come from an API
-        this.loads = [
-            {
-                id: 1,
-                origin: { city: 'Bogotá, DC', address: 'Centro Industrial' },
-                destination: { city: 'Medellín, ANT', address: 'Zona Industrial' },
-                weight: 1200,
-                volume: 12,
-                type: 'general',
-                pickupTime: 'Hoy 14:00',
-                deliveryTime: 'Mañana 10:00',
-                price: 850000,
-                priceType: 'fixed',
-                distance: 15,
-                urgency: 'high',
-                matchesRoute: false,
-                isNew: false,
-                isExpress: false
-            },
-            {
-                id: 2,
-                origin: { city: 'Cali, VAL', address: 'Centro Logístico' },
-                destination: { city: 'Pereira, RIS', address: 'Zona Franca' },
-                weight: 800,
-                volume: 8,
-                type: 'refrigerated',
-                pickupTime: '15 Dic 09:00',
-                deliveryTime: '15 Dic 18:00',
-                price: 620000,
-                priceType: 'negotiable',
-                distance: 8,
-                urgency: 'medium',
-                matchesRoute: true,
-                isNew: false,
-                isExpress: false
-            },
-            {
-                id: 3,
-                origin: { city: 'Barranquilla, ATL', address: 'Puerto Industrial' },
-                destination: { city: 'Cartagena, BOL', address: 'Zona Portuaria' },
-                weight: 2500,
-                volume: 18,
-                type: 'dangerous',
-                pickupTime: '16 Dic 08:00',
-                deliveryTime: '17 Dic 12:00',
-                price: 1200000,
-                priceType: 'certification',
-                distance: 25,
-                urgency: 'low',
-                matchesRoute: false,
-                isNew: true,
-                isExpress: false
-            },
-            {
-                id: 4,
-                origin: { city: 'Bucaramanga, SAN', address: 'Centro Comercial' },
-                destination: { city: 'Cúcuta, NDS', address: 'Zona Fronteriza' },
-                weight: 500,
-                volume: 6,
-                type: 'fragile',
-                pickupTime: 'Hoy 16:00',
-                deliveryTime: 'Mañana 08:00',
-                price: 450000,
-                priceType: 'special',
-                distance: 12,
-                urgency: 'high',
-                matchesRoute: false,
-                isNew: false,
-                isExpress: true
-            }
-        ];
+    async loadRecommendedLoads() {
+        // Cargas abiertas ordenadas por el índice de matching del servidor
+        try {
+            const response = await fetch('/carriers/api/recommended-loads?k=100', { credentials: 'same-origin' });
+            if (!response.ok) throw new Error(`HTTP ${response.status}`);
+            const items = await response.json();
+            this.loads = items.map(item => this.fromApi(item));
+        } catch (error) {
+            console.error('Error loading recommended loads:', error);
+            this.loads = [];
+            this.showNotification('No se pudieron cargar las cargas disponibles', 'error');
+        }
 
         this.filteredLoads = [...this.loads];
         this.renderLoads();
         this.updateStats();
     }
 
+    fromApi(item) {
+        const types = {
+            refrigerated: 'refrigerated',
+            dangerous_goods: 'dangerous',
+            chemicals: 'dangerous'
+        };
+        const pickup = item.pickup_date ? new Date(item.pickup_date) : null;
+        const hoursToPickup = pickup ? (pickup - Date.now()) / 3600000 : null;
+
+        return {
+            id: item.id,
+            origin: { city: item.origin_city, address: item.title || '' },
+            destination: { city: item.destination_city, address: '' },
+            weight: item.weight_kg,
+            volume: item.volume_m3,
+            type: types[item.cargo_type] || 'general',
+            pickupTime: this.formatDate(item.pickup_date),
+            deliveryTime: this.formatDate(item.delivery_deadline),
+            price: item.offered_price || 0,
+            priceType: item.offered_price ? 'fixed' : 'negotiable',
+            distance: Math.round(item.distance_km || 0),
+            urgency: hoursToPickup !== null && hoursToPickup < 24 ? 'high' : 'medium',
+            matchesRoute: item.matches_route,
+            isNew: item.published_date ? Date.now() - new Date(item.published_date) < 86400000 : false,
+            isExpress: false,
+            score: item.score
+        };
+    }
+
+    formatDate(value) {
+        if (!value) return 'Por definir';
+        return new Date(value).toLocaleString('es-CO', {
+            day: 'numeric', month: 'short', hour: '2-digit', minute: '2-digit'
+        });
+    }
+
     switchView(view) {
         this.currentView = view;
         
@@ -385,6 +361,8 @@ class CarrierLoads {
                 case 'urgency':
                     const urgencyOrder = { high: 3, medium: 2, low: 1 };
                     return urgencyOrder[b.urgency] - urgencyOrder[a.urgency];
+                case 'recommended':
+                    return b.score - a.score;
                 case 'newest':
                 default:
                     return b.id - a.id; // Simulate date sorting
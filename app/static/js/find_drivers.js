@@ -12,15 +12,15 @@ class FindDrivers {
             availableNow: false,
             available24h: false
         };
-        this.sortBy = 'rating';
+        this.sortBy = 'recommended';
         this.currentPage = 1;
         this.init();
     }
 
-    init() {
+    async init() {
         this.loadDriverImages();
         this.setupEventListeners();
-        this.loadDrivers();
+        await this.loadDrivers();
         this.applyFilters();
     }
 
@@ -104,74 +104,44 @@ class FindDrivers {
         this.setupDriverActions();
     }
 
-    loadDrivers() {
-        // Simulated driver data
-        this.drivers = [
-            {
-                id: 1,
-                name: "Carlos Rodríguez",
-                rating: 4.8,
-                reviewCount: 142,
-                location: "Bogotá D.C.",
-                vehicles: ["Camiones 5T y 10T"],
-                experience: "8 años",
-                completedTrips: 347,
-                successRate: 98,
-                specialties: ["Carga General", "Refrigerada", "Dimensional"],
-                available: true,
-                responseTime: "15 min",
-                verified: true,
-                featured: true
-            },
-            {
-                id: 2,
-                name: "María González",
-                rating: 5.0,
-                reviewCount: 89,
-                location: "Medellín",
-                vehicles: ["Vans y Camiones 3.5T"],
-                experience: "5 años",
-                completedTrips: 213,
-                successRate: 100,
-                specialties: ["Carga General", "Frágil", "Mercancía Peligrosa"],
-                available: true,
-                responseTime: "10 min",
-                verified: true,
-                featured: false
-            },
-            {
-                id: 3,
-                name: "Javier López",
-                rating: 4.9,
-                reviewCount: 76,
-                location: "Cali",
-                vehicles: ["Tractocamión Refrigerado"],
-                experience: "12 años",
-                completedTrips: 521,
-                successRate: 99,
-                specialties: ["Refrigerada", "Carga Viva", "Larga Distancia"],
-                available: false,
-                responseTime: "2 horas",
-                verified: true,
-                featured: false
-            },
-            {
-                id: 4,
-                name: "Ana Martínez",
-                rating: 4.7,
-                reviewCount: 134,
-                location: "Barranquilla",
-                vehicles: ["Camionetas Pickup"],
-                experience: "3 años",
-                completedTrips: 187,
-                successRate: 96,
-                specialties: ["Paquetería", "Mudanzas", "Entregas Rápidas"],
-                available: true,
-                responseTime: "5 min",
-                verified: true,
-                featured: false
-            }
-        ];
+    async loadDrivers() {
+        // Con ?load=<id> los conductores vienen del índice de matching para esa carga;
+        // sin carga, del índice de búsqueda de conductores
+        const loadId = new URLSearchParams(window.location.search).get('load');
+        const endpoint = loadId
+            ? `/companies/api/load/${encodeURIComponent(loadId)}/matching-drivers?k=50`
+            : '/companies/api/search-drivers?limit=50';
+
+        try {
+            const response = await fetch(endpoint, { credentials: 'same-origin' });
+            if (!response.ok) throw new Error(`HTTP ${response.status}`);
+            const data = await response.json();
+            const items = loadId ? data : data.items;
+            this.drivers = items.map(item => this.fromApi(item));
+        } catch (error) {
+            console.error('Error loading drivers:', error);
+            this.drivers = [];
+            this.showNotification('No se pudieron cargar los conductores', 'error');
+        }
+    }
+
+    fromApi(item) {
+        const vehicles = item.vehicle_types || [];
+        return {
+            id: item.id,
+            name: `Conductor #${item.id}`,
+            rating: item.average_rating || 0,
+            reviewCount: item.completed_trips || 0,
+            location: item.city || '',
+            vehicles: vehicles.length ? vehicles : ['Sin vehículo registrado'],
+            license: item.license_category,
+            completedTrips: item.completed_trips || 0,
+            specialties: item.cargo_specializations || [],
+            available: true,
+            verified: true,
+            featured: false,
+            score: item.score
+        };
     }
 
     handleSearch(searchTerm) {
@@ -249,8 +219,8 @@ class FindDrivers {
         switch (this.sortBy) {
             case 'rating':
                 return drivers.sort((a, b) => b.rating - a.rating);
-            case 'experience':
-                return drivers.sort((a, b) => parseInt(b.experience) - parseInt(a.experience));
+            case 'recommended':
+                return drivers.sort((a, b) => b.score - a.score);
             case 'price':
                 return drivers;
             case 'completed':
@@ -383,18 +353,16 @@ class FindDrivers {
                         <i class="fas fa-truck"></i>
                         <span>${driver.vehicles[0]}</span>
                     </div>
+                    ${driver.license ? `
                     <div class="spec-item">
-                        <i class="fas fa-briefcase"></i>
-                        <span>${driver.experience} de experiencia</span>
+                        <i class="fas fa-id-card"></i>
+                        <span>Licencia ${driver.license}</span>
                     </div>
+                    ` : ''}
                     <div class="spec-item">
                         <i class="fas fa-road"></i>
                         <span>${driver.completedTrips} viajes completados</span>
                     </div>
-                    <div class="spec-item">
-                        <i class="fas fa-percentage"></i>
-                        <span>${driver.successRate}% de entregas exitosas</span>
-                    </div>
                 </div>
 
                 <div class="driver-specialties">
@@ -411,10 +379,6 @@ class FindDrivers {
                         <i class="fas fa-circle"></i>
                         ${driver.available ? 'Disponible ahora' : 'En viaje'}
                     </div>
-                    <div class="response-time">
-                        <i class="fas fa-clock"></i>
-                        ${driver.available ? `Respuesta: ${driver.responseTime}` : `Disponible en ${driver.responseTime}`}
-                    </div>
                 </div>
             </div>
 
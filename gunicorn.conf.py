@@ -0,0 +1,40 @@
+import logging
+import multiprocessing
+import os
+
+# Estado que sin backend compartido vive en la memoria de cada worker; con
+# varios workers y sin la URL correspondiente:
+#   PUBSUB_URL       un visor de seguimiento en vivo no recibe los puntos GPS
+#                    que llegan a otro worker
+#   RATELIMIT_URL    cada worker lleva su propio límite en /auth/check-email
+#   PAGE_CACHE_URL   otro worker puede servir una página cacheada vieja hasta
+#                    PAGE_CACHE_TTL segundos
+SHARED_STATE_URLS = ('PUBSUB_URL', 'RATELIMIT_URL', 'PAGE_CACHE_URL')
+
+wsgi_app = 'run:app'
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+# Por defecto varios workers solo si todo el estado anterior es compartido
+_shared = all(os.environ.get(name) for name in SHARED_STATE_URLS)
+workers = int(os.environ.get('GUNICORN_WORKERS') or (multiprocessing.cpu_count() * 2 + 1 if _shared else 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+
+# La aplicación, sus plantillas y la verificación del esquema se cargan una
+# vez en el master; los workers nacen por fork ya listos
+preload_app = True
+
+
+def on_starting(server):
+    missing = [name for name in SHARED_STATE_URLS if not os.environ.get(name)]
+    if server.cfg.workers > 1 and missing:
+        logging.getLogger('gunicorn.error').warning(
+            '%s workers sin %s: ese estado queda por worker (ver gunicorn.conf.py)',
+            server.cfg.workers, ', '.join(missing)
+        )
+
+
+def post_fork(server, worker):
+    from run import app
+    from app.services.startup import dispose_after_fork
+
+    dispose_after_fork(app)
\ No newline at end of file
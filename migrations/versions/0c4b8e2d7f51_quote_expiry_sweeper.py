@@ -0,0 +1,36 @@
+"""Quote expiry index and notification type
+
+Revision ID: 0c4b8e2d7f51
+Revises: 5e8a2c7b3f19
+Create Date: 2025-12-29 10:17:42.583106
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0c4b8e2d7f51'
+down_revision = '5e8a2c7b3f19'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        if op.get_bind().dialect.name == 'postgresql':
+            # Antes de PostgreSQL 12, ADD VALUE no puede ejecutarse dentro de una transacción
+            op.execute("ALTER TYPE notificationtype ADD VALUE IF NOT EXISTS 'QUOTE_EXPIRED'")
+        op.create_index(
+            'ix_quotes_status_expiry_date', 'quotes', ['status', 'expiry_date'], unique=False,
+            postgresql_concurrently=True, if_not_exists=True
+        )
+
+
+def downgrade():
+    # PostgreSQL no permite quitar valores de un enum: QUOTE_EXPIRED se conserva
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_quotes_status_expiry_date', table_name='quotes',
+            postgresql_concurrently=True, if_exists=True
+        )
\ No newline at end of file
@@ -0,0 +1,37 @@
+"""Company stats
+
+Revision ID: 2b7f4e1c9d60
+Revises: 6c2e9d4f1a83
+Create Date: 2025-12-22 09:41:03.216775
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2b7f4e1c9d60'
+down_revision = '6c2e9d4f1a83'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('company_stats',
+    sa.Column('company_id', sa.Integer(), nullable=False),
+    sa.Column('total_loads', sa.Integer(), nullable=False),
+    sa.Column('published', sa.Integer(), nullable=False),
+    sa.Column('in_progress', sa.Integer(), nullable=False),
+    sa.Column('completed', sa.Integer(), nullable=False),
+    sa.Column('cancelled', sa.Integer(), nullable=False),
+    sa.Column('total_spent', sa.Numeric(precision=12, scale=2), nullable=False),
+    sa.Column('rating_sum', sa.Integer(), nullable=False),
+    sa.Column('rating_count', sa.Integer(), nullable=False),
+    sa.Column('updated_date', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['company_id'], ['companies.id'], ),
+    sa.PrimaryKeyConstraint('company_id')
+    )
+
+
+def downgrade():
+    op.drop_table('company_stats')
\ No newline at end of file
@@ -0,0 +1,44 @@
+"""Media processing status and image variants
+
+Revision ID: 3e6b9a0d4c72
+Revises: 7a5d3f9c1e24
+Create Date: 2026-01-09 11:42:27.905613
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '3e6b9a0d4c72'
+down_revision = '7a5d3f9c1e24'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    media_status = sa.Enum('PENDING', 'READY', 'FAILED', name='mediastatus')
+    media_status.create(op.get_bind(), checkfirst=True)
+    with op.batch_alter_table('media', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('processing_status', media_status, nullable=True))
+        batch_op.add_column(sa.Column('width', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('height', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('variants', sa.JSON().with_variant(postgresql.JSONB(astext_type=sa.Text()), 'postgresql'), nullable=True))
+        batch_op.add_column(sa.Column('processed_date', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('processing_error', sa.Text(), nullable=True))
+
+    # Los archivos existentes se guardaron sin posprocesamiento
+    op.execute("UPDATE media SET processing_status = 'READY'")
+
+
+def downgrade():
+    with op.batch_alter_table('media', schema=None) as batch_op:
+        batch_op.drop_column('processing_error')
+        batch_op.drop_column('processed_date')
+        batch_op.drop_column('variants')
+        batch_op.drop_column('height')
+        batch_op.drop_column('width')
+        batch_op.drop_column('processing_status')
+
+    sa.Enum(name='mediastatus').drop(op.get_bind(), checkfirst=True)
\ No newline at end of file
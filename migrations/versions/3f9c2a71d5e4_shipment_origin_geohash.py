@@ -0,0 +1,71 @@
+"""Shipment origin geohash index
+
+Revision ID: 3f9c2a71d5e4
+Revises: 770b54a8e10a
+Create Date: 2025-12-02 10:14:37.512904
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.services.geo import geohash_encode
+
+
+# revision identifiers, used by Alembic.
+revision = '3f9c2a71d5e4'
+down_revision = '770b54a8e10a'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 5000
+
+
+def upgrade():
+    with op.batch_alter_table('shipments', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('origin_geohash', sa.String(length=12), nullable=True))
+
+    # Rellenar el geohash de las cargas existentes por lotes, un UPDATE executemany por lote
+    bind = op.get_bind()
+    shipments = sa.table(
+        'shipments',
+        sa.column('id', sa.Integer),
+        sa.column('origin_lat', sa.Float),
+        sa.column('origin_lng', sa.Float),
+        sa.column('origin_geohash', sa.String)
+    )
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(shipments.c.id, shipments.c.origin_lat, shipments.c.origin_lng)
+            .where(
+                shipments.c.id > last_id,
+                shipments.c.origin_lat.isnot(None), shipments.c.origin_lng.isnot(None)
+            )
+            .order_by(shipments.c.id)
+            .limit(BATCH_SIZE)
+        ).fetchall()
+        if not rows:
+            break
+
+        bind.execute(
+            shipments.update()
+            .where(shipments.c.id == sa.bindparam('shipment_id'))
+            .values(origin_geohash=sa.bindparam('geohash')),
+            [
+                {'shipment_id': row.id, 'geohash': geohash_encode(row.origin_lat, row.origin_lng)}
+                for row in rows
+            ]
+        )
+        last_id = rows[-1].id
+
+    with op.batch_alter_table('shipments', schema=None) as batch_op:
+        batch_op.create_index(
+            'ix_shipments_origin_geohash_pickup', ['origin_geohash', 'pickup_date'], unique=False,
+            postgresql_ops={'origin_geohash': 'varchar_pattern_ops'}
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('shipments', schema=None) as batch_op:
+        batch_op.drop_index('ix_shipments_origin_geohash_pickup')
+        batch_op.drop_column('origin_geohash')
\ No newline at end of file
@@ -0,0 +1,37 @@
+"""Indexes for keyset pagination
+
+Revision ID: 4d8e1c6b7a05
+Revises: e7a3f0b94c12
+Create Date: 2025-12-15 14:20:06.118753
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4d8e1c6b7a05'
+down_revision = 'e7a3f0b94c12'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ('ix_shipments_company_id_published_date', 'shipments', ['company_id', 'published_date', 'id']),
+    ('ix_shipments_carrier_id_published_date', 'shipments', ['carrier_id', 'published_date', 'id']),
+    ('ix_notifications_user_id_created_date', 'notifications', ['user_id', 'created_date', 'id']),
+]
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(
+                name, table, columns, unique=False,
+                postgresql_concurrently=True, if_not_exists=True
+            )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, table, columns in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
\ No newline at end of file
@@ -0,0 +1,48 @@
+"""Driver search document with full-text and trigram indexes
+
+Revision ID: 5e8a2c7b3f19
+Revises: 91d3a6e2f4b8
+Create Date: 2025-12-26 12:33:18.904527
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e8a2c7b3f19'
+down_revision = '91d3a6e2f4b8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('carriers', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('search_document', sa.Text(), nullable=True))
+
+    if op.get_bind().dialect.name != 'postgresql':
+        # SQLite usa el índice invertido en proceso (app.services.driver_search)
+        return
+
+    # pg_trgm requiere permisos para crear extensiones en la base
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_carriers_search_document_tsv ON carriers "
+            "USING gin (to_tsvector('simple', coalesce(search_document, '')))"
+        )
+        op.create_index(
+            'ix_carriers_search_document_trgm', 'carriers', ['search_document'], unique=False,
+            postgresql_using='gin', postgresql_ops={'search_document': 'gin_trgm_ops'},
+            postgresql_concurrently=True, if_not_exists=True
+        )
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        with op.get_context().autocommit_block():
+            op.drop_index('ix_carriers_search_document_trgm', table_name='carriers', postgresql_concurrently=True, if_exists=True)
+            op.drop_index('ix_carriers_search_document_tsv', table_name='carriers', postgresql_concurrently=True, if_exists=True)
+
+    with op.batch_alter_table('carriers', schema=None) as batch_op:
+        batch_op.drop_column('search_document')
\ No newline at end of file
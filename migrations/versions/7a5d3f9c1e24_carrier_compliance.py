@@ -0,0 +1,81 @@
+"""Carrier compliance flag and expiry indexes
+
+Revision ID: 7a5d3f9c1e24
+Revises: 0c4b8e2d7f51
+Create Date: 2026-01-05 16:08:51.730294
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7a5d3f9c1e24'
+down_revision = '0c4b8e2d7f51'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ('ix_carriers_license_expiry_date', 'carriers', ['license_expiry_date']),
+    ('ix_carriers_insurance_expiry_date', 'carriers', ['insurance_expiry_date']),
+    ('ix_carriers_is_compliant_compliance_valid_until', 'carriers', ['is_compliant', 'compliance_valid_until']),
+    ('ix_vehicles_carrier_id', 'vehicles', ['carrier_id']),
+    ('ix_vehicles_soat_expiry', 'vehicles', ['soat_expiry']),
+    ('ix_vehicles_technomechanical_expiry', 'vehicles', ['technomechanical_expiry']),
+    ('ix_documents_expiry_date', 'documents', ['expiry_date']),
+    ('ix_documents_entity_type_entity_id', 'documents', ['entity_type', 'entity_id']),
+]
+
+
+# Misma regla que compute_compliance: el primer vencimiento entre licencia, seguro y
+# SOAT/tecnomecánica de los vehículos activos; cualquier fecha faltante deja NULL
+VALID_UNTIL_SQL = """
+UPDATE carriers SET compliance_valid_until = CASE
+    WHEN license_expiry_date IS NULL OR insurance_expiry_date IS NULL OR EXISTS (
+        SELECT 1 FROM vehicles v WHERE v.carrier_id = carriers.id AND v.is_active IS NOT FALSE
+        AND (v.soat_expiry IS NULL OR v.technomechanical_expiry IS NULL)
+    ) THEN NULL
+    ELSE {least}(
+        license_expiry_date,
+        insurance_expiry_date,
+        COALESCE((SELECT MIN(v.soat_expiry) FROM vehicles v
+                  WHERE v.carrier_id = carriers.id AND v.is_active IS NOT FALSE), license_expiry_date),
+        COALESCE((SELECT MIN(v.technomechanical_expiry) FROM vehicles v
+                  WHERE v.carrier_id = carriers.id AND v.is_active IS NOT FALSE), license_expiry_date)
+    )
+END
+"""
+
+
+def upgrade():
+    with op.batch_alter_table('carriers', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('is_compliant', sa.Boolean(), server_default=sa.false(), nullable=False))
+        batch_op.add_column(sa.Column('compliance_valid_until', sa.Date(), nullable=True))
+
+    # Vigencia calculada aquí: sin ella el matching dejaría fuera a todos los transportistas
+    # hasta correr flask compliance-scan --rebuild
+    least = 'LEAST' if op.get_bind().dialect.name == 'postgresql' else 'MIN'
+    op.execute(VALID_UNTIL_SQL.format(least=least))
+    op.execute(
+        'UPDATE carriers SET is_compliant = (compliance_valid_until IS NOT NULL '
+        'AND compliance_valid_until >= CURRENT_DATE)'
+    )
+
+    with op.get_context().autocommit_block():
+        if op.get_bind().dialect.name == 'postgresql':
+            op.execute("ALTER TYPE notificationtype ADD VALUE IF NOT EXISTS 'DOCUMENT_EXPIRING'")
+        for name, table, columns in INDEXES:
+            op.create_index(
+                name, table, columns, unique=False,
+                postgresql_concurrently=True, if_not_exists=True
+            )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, table, columns in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
+
+    with op.batch_alter_table('carriers', schema=None) as batch_op:
+        batch_op.drop_column('compliance_valid_until')
+        batch_op.drop_column('is_compliant')
\ No newline at end of file
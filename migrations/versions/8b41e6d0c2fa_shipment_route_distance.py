@@ -0,0 +1,71 @@
+"""Shipment route distance
+
+Revision ID: 8b41e6d0c2fa
+Revises: 3f9c2a71d5e4
+Create Date: 2025-12-04 16:02:11.870215
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.services.geo import haversine_km_batch
+
+
+# revision identifiers, used by Alembic.
+revision = '8b41e6d0c2fa'
+down_revision = '3f9c2a71d5e4'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 5000
+
+
+def upgrade():
+    with op.batch_alter_table('shipments', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('route_distance_km', sa.Float(), nullable=True))
+
+    # Calcular la distancia de las cargas existentes por lotes vectorizados
+    bind = op.get_bind()
+    shipments = sa.table(
+        'shipments',
+        sa.column('id', sa.Integer),
+        sa.column('origin_lat', sa.Float),
+        sa.column('origin_lng', sa.Float),
+        sa.column('destination_lat', sa.Float),
+        sa.column('destination_lng', sa.Float),
+        sa.column('route_distance_km', sa.Float)
+    )
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(
+                shipments.c.id, shipments.c.origin_lat, shipments.c.origin_lng,
+                shipments.c.destination_lat, shipments.c.destination_lng
+            )
+            .where(
+                shipments.c.id > last_id,
+                shipments.c.origin_lat.isnot(None), shipments.c.origin_lng.isnot(None),
+                shipments.c.destination_lat.isnot(None), shipments.c.destination_lng.isnot(None)
+            )
+            .order_by(shipments.c.id)
+            .limit(BATCH_SIZE)
+        ).fetchall()
+        if not rows:
+            break
+
+        distances = haversine_km_batch(
+            [row.origin_lat for row in rows], [row.origin_lng for row in rows],
+            [row.destination_lat for row in rows], [row.destination_lng for row in rows]
+        )
+        bind.execute(
+            shipments.update()
+            .where(shipments.c.id == sa.bindparam('shipment_id'))
+            .values(route_distance_km=sa.bindparam('distance')),
+            [{'shipment_id': row.id, 'distance': float(distance)} for row, distance in zip(rows, distances)]
+        )
+        last_id = rows[-1].id
+
+
+def downgrade():
+    with op.batch_alter_table('shipments', schema=None) as batch_op:
+        batch_op.drop_column('route_distance_km')
\ No newline at end of file
@@ -0,0 +1,41 @@
+"""Carrier reputation aggregates
+
+Revision ID: 91d3a6e2f4b8
+Revises: 2b7f4e1c9d60
+Create Date: 2025-12-23 16:08:52.730419
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '91d3a6e2f4b8'
+down_revision = '2b7f4e1c9d60'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('carrier_rating_histograms',
+    sa.Column('carrier_id', sa.Integer(), nullable=False),
+    sa.Column('dimension', sa.String(length=20), nullable=False),
+    sa.Column('stars', sa.SmallInteger(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.Column('updated_date', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['carrier_id'], ['carriers.id'], ),
+    sa.PrimaryKeyConstraint('carrier_id', 'dimension', 'stars')
+    )
+    with op.batch_alter_table('carriers', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('rating_sum', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('rating_count', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('disputed_trips', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('carriers', schema=None) as batch_op:
+        batch_op.drop_column('disputed_trips')
+        batch_op.drop_column('rating_count')
+        batch_op.drop_column('rating_sum')
+
+    op.drop_table('carrier_rating_histograms')
\ No newline at end of file
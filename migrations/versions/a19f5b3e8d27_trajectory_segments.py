@@ -0,0 +1,40 @@
+"""Trajectory segments
+
+Revision ID: a19f5b3e8d27
+Revises: 4d8e1c6b7a05
+Create Date: 2025-12-18 17:55:40.902318
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a19f5b3e8d27'
+down_revision = '4d8e1c6b7a05'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('trajectory_segments',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('shipment_id', sa.Integer(), nullable=False),
+    sa.Column('start_time', sa.DateTime(), nullable=False),
+    sa.Column('end_time', sa.DateTime(), nullable=False),
+    sa.Column('point_count', sa.Integer(), nullable=False),
+    sa.Column('encoded_path', sa.Text(), nullable=False),
+    sa.Column('encoded_times', sa.Text(), nullable=False),
+    sa.Column('created_date', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['shipment_id'], ['shipments.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('trajectory_segments', schema=None) as batch_op:
+        batch_op.create_index('ix_trajectory_segments_shipment_id_start_time', ['shipment_id', 'start_time'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('trajectory_segments', schema=None) as batch_op:
+        batch_op.drop_index('ix_trajectory_segments_shipment_id_start_time')
+
+    op.drop_table('trajectory_segments')
\ No newline at end of file
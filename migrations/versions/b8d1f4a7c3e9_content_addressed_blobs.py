@@ -0,0 +1,57 @@
+"""Content-addressed blob store with reference counts
+
+Revision ID: b8d1f4a7c3e9
+Revises: 3e6b9a0d4c72
+Create Date: 2026-01-12 10:17:44.318902
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8d1f4a7c3e9'
+down_revision = '3e6b9a0d4c72'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ('ix_documents_sha256', 'documents', ['sha256']),
+]
+
+
+def upgrade():
+    op.create_table('blobs',
+        sa.Column('sha256', sa.String(length=64), nullable=False),
+        sa.Column('size', sa.BigInteger(), nullable=True),
+        sa.Column('mime_type', sa.String(length=100), nullable=True),
+        sa.Column('is_public', sa.Boolean(), server_default=sa.false(), nullable=False),
+        sa.Column('ref_count', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('created_date', sa.DateTime(), nullable=True),
+        sa.Column('updated_date', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('sha256')
+    )
+    op.create_index('ix_blobs_ref_count_updated_date', 'blobs', ['ref_count', 'updated_date'], unique=False)
+
+    # Los documentos anteriores conservan su ruta y quedan sin sha256
+    with op.batch_alter_table('documents', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('sha256', sa.String(length=64), nullable=True))
+
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(
+                name, table, columns, unique=False,
+                postgresql_concurrently=True, if_not_exists=True
+            )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, table, columns in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
+
+    with op.batch_alter_table('documents', schema=None) as batch_op:
+        batch_op.drop_column('sha256')
+
+    op.drop_index('ix_blobs_ref_count_updated_date', table_name='blobs')
+    op.drop_table('blobs')
\ No newline at end of file
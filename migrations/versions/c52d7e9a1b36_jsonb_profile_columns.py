@@ -0,0 +1,73 @@
+"""JSONB profile columns with GIN indexes
+
+Revision ID: c52d7e9a1b36
+Revises: 8b41e6d0c2fa
+Create Date: 2025-12-09 11:27:45.301662
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'c52d7e9a1b36'
+down_revision = '8b41e6d0c2fa'
+branch_labels = None
+depends_on = None
+
+JSON_COLUMNS = {
+    'carriers': ['available_vehicle_types', 'cargo_specializations', 'usual_routes'],
+    'companies': ['certifications', 'coverage_zones', 'preferred_vehicle_types'],
+    'vehicles': ['special_features'],
+}
+
+GIN_INDEXES = [
+    ('ix_carriers_cargo_specializations', 'carriers', 'cargo_specializations'),
+    ('ix_carriers_usual_routes', 'carriers', 'usual_routes'),
+    ('ix_carriers_available_vehicle_types', 'carriers', 'available_vehicle_types'),
+    ('ix_companies_coverage_zones', 'companies', 'coverage_zones'),
+    ('ix_companies_certifications', 'companies', 'certifications'),
+]
+
+
+def upgrade():
+    # En SQLite la columna JSON sigue siendo texto; solo PostgreSQL cambia de tipo
+    if op.get_bind().dialect.name == 'postgresql':
+        for table, columns in JSON_COLUMNS.items():
+            with op.batch_alter_table(table, schema=None) as batch_op:
+                for column in columns:
+                    batch_op.alter_column(
+                        column,
+                        existing_type=sa.Text(),
+                        type_=postgresql.JSONB(astext_type=sa.Text()),
+                        existing_nullable=True,
+                        postgresql_using=f"NULLIF({column}, '')::jsonb"
+                    )
+
+    # Fuera de la transacción y CONCURRENTLY, como en e7a3f0b94c12: construir un GIN sobre
+    # carriers o companies no debe bloquear las escrituras mientras dura
+    with op.get_context().autocommit_block():
+        for name, table, column in GIN_INDEXES:
+            op.create_index(
+                name, table, [column], unique=False, postgresql_using='gin',
+                postgresql_concurrently=True, if_not_exists=True
+            )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, table, column in reversed(GIN_INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
+
+    if op.get_bind().dialect.name == 'postgresql':
+        for table, columns in JSON_COLUMNS.items():
+            with op.batch_alter_table(table, schema=None) as batch_op:
+                for column in columns:
+                    batch_op.alter_column(
+                        column,
+                        existing_type=postgresql.JSONB(astext_type=sa.Text()),
+                        type_=sa.Text(),
+                        existing_nullable=True,
+                        postgresql_using=f'{column}::text'
+                    )
\ No newline at end of file
@@ -0,0 +1,34 @@
+"""Explicit marker for raw GPS points
+
+Revision ID: d4e8b2f6a1c7
+Revises: b8d1f4a7c3e9
+Create Date: 2026-01-20 09:41:12.507316
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4e8b2f6a1c7'
+down_revision = 'b8d1f4a7c3e9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('tracking_events', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('is_raw', sa.Boolean(), server_default=sa.false(), nullable=False))
+
+    # Filas con la forma que escribía LocationBuffer: IN_TRANSIT con coordenadas y sin
+    # descripción ni notas. Un evento manual con notas o descripción queda como semántico
+    op.execute(
+        "UPDATE tracking_events SET is_raw = true "
+        "WHERE event_type = 'IN_TRANSIT' AND description IS NULL AND notes IS NULL "
+        "AND latitude IS NOT NULL AND longitude IS NOT NULL"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('tracking_events', schema=None) as batch_op:
+        batch_op.drop_column('is_raw')
\ No newline at end of file
@@ -0,0 +1,48 @@
+"""Composite indexes for hot query paths
+
+Revision ID: e7a3f0b94c12
+Revises: c52d7e9a1b36
+Create Date: 2025-12-11 09:43:18.664027
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7a3f0b94c12'
+down_revision = 'c52d7e9a1b36'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ('ix_shipments_status_pickup_date', 'shipments', ['status', 'pickup_date']),
+    ('ix_shipments_company_id_status', 'shipments', ['company_id', 'status']),
+    ('ix_shipments_carrier_id_status', 'shipments', ['carrier_id', 'status']),
+    ('ix_quotes_shipment_id_status', 'quotes', ['shipment_id', 'status']),
+    ('ix_quotes_carrier_id_status', 'quotes', ['carrier_id', 'status']),
+    ('ix_notifications_user_id_is_read_created_date', 'notifications', ['user_id', 'is_read', 'created_date']),
+    ('ix_tracking_events_shipment_id_timestamp', 'tracking_events', ['shipment_id', 'timestamp']),
+    ('ix_messages_conversation_id_sent_date', 'messages', ['conversation_id', 'sent_date']),
+    ('ix_payments_company_id_status', 'payments', ['company_id', 'status']),
+    ('ix_payments_carrier_id_status', 'payments', ['carrier_id', 'status']),
+    ('ix_conversations_user1_id', 'conversations', ['user1_id']),
+    ('ix_conversations_user2_id', 'conversations', ['user2_id']),
+]
+
+
+def upgrade():
+    # CREATE INDEX CONCURRENTLY no puede ejecutarse dentro de una transacción:
+    # en PostgreSQL se construyen en línea sin bloquear escrituras
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(
+                name, table, columns, unique=False,
+                postgresql_concurrently=True, if_not_exists=True
+            )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, table, columns in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
\ No newline at end of file
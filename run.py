@@ -1,17 +1,13 @@
-from app import create_app, db
-from app.models.user import User
-from app.models.company import Company
-from app.models.carrier import Carrier
+import os
 
-app = create_app()
+# Antes de importar la configuración: tamaños de pool y timeouts del proceso web
+os.environ.setdefault('DB_POOL_PROFILE', 'web')
 
-# Crear tablas automáticamente al iniciar
-with app.app_context():
-    try:
-        db.create_all()
-        print("✅ Tablas verificadas/creadas exitosamente")
-    except Exception as e:
-        print(f"⚠️  Error creando tablas: {e}")
+from app import create_app
+from app.services.startup import prepare_for_serving
+
+# El esquema lo crea flask db upgrade; aquí solo se verifica la revisión (una consulta)
+app = prepare_for_serving(create_app())
 
 if __name__ == '__main__':
     app.run(debug=False, host='0.0.0.0', port=5000)
\ No newline at end of file